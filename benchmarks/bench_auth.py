@@ -0,0 +1,69 @@
+"""Microbenchmark of the `get_current_user` dependency.
+
+Run from the repository root:
+
+    python benchmarks/bench_auth.py
+"""
+
+import asyncio
+import time
+
+import common  # noqa: F401  (configures sys.path and DB_URL)
+from fastapi import Request
+from fastapi.security import HTTPAuthorizationCredentials
+
+from features.auth import bearer
+from features.auth.bearer import TokenVerifier, get_current_user
+from features.auth.jwt import KeySet, encode
+
+SECRET = "bench-secret"
+
+
+def make_request(path: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "headers": []})
+
+
+def credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+async def main() -> None:
+    bearer.verifier = TokenVerifier(KeySet({"k1": SECRET}), static_tokens=["Nina"])
+    token = encode({"sub": "1", "exp": time.time() + 3600}, SECRET, kid="k1")
+    bad_token = encode({"sub": "1"}, "not-the-secret", kid="k1")
+    protected = make_request("/todos/")
+
+    async def public_route():
+        await get_current_user(make_request("/health"), None)
+
+    async def static_token():
+        await get_current_user(protected, credentials("Nina"))
+
+    async def jwt_cached():
+        await get_current_user(protected, credentials(token))
+
+    async def jwt_uncached():
+        bearer.verifier.verified.clear()
+        await get_current_user(protected, credentials(token))
+
+    async def jwt_rejected_cached():
+        try:
+            await get_current_user(protected, credentials(bad_token))
+        except Exception:
+            pass
+
+    results = {}
+    for name, fn in [
+        ("public route (allowlisted)", public_route),
+        ("static token (cached)", static_token),
+        ("jwt (cache hit)", jwt_cached),
+        ("jwt (cache miss, HS256 verify)", jwt_uncached),
+        ("bad jwt (negative cache hit)", jwt_rejected_cached),
+    ]:
+        results[name] = await common.measure(fn, number=20_000)
+
+    common.report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""Bytes saved versus CPU spent compressing a full `/todos/with-users` page.
+
+Serializes a 100-item `PaginatedResponse[TodoReadWithUser]` and times each
+available codec across its levels, one-shot and as a stream of per-item
+flushed chunks (how an export would go out).
+
+Run from the repository root:
+
+    python benchmarks/bench_compression.py
+"""
+
+import asyncio
+
+import common
+from features.common.pagination import MAX_PAGE_SIZE, PaginatedResponse
+from features.compression.codecs import available_codecs
+from features.todos.schemas.relational import TodoReadWithUser
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 11), "zstd": (1, 3, 19)}
+
+
+def sample_payload() -> tuple[bytes, list[bytes]]:
+    items = [
+        TodoReadWithUser(
+            id=i,
+            title=f"Todo number {i}",
+            description=f"Remember to finish task {i} before the weekly sync",
+            completed=i % 3 == 0,
+            user_id=i % 10 + 1,
+            user={
+                "id": i % 10 + 1,
+                "username": f"user{i % 10 + 1}",
+                "email": f"user{i % 10 + 1}@example.com",
+                "full_name": f"User {i % 10 + 1}",
+                "is_active": True,
+            },
+        )
+        for i in range(1, MAX_PAGE_SIZE + 1)
+    ]
+    page = PaginatedResponse[TodoReadWithUser](
+        total=10_000, page=1, page_size=MAX_PAGE_SIZE, items=items
+    )
+    lines = [item.model_dump_json().encode() + b"\n" for item in items]
+    return page.model_dump_json().encode(), lines
+
+
+async def main() -> None:
+    body, lines = sample_payload()
+    results = {}
+
+    for name, levels in LEVELS.items():
+        for level in levels:
+            codec = next(
+                (
+                    codec
+                    for codec in available_codecs(
+                        gzip_level=level, brotli_quality=level, zstd_level=level
+                    )
+                    if codec.name == name
+                ),
+                None,
+            )
+            if codec is None:
+                continue
+
+            def stream(codec=codec) -> bytes:
+                encoder = codec.stream()
+                return b"".join(map(encoder.compress, lines)) + encoder.finish()
+
+            async def one_shot_case(codec=codec):
+                codec.compress(body)
+
+            async def stream_case(stream=stream):
+                stream()
+
+            one_shot = await common.measure(one_shot_case, number=200)
+            streamed = await common.measure(stream_case, number=200)
+            results[f"{name}:{level} one-shot"] = {
+                "bytes": len(codec.compress(body)),
+                "ratio": len(body) / len(codec.compress(body)),
+                **one_shot,
+            }
+            results[f"{name}:{level} streamed"] = {
+                "bytes": len(stream()),
+                "ratio": len(b"".join(lines)) / len(stream()),
+                **streamed,
+            }
+
+    print(f"uncompressed page: {len(body)} bytes")
+    common.report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
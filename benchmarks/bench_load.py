@@ -0,0 +1,475 @@
+"""Load test of every API route against a seeded, skewed dataset.
+
+Seeds a file database (`--users`, `--todos-per-user`, `--skew`,
+`--text-length`), then drives a fixed, seeded mix of reads and writes with
+`--concurrency` clients: in-process through the ASGI app, over HTTP to a
+local uvicorn, or both. Reports throughput and p50/p95/p99 latency overall
+and per route.
+
+Run from the repository root:
+
+    python benchmarks/bench_load.py --save-baseline   # record this machine
+    python benchmarks/bench_load.py                   # exits 1 on regression
+
+A run with failed requests exits 1 and saves no baseline: latencies of error
+responses say nothing about the routes.
+
+`GET /todos/stream` is left out: it stays open until the client leaves.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+# The app reads its settings on import, so they go in before `common`.
+DB_PATH = Path(tempfile.mkdtemp(prefix="bench-load-")) / "load.db"
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Measure capacity, not the shedder's reaction to it.
+os.environ.setdefault("LOAD_SHED_ENABLED", "false")
+# No static token is accepted by default; this is the one `HEADERS` sends.
+os.environ.setdefault("AUTH_STATIC_TOKENS", '["Nina"]')
+
+import common  # noqa: E402
+import httpx  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from main import app  # noqa: E402
+
+SRC = Path(__file__).parent.parent / "src"
+HEADERS = {"Authorization": "Bearer Nina"}
+# Routes with fewer samples than this are too noisy to hold to a baseline.
+MIN_SAMPLES = 100
+
+Operation = Callable[[httpx.AsyncClient, "Workload"], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Workload:
+    """What the operations pick ids from; one per client, seeded apart."""
+
+    rng: random.Random
+    dataset: common.Dataset
+    owners: list[int]
+    cursor: int | None = None
+    created_todos: list[int] = field(default_factory=list)
+    created_users: list[int] = field(default_factory=list)
+
+    def owner(self) -> int:
+        """A user id, busy owners picked as often as they own todos."""
+        return self.rng.choice(self.owners)
+
+    def todo(self) -> int:
+        return self.rng.randint(1, self.dataset.todos)
+
+    def ids(self, upper: int) -> str:
+        count = self.rng.randint(2, 20)
+        return ",".join(str(self.rng.randint(1, upper)) for _ in range(count))
+
+    def page(self) -> dict[str, object]:
+        return {
+            # Mostly the first pages, sometimes one deep in the list.
+            "page": self.rng.choice((1, 1, 1, 2, 3, 20)),
+            "page_size": self.rng.choice((10, 20, 50, 100)),
+        }
+
+    def text(self, length: int) -> str:
+        return "".join(self.rng.choices("abcdefghij klmnopqrst uvwxyz", k=length))
+
+
+async def list_todos(client, load):
+    params = {**load.page(), "sort_by": load.rng.choice(("id", "title", "user_id"))}
+    if load.rng.random() < 0.5:
+        params["user_id"] = load.owner()
+    if load.rng.random() < 0.3:
+        params["completed"] = load.rng.random() < 0.5
+    return await client.get("/todos/", params=params)
+
+
+async def list_todos_with_users(client, load):
+    return await client.get("/todos/with-users", params=load.page())
+
+
+async def get_todo(client, load):
+    return await client.get(f"/todos/{load.todo()}")
+
+
+async def get_todos_batch(client, load):
+    return await client.get(
+        "/todos/batch", params={"ids": load.ids(load.dataset.todos)}
+    )
+
+
+async def list_todo_changes(client, load):
+    params = {"limit": 100} if load.cursor is None else {"since": load.cursor}
+    response = await client.get("/todos/changes", params=params)
+    if response.status_code == 200:
+        load.cursor = response.json()["cursor"]
+    return response
+
+
+async def create_todo(client, load):
+    response = await client.post(
+        "/todos/",
+        json={
+            "title": load.text(load.rng.randint(8, 40)),
+            "description": load.text(load.rng.randint(0, load.dataset.text_length)),
+            "completed": False,
+            "user_id": load.owner(),
+        },
+    )
+    if response.status_code == 201:
+        load.created_todos.append(response.json()["id"])
+    return response
+
+
+async def update_todo(client, load):
+    changes = load.rng.choice(
+        (
+            {"completed": load.rng.random() < 0.5},
+            {"title": load.text(load.rng.randint(8, 40))},
+            {"user_id": load.owner()},
+        )
+    )
+    return await client.patch(f"/todos/{load.todo()}", json=changes)
+
+
+async def delete_todo(client, load):
+    # Only this client's own todos, so the seeded rows stay put.
+    if not load.created_todos:
+        return await create_todo(client, load)
+    return await client.delete(f"/todos/{load.created_todos.pop()}")
+
+
+async def complete_todos(client, load):
+    return await client.post(
+        "/todos/actions/complete",
+        json={"user_id": load.owner(), "dry_run": load.rng.random() < 0.5},
+    )
+
+
+async def reassign_todos(client, load):
+    return await client.post(
+        "/todos/actions/reassign",
+        json={"user_id": load.owner(), "to_user_id": load.owner(), "dry_run": True},
+    )
+
+
+async def list_users(client, load):
+    params = {**load.page(), "sort_by": load.rng.choice(("id", "username", "email"))}
+    if load.rng.random() < 0.3:
+        params["username"] = f"user{load.rng.randint(1, 9)}"
+    return await client.get("/users/", params=params)
+
+
+async def get_user(client, load):
+    return await client.get(f"/users/{load.owner()}")
+
+
+async def get_users_batch(client, load):
+    return await client.get(
+        "/users/batch", params={"ids": load.ids(load.dataset.users)}
+    )
+
+
+async def create_user(client, load):
+    name = f"load{load.rng.getrandbits(48):x}"
+    response = await client.post(
+        "/users/",
+        json={
+            "username": name,
+            "email": f"{name}@example.com",
+            "full_name": load.text(20),
+            "is_active": True,
+        },
+    )
+    if response.status_code == 201:
+        load.created_users.append(response.json()["id"])
+    return response
+
+
+async def update_user(client, load):
+    return await client.patch(
+        f"/users/{load.owner()}", json={"full_name": load.text(20)}
+    )
+
+
+async def delete_user(client, load):
+    if not load.created_users:
+        return await create_user(client, load)
+    background = str(load.rng.random() < 0.5).lower()
+    return await client.delete(
+        f"/users/{load.created_users.pop()}", params={"background": background}
+    )
+
+
+async def livez(client, load):
+    return await client.get("/livez")
+
+
+async def readyz(client, load):
+    return await client.get("/readyz")
+
+
+async def health(client, load):
+    return await client.get("/health")
+
+
+# Route -> (relative weight, operation); about four reads to each write.
+OPERATIONS: dict[str, tuple[int, Operation]] = {
+    "GET /todos/": (20, list_todos),
+    "GET /todos/with-users": (8, list_todos_with_users),
+    "GET /todos/{todo_id}": (20, get_todo),
+    "GET /todos/batch": (5, get_todos_batch),
+    "GET /todos/changes": (3, list_todo_changes),
+    "POST /todos/": (6, create_todo),
+    "PATCH /todos/{todo_id}": (8, update_todo),
+    "DELETE /todos/{todo_id}": (3, delete_todo),
+    "POST /todos/actions/complete": (1, complete_todos),
+    "POST /todos/actions/reassign": (1, reassign_todos),
+    "GET /users/": (8, list_users),
+    "GET /users/{user_id}": (8, get_user),
+    "GET /users/batch": (3, get_users_batch),
+    "POST /users/": (1, create_user),
+    "PATCH /users/{user_id}": (2, update_user),
+    "DELETE /users/{user_id}": (1, delete_user),
+    "GET /livez": (1, livez),
+    "GET /readyz": (1, readyz),
+    "GET /health": (1, health),
+}
+
+
+async def drive(
+    client: httpx.AsyncClient, dataset: common.Dataset, args: argparse.Namespace
+) -> dict:
+    """Run the warmup, then `args.requests` timed requests; summarize them."""
+    names = list(OPERATIONS)
+    weights = [OPERATIONS[name][0] for name in names]
+    owners = random.Random(dataset.seed).choices(
+        range(1, dataset.users + 1), dataset.owner_weights(), k=10_000
+    )
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    errors: dict[str, int] = dict.fromkeys(names, 0)
+    loads = [
+        Workload(random.Random(dataset.seed * 1000 + index), dataset, owners)
+        for index in range(args.concurrency)
+    ]
+
+    async def phase(requests: int, timed: bool) -> None:
+        remaining = requests
+
+        async def client_loop(load: Workload) -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                name = load.rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                response = await OPERATIONS[name][1](client, load)
+                elapsed = time.perf_counter() - start
+                if timed:
+                    latencies[name].append(elapsed)
+                    errors[name] += response.status_code >= 400
+
+        await asyncio.gather(*(client_loop(load) for load in loads))
+
+    await phase(args.warmup, timed=False)
+    start = time.perf_counter()
+    await phase(args.requests, timed=True)
+    duration = time.perf_counter() - start
+
+    everything = [sample for samples in latencies.values() for sample in samples]
+    return {
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "throughput_rps": len(everything) / duration,
+        **common.percentiles(everything),
+        "routes": {
+            name: {
+                "requests": len(samples),
+                "errors": errors[name],
+                **common.percentiles(samples),
+            }
+            for name, samples in latencies.items()
+            if samples
+        },
+    }
+
+
+async def run_in_process(dataset: common.Dataset, args) -> dict:
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench",
+            headers=HEADERS,
+        ) as client:
+            return await drive(client, dataset, args)
+
+
+async def run_uvicorn(dataset: common.Dataset, args) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--app-dir",
+            str(SRC),
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=os.environ.copy(),
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", headers=HEADERS, limits=limits
+        ) as client:
+            await wait_until_up(client, server)
+            return await drive(client, dataset, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+async def wait_until_up(client: httpx.AsyncClient, server: subprocess.Popen) -> None:
+    async with asyncio.timeout(30):
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            try:
+                if (await client.get("/livez")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+
+
+MODES = {"in-process": run_in_process, "uvicorn": run_uvicorn}
+
+
+def print_summary(mode: str, summary: dict) -> None:
+    print(
+        f"\n{mode}: {summary['requests']} requests, {summary['errors']} errors, "
+        f"{summary['throughput_rps']:.1f} req/s"
+    )
+    columns = ("requests", "errors", "p50_ms", "p95_ms", "p99_ms")
+    common.report(
+        {
+            "all routes": {key: summary[key] for key in columns},
+            **{
+                name: {key: route[key] for key in columns}
+                for name, route in summary["routes"].items()
+            },
+        }
+    )
+
+
+def failed_routes(summaries: dict[str, dict]) -> list[str]:
+    return [
+        f"{mode} {name}: {route['errors']} of {route['requests']}"
+        for mode, summary in summaries.items()
+        for name, route in summary["routes"].items()
+        if route["errors"]
+    ]
+
+
+def baseline_metrics(summaries: dict[str, dict]) -> dict[str, float]:
+    metrics = {}
+    for mode, summary in summaries.items():
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            metrics[f"{mode} {key}"] = summary[key]
+        for name, route in summary["routes"].items():
+            if route["requests"] >= MIN_SAMPLES:
+                metrics[f"{mode} {name} p95_ms"] = route["p95_ms"]
+    return metrics
+
+
+async def run(args: argparse.Namespace) -> int:
+    dataset = common.Dataset(
+        users=args.users,
+        todos_per_user=args.todos_per_user,
+        skew=args.skew,
+        text_length=args.text_length,
+        seed=args.seed,
+    )
+    modes = list(MODES) if args.mode == "both" else [args.mode]
+    seed_engine = create_async_engine(os.environ["DB_URL"])
+    summaries = {}
+    try:
+        for mode in modes:
+            # Every mode starts from the same rows.
+            await common.seed(seed_engine, dataset)
+            await seed_engine.dispose()
+            summaries[mode] = await MODES[mode](dataset, args)
+            print_summary(mode, summaries[mode])
+    finally:
+        await seed_engine.dispose()
+
+    options = {
+        **asdict(dataset),
+        "modes": modes,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+    }
+    failed = failed_routes(summaries)
+    if failed:
+        print(
+            "Requests failed, so this run is no baseline"
+            + (" and was not saved" if args.save_baseline else "")
+            + ":\n  "
+            + "\n  ".join(failed),
+            file=sys.stderr,
+        )
+        return 1
+    metrics = baseline_metrics(summaries)
+    if args.save_baseline:
+        common.save_baseline(args.baseline, metrics, options)
+        return 0
+    return common.check_baseline(args.baseline, metrics, options, args.threshold)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = common.Dataset()
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--todos-per-user", type=int, default=defaults.todos_per_user)
+    parser.add_argument(
+        "--skew", type=float, default=defaults.skew, help="Zipf exponent of owners"
+    )
+    parser.add_argument("--text-length", type=int, default=defaults.text_length)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--baseline", type=Path, default=common.BASELINE_DIR / "load.json"
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline, 0.25 for 25%%",
+    )
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
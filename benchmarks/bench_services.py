@@ -0,0 +1,207 @@
+"""Service-layer and schema microbenchmarks, below FastAPI and HTTP.
+
+Times `TodoService` and `UserService` list, create and update calls against
+a seeded in-memory database, then the response-model costs of a page:
+`TodoRead.model_validate` per row and `PaginatedResponse` validation and
+JSON serialization. Lists and schemas are run for every page size and sort
+field. Each call gets a fresh session, as a request would, and writes are
+rolled back so every repetition sees the same rows.
+
+Run from the repository root:
+
+    python benchmarks/bench_services.py --save-baseline   # record this machine
+    python benchmarks/bench_services.py                   # exits 1 on regression
+    python benchmarks/bench_services.py --only "TodoService.list"
+"""
+
+import argparse
+import asyncio
+import itertools
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import common
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from features.common.pagination import PaginatedResponse, paginate
+from features.todos.schemas.base import (
+    TodoCreate,
+    TodoListParams,
+    TodoRead,
+    TodoSortField,
+    TodoUpdate,
+)
+from features.todos.services import TodoService
+from features.users.schemas.base import (
+    UserCreate,
+    UserListParams,
+    UserSortField,
+    UserUpdate,
+)
+from features.users.services import UserService
+
+PAGE_SIZES = (10, 50, 100)
+
+
+def cases(sessions: async_sessionmaker[AsyncSession], dataset: common.Dataset):
+    """Benchmark name -> (coroutine function, calls per repetition)."""
+    todo_ids = itertools.cycle(range(1, dataset.todos + 1))
+    user_ids = itertools.cycle(range(1, dataset.users + 1))
+    usernames = (f"bench{i}" for i in itertools.count())
+
+    def todo_service(db: AsyncSession) -> TodoService:
+        return TodoService(db, UserService(db))
+
+    def listing(service, params, **options):
+        async def case():
+            async with sessions() as db:
+                await service(db).list(params, **options)
+
+        return case
+
+    def rolled_back(write):
+        async def case():
+            async with sessions() as db:
+                await db.begin()
+                await write(db)
+                await db.rollback()
+
+        return case
+
+    found = {}
+    for page_size, field in itertools.product(PAGE_SIZES, TodoSortField):
+        params = TodoListParams(page_size=page_size, sort_by=field)
+        name = f"TodoService.list page_size={page_size} sort_by={field.value}"
+        found[name] = (listing(todo_service, params), 100)
+    for page_size in PAGE_SIZES:
+        params = TodoListParams(page_size=page_size)
+        name = f"TodoService.list_with_users page_size={page_size}"
+        found[name] = (listing(todo_service, params, include_user=True), 100)
+    for page_size, field in itertools.product(PAGE_SIZES, UserSortField):
+        params = UserListParams(page_size=page_size, sort_by=field)
+        name = f"UserService.list page_size={page_size} sort_by={field.value}"
+        found[name] = (listing(UserService, params), 100)
+
+    found["TodoService.create"] = (
+        rolled_back(
+            lambda db: todo_service(db).create(
+                TodoCreate(title="bench", completed=False, user_id=next(user_ids))
+            )
+        ),
+        300,
+    )
+    found["TodoService.update"] = (
+        rolled_back(
+            lambda db: todo_service(db).update(
+                next(todo_ids), TodoUpdate(title="renamed", completed=True)
+            )
+        ),
+        300,
+    )
+
+    def create_user(db):
+        username = next(usernames)
+        return UserService(db).create(
+            UserCreate(
+                username=username,
+                email=f"{username}@example.com",
+                full_name="Bench User",
+                is_active=True,
+            )
+        )
+
+    found["UserService.create"] = (rolled_back(create_user), 300)
+    found["UserService.update"] = (
+        rolled_back(
+            lambda db: UserService(db).update(
+                next(user_ids), UserUpdate(full_name="Renamed")
+            )
+        ),
+        300,
+    )
+    return found
+
+
+async def schema_cases(
+    sessions: async_sessionmaker[AsyncSession], dataset: common.Dataset
+):
+    """Validation and serialization of one page of loaded todos per size."""
+    found = {}
+    for page_size in PAGE_SIZES:
+        params = TodoListParams(page_size=page_size)
+        async with sessions() as db:
+            todos, total = await TodoService(db, UserService(db)).list(params)
+
+        async def validate(todos=todos):
+            for todo in todos:
+                TodoRead.model_validate(todo)
+
+        async def serialize(todos=todos, total=total, params=params):
+            # What FastAPI does with the dict a list route returns.
+            PaginatedResponse[TodoRead].model_validate(
+                paginate(todos, total, params)
+            ).model_dump_json()
+
+        found[f"TodoRead.model_validate page_size={page_size}"] = (validate, 500)
+        found[f"PaginatedResponse[TodoRead] dump_json page_size={page_size}"] = (
+            serialize,
+            500,
+        )
+    return found
+
+
+async def run(args: argparse.Namespace) -> int:
+    dataset = common.Dataset(
+        users=args.users, todos_per_user=args.todos_per_user, skew=args.skew
+    )
+    engine = await common.memory_engine()
+    await common.seed(engine, dataset)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    selected = {
+        **cases(sessions, dataset),
+        **await schema_cases(sessions, dataset),
+    }
+    if args.only:
+        selected = {name: case for name, case in selected.items() if args.only in name}
+
+    results = {}
+    try:
+        for name, (case, number) in selected.items():
+            results[name] = await common.measure(case, number=number)
+    finally:
+        await engine.dispose()
+    print(f"commit {common.git_commit() or 'unknown'}")
+    common.report(results)
+
+    options = {**asdict(dataset), "only": args.only}
+    metrics = {f"{name} best_us": row["best_us"] for name, row in results.items()}
+    if args.save_baseline:
+        common.save_baseline(args.baseline, metrics, options)
+        return 0
+    return common.check_baseline(args.baseline, metrics, options, args.threshold)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    defaults = common.Dataset()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--todos-per-user", type=int, default=defaults.todos_per_user)
+    parser.add_argument("--skew", type=float, default=defaults.skew)
+    parser.add_argument("--only", help="Run the benchmarks whose name contains this")
+    parser.add_argument(
+        "--baseline", type=Path, default=common.BASELINE_DIR / "services.json"
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline, 0.25 for 25%%",
+    )
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
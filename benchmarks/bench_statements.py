@@ -0,0 +1,168 @@
+"""Compare per-request list statement construction with cached statement shapes.
+
+Each case builds (or looks up) the count and page statements for one list
+request and compiles them for SQLite, as the executor would on a cold
+compiled cache, then the end-to-end list call is timed against a seeded
+in-memory database.
+
+Run from the repository root:
+
+    python benchmarks/bench_statements.py
+"""
+
+import asyncio
+import itertools
+
+import common
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from features.common.query import SortOrder
+from features.todos.models import Todo
+from features.todos.schemas.base import TodoListParams, TodoSortField
+from features.todos.services import TodoService
+from features.users.models import User
+from features.users.schemas.base import UserListParams, UserSortField
+from features.users.services import UserService
+
+ROWS = 2_000
+DIALECT = sqlite.dialect()
+
+TODO_PARAMS = [
+    TodoListParams(
+        completed=completed, user_id=user_id, sort_by=field, sort_order=order
+    )
+    for completed in (None, True)
+    for user_id in (None, 3)
+    for field in TodoSortField
+    for order in SortOrder
+]
+USER_PARAMS = [
+    UserListParams(
+        username=username, is_active=is_active, sort_by=field, sort_order=order
+    )
+    for username in (None, "user")
+    for is_active in (None, True)
+    for field in UserSortField
+    for order in SortOrder
+]
+
+
+def legacy_todo_statements(service: TodoService, params: TodoListParams):
+    filters = service._filters(params)
+    count_stmt = select(func.count()).select_from(Todo)
+    if filters:
+        count_stmt = count_stmt.where(*filters)
+    stmt = select(Todo).options(selectinload(Todo.user))
+    if filters:
+        stmt = stmt.where(*filters)
+    stmt = stmt.order_by(service._ordering_column(params))
+    return count_stmt, stmt.offset(params.offset).limit(params.page_size)
+
+
+def cached_todo_statements(service: TodoService, params: TodoListParams):
+    shape = frozenset(service._filter_values(params))
+    cache = service.list_statements
+    return (
+        cache.get(("count", shape), lambda: service._count_statement(shape)),
+        cache.get(
+            ("page", shape, params.sort_by, params.sort_order, True),
+            lambda: service._page_statement(shape, params, True, None),
+        ),
+    )
+
+
+def legacy_user_statements(service: UserService, params: UserListParams):
+    clauses = []
+    if params.username:
+        clauses.append(
+            func.lower(User.username).like(service._normalize_like(params.username))
+        )
+    if params.is_active is not None:
+        clauses.append(User.is_active == params.is_active)
+    count_stmt = select(func.count()).select_from(User).where(*clauses)
+    stmt = select(User).where(*clauses).order_by(service._ordering_column(params))
+    return count_stmt, stmt.offset(params.offset).limit(params.page_size)
+
+
+def cached_user_statements(service: UserService, params: UserListParams):
+    shape = frozenset(service._filter_values(params))
+    cache = service.list_statements
+    return (
+        cache.get(("count", shape), lambda: service._count_statement(shape)),
+        cache.get(
+            ("page", shape, params.sort_by, params.sort_order),
+            lambda: service._page_statement(shape, params, None),
+        ),
+    )
+
+
+def construction_case(build, service, params_list, compiled: dict):
+    params_cycle = itertools.cycle(params_list)
+
+    async def case():
+        for statement in build(service, next(params_cycle)):
+            # The executor's compiled cache is keyed on this; computing it is
+            # the per-request cost that cached shapes avoid after the first use.
+            key = statement._generate_cache_key().key
+            if key not in compiled:
+                compiled[key] = statement.compile(dialect=DIALECT)
+
+    return case
+
+
+async def main() -> None:
+    engine = await common.memory_engine()
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(User),
+            [
+                {"username": f"user{i}", "email": f"user{i}@example.com"}
+                for i in range(1, 51)
+            ],
+        )
+        await conn.execute(
+            insert(Todo),
+            [
+                {"title": f"todo {i}", "completed": i % 2 == 0, "user_id": i % 50 + 1}
+                for i in range(ROWS)
+            ],
+        )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with sessions() as db:
+        users = UserService(db)
+        todos = TodoService(db, users)
+        compiled: dict = {}
+
+        todo_params = itertools.cycle(TODO_PARAMS)
+        user_params = itertools.cycle(USER_PARAMS)
+
+        results = {
+            "todos: build + cache key (legacy)": await common.measure(
+                construction_case(legacy_todo_statements, todos, TODO_PARAMS, compiled)
+            ),
+            "todos: cached shape": await common.measure(
+                construction_case(cached_todo_statements, todos, TODO_PARAMS, compiled)
+            ),
+            "users: build + cache key (legacy)": await common.measure(
+                construction_case(legacy_user_statements, users, USER_PARAMS, compiled)
+            ),
+            "users: cached shape": await common.measure(
+                construction_case(cached_user_statements, users, USER_PARAMS, compiled)
+            ),
+            "todos: TodoService.list_with_users": await common.measure(
+                lambda: todos.list_with_users(next(todo_params)), number=200
+            ),
+            "users: UserService.list": await common.measure(
+                lambda: users.list(next(user_params)), number=200
+            ),
+        }
+    common.report(results)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""Compare load-then-mutate writes with single-statement UPDATE/DELETE.
+
+Run from the repository root:
+
+    python benchmarks/bench_writes.py
+"""
+
+import asyncio
+import itertools
+
+import common
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from features.todos.models import Todo
+from features.todos.schemas.base import TodoUpdate
+from features.todos.services import TodoService
+from features.users.services import UserService
+
+ROWS = 5_000
+
+
+async def legacy_update(db: AsyncSession, todo_id: int, todo_update: TodoUpdate):
+    todo = await db.get(Todo, todo_id)
+    if not todo:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    for field, value in todo_update.model_dump(exclude_unset=True).items():
+        setattr(todo, field, value)
+    await db.flush()
+    return todo
+
+
+async def legacy_delete(db: AsyncSession, todo_id: int):
+    todo = await db.get(Todo, todo_id)
+    if not todo:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    await db.delete(todo)
+    await db.flush()
+
+
+async def main() -> None:
+    engine = await common.memory_engine()
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(Todo),
+            [{"title": f"todo {i}", "completed": False} for i in range(ROWS)],
+        )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    ids = itertools.cycle(range(1, ROWS + 1))
+    payload = TodoUpdate(title="renamed", completed=True)
+
+    async def run_in_transaction(operation):
+        # Fresh session per operation, like one request, so neither path
+        # benefits from a warm identity map.
+        async with sessions() as db, db.begin():
+            await operation(db)
+
+    async def legacy_update_case():
+        await run_in_transaction(lambda db: legacy_update(db, next(ids), payload))
+
+    async def direct_update_case():
+        await run_in_transaction(
+            lambda db: TodoService(db, UserService(db)).update(next(ids), payload)
+        )
+
+    delete_ids = iter(range(1, ROWS + 1))
+
+    async def legacy_delete_case():
+        await run_in_transaction(lambda db: legacy_delete(db, next(delete_ids)))
+
+    async def direct_delete_case():
+        await run_in_transaction(
+            lambda db: TodoService(db, UserService(db)).delete(next(delete_ids))
+        )
+
+    results = {
+        "update: get + setattr + flush": await common.measure(
+            legacy_update_case, number=500
+        ),
+        "update: UPDATE ... RETURNING": await common.measure(
+            direct_update_case, number=500
+        ),
+        "delete: get + session.delete": await common.measure(
+            legacy_delete_case, number=200, repeat=5
+        ),
+        "delete: DELETE ... RETURNING": await common.measure(
+            direct_delete_case, number=200, repeat=5
+        ),
+    }
+    common.report(results)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
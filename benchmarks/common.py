@@ -0,0 +1,241 @@
+"""Shared bootstrap, seeding, timing and baseline helpers for the benchmarks.
+
+Import this module before anything from `src/` so the import path and a
+throwaway database URL are configured the same way `tests/conftest.py` does.
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+os.environ.setdefault("DB_URL", "sqlite+aiosqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+# Local, per-machine results to compare later runs against; not committed.
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+WORDS = (
+    "review quarterly report draft invoice customer onboarding migrate legacy "
+    "service schedule meeting follow up vendor contract renew license update "
+    "docs fix flaky test deploy staging rotate credentials audit access plan "
+    "sprint triage backlog call supplier order hardware archive old tickets"
+).split()
+
+
+async def memory_engine() -> AsyncEngine:
+    """In-memory SQLite engine with the full schema, as in the test fixtures."""
+    from database import Base
+    import features.todos.models  # noqa: F401
+    import features.users.models  # noqa: F401
+
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Shape of a seeded dataset; the same values always give the same rows."""
+
+    users: int = 200
+    todos_per_user: int = 50
+    # Zipf exponent of todos per owner: 0 spreads them evenly, 1 and up
+    # gives a few owners most of the todos, as real tenants do.
+    skew: float = 1.1
+    # Longest description in characters; titles run up to a tenth of it.
+    text_length: int = 400
+    unowned_fraction: float = 0.05
+    completed_fraction: float = 0.3
+    seed: int = 1
+
+    @property
+    def todos(self) -> int:
+        return self.users * self.todos_per_user
+
+    def owner_weights(self) -> list[float]:
+        """Relative share of todos of each user, by user id order."""
+        return [1 / rank**self.skew for rank in range(1, self.users + 1)]
+
+
+def _text(rng: random.Random, length: int) -> str:
+    words: list[str] = []
+    size = -1
+    while size < length:
+        words.append(rng.choice(WORDS))
+        size += len(words[-1]) + 1
+    return " ".join(words)[:length].rstrip()
+
+
+async def seed(engine: AsyncEngine, dataset: Dataset) -> None:
+    """Recreate the schema on `engine` and fill it with `dataset`'s rows."""
+    from database import Base
+    from features.todos.models import Todo
+    from features.users.models import User
+
+    rng = random.Random(dataset.seed)
+    users = [
+        {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@example.com",
+            "full_name": _text(rng, rng.randint(5, 40)),
+            "is_active": rng.random() < 0.9,
+        }
+        for user_id in range(1, dataset.users + 1)
+    ]
+    owners = rng.choices(
+        range(1, dataset.users + 1), dataset.owner_weights(), k=dataset.todos
+    )
+    todos = [
+        {
+            "id": todo_id,
+            "title": _text(rng, rng.randint(8, max(dataset.text_length // 10, 8))),
+            "description": (
+                _text(rng, rng.randint(1, dataset.text_length))
+                if rng.random() < 0.8
+                else None
+            ),
+            "completed": rng.random() < dataset.completed_fraction,
+            "user_id": owner if rng.random() >= dataset.unowned_fraction else None,
+        }
+        for todo_id, owner in enumerate(owners, start=1)
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        # Core inserts on the tables; ORM bulk inserts refuse sharded sessions.
+        for table, rows in ((User.__table__, users), (Todo.__table__, todos)):
+            for start in range(0, len(rows), 1000):
+                await conn.execute(insert(table), rows[start : start + 1000])
+
+
+async def measure(
+    fn: Callable[[], Awaitable[object]], *, number: int = 1000, repeat: int = 5
+) -> dict[str, float]:
+    """Time `number` awaited calls of `fn`, `repeat` times; report µs per call."""
+    for _ in range(min(number, 100)):
+        await fn()
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        runs.append((time.perf_counter() - start) / number * 1_000_000)
+
+    return {"best_us": min(runs), "median_us": statistics.median(runs)}
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """p50/p95/p99 of `samples` (seconds), in milliseconds."""
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50_ms": value, "p95_ms": value, "p99_ms": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_baseline(
+    path: Path, metrics: dict[str, float], options: dict[str, Any]
+) -> None:
+    """Record `metrics` as the numbers later runs with `options` must meet."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "options": options,
+        "metrics": metrics,
+    }
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    print(f"Saved baseline to {path}")
+
+
+def check_baseline(
+    path: Path, metrics: dict[str, float], options: dict[str, Any], threshold: float
+) -> int:
+    """Compare `metrics` with the baseline at `path`; the script's exit code.
+
+    Times (`*_ms`, `*_us`) regress when they grow, and throughputs (`*_rps`)
+    when they shrink, by more than `threshold` (0.25 is 25%). Returns 1 on a
+    regression, 2 when the baseline was recorded with other options (the
+    numbers would not be comparable), and 0 otherwise, including when there
+    is no baseline yet.
+    """
+    if not path.exists():
+        print(f"No baseline at {path}; run with --save-baseline to record one.")
+        return 0
+    baseline = json.loads(path.read_text())
+    if baseline["options"] != options:
+        print(
+            f"Baseline {path} was recorded with other options:\n"
+            f"  baseline: {baseline['options']}\n  this run: {options}",
+            file=sys.stderr,
+        )
+        return 2
+
+    regressions = []
+    for name, value in metrics.items():
+        before = baseline["metrics"].get(name)
+        if not before:
+            continue
+        change = value / before - 1
+        if name.endswith("_rps"):
+            change = -change
+        elif not name.endswith(("_ms", "_us")):
+            continue
+        if change > threshold:
+            regressions.append((name, before, value, change))
+
+    print(
+        f"Compared with baseline from {baseline['commit'] or 'an unknown commit'}"
+        f" (threshold {threshold:.0%})"
+    )
+    for name, before, value, change in regressions:
+        print(f"  REGRESSION {name}: {before:.2f} -> {value:.2f} ({change:+.0%} worse)")
+    if regressions:
+        return 1
+    print("  no regressions")
+    return 0
+
+
+def report(results: dict[str, dict[str, float]]) -> None:
+    width = max(len(name) for name in results)
+    columns = list(next(iter(results.values())))
+    print(f"{'case':<{width}}  " + "  ".join(f"{c:>12}" for c in columns))
+    for name, row in results.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{row[c]:>12.2f}" for c in columns))
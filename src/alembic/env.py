@@ -25,11 +25,20 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from database import Base
+import features.changes.models  # noqa: F401
+import features.jobs.models  # noqa: F401
 import features.todos.models  # noqa: F401
 import features.users.models  # noqa: F401
 
 target_metadata = Base.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    # Checkpoints of `migrations.helpers.backfill` are tooling state, not
+    # part of the application schema; keep autogenerate from dropping them.
+    return not (type_ == "table" and name == "migration_checkpoints")
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +61,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -61,7 +71,14 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # One transaction per revision, so a chunked backfill that commits
+        # part-way never commits the revisions queued after it.
+        transaction_per_migration=True,
+    )
 
     with context.begin_transaction():
         context.run_migrations()
@@ -0,0 +1,34 @@
+"""cascade todo user fk
+
+Revision ID: 3f9a1c2b7d4e
+Revises: e38fa223f58e
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a1c2b7d4e"
+down_revision: Union[str, Sequence[str], None] = "e38fa223f58e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Recreate fk_todos_user_id with ON DELETE CASCADE."""
+    with op.batch_alter_table("todos", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_todos_user_id", type_="foreignkey")
+        batch_op.create_foreign_key(
+            "fk_todos_user_id", "users", ["user_id"], ["id"], ondelete="CASCADE"
+        )
+
+
+def downgrade() -> None:
+    """Restore fk_todos_user_id without a referential action."""
+    with op.batch_alter_table("todos", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_todos_user_id", type_="foreignkey")
+        batch_op.create_foreign_key("fk_todos_user_id", "users", ["user_id"], ["id"])
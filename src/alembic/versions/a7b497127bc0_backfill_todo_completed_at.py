@@ -0,0 +1,41 @@
+"""backfill todo completed_at
+
+Revision ID: a7b497127bc0
+Revises: b0b60f70142b
+Create Date: 2026-10-19 08:14:02.518204
+
+"""
+
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from migrations.helpers import backfill, clear_checkpoints
+from migrations.preflight import TableChange
+
+# revision identifiers, used by Alembic.
+revision: str = "a7b497127bc0"
+down_revision: Union[str, Sequence[str], None] = "b0b60f70142b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+table_changes = [TableChange("todos", "backfill")]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # When existing todos were completed is unknown; start their archive age
+    # at the upgrade rather than archiving them all at once.
+    backfill(
+        "todos",
+        {"completed_at": datetime.now(timezone.utc)},
+        revision=revision,
+        where=lambda todos: (
+            todos.c.completed.is_(True) & todos.c.completed_at.is_(None)
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    clear_checkpoints(revision)
+    # The column is dropped by the previous revision's downgrade.
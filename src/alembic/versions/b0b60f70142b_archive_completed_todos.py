@@ -0,0 +1,69 @@
+"""archive completed todos
+
+Revision ID: b0b60f70142b
+Revises: ca8ca50c56c0
+Create Date: 2026-10-19 08:09:11.393676
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_concurrently
+from migrations.preflight import TableChange
+
+# revision identifiers, used by Alembic.
+revision: str = "b0b60f70142b"
+down_revision: Union[str, Sequence[str], None] = "ca8ca50c56c0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+table_changes = [
+    TableChange("todos", "metadata"),
+    TableChange("todos", "index"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A nullable column without a default is a catalog-only change.
+    op.add_column(
+        "todos", sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True)
+    )
+    create_index_concurrently(op.f("ix_todos_completed_at"), "todos", ["completed_at"])
+    op.create_table(
+        "todos_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("completed", sa.Boolean(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+            name="fk_todos_archive_user_id",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_todos_archive_user_id"), "todos_archive", ["user_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_todos_archive_user_id"), table_name="todos_archive")
+    op.drop_table("todos_archive")
+    op.drop_index(op.f("ix_todos_completed_at"), table_name="todos")
+    with op.batch_alter_table("todos") as batch_op:
+        batch_op.drop_column("completed_at")
@@ -0,0 +1,50 @@
+"""todos autoincrement
+
+Revision ID: c4d81e5a2f60
+Revises: e41b7a9c3d25
+Create Date: 2026-10-19 09:05:48.271930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.preflight import TableChange
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d81e5a2f60"
+down_revision: Union[str, Sequence[str], None] = "e41b7a9c3d25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+table_changes = [TableChange("todos", "rewrite")]
+
+
+def upgrade() -> None:
+    """Stop SQLite from handing archived todo ids out again."""
+    # Other databases take ids from sequences, which never go back.
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "todos", recreate="always", table_kwargs={"sqlite_autoincrement": True}
+    ):
+        pass
+    # The copy only raised the counter to the highest live id; archived ids
+    # may be higher.
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'todos'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'todos', max("
+        "(SELECT coalesce(max(id), 0) FROM todos), "
+        "(SELECT coalesce(max(id), 0) FROM todos_archive))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "todos", recreate="always", table_kwargs={"sqlite_autoincrement": False}
+    ):
+        pass
@@ -1,16 +1,488 @@
-from sqlalchemy.engine import make_url
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
-from settings import settings
+import asyncio
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Awaitable, Callable
 
-engine = create_async_engine(settings.db_url, echo=settings.db_echo)
-local_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+from sqlalchemy import Column, DateTime, Integer, String, Table, event, exc, func
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import Request
+from logger import logger
+from metrics import registry
+from settings import PoolSettings, settings
+from sharding.router import PRIMARY_SHARD, ShardRouter
 
+# The pool of sessions from `get_db` and `local_session`, sized by the
+# `db_pool_size` settings; other pools come from `db_pools`.
+DEFAULT_POOL = "interactive"
+
+pool_checkouts_counter = registry.counter(
+    "app_db_pool_checkouts_total", "Connections checked out, per pool", ["pool"]
+)
+pool_wait_counter = registry.counter(
+    "app_db_pool_checkout_wait_seconds_total",
+    "Time spent checking out connections, per pool",
+    ["pool"],
+)
+pool_timeouts_counter = registry.counter(
+    "app_db_pool_timeouts_total",
+    "Checkouts that gave up after the pool timeout, per pool",
+    ["pool"],
+)
+pool_connections_gauge = registry.gauge(
+    "app_db_pool_connections",
+    "Pooled connections per pool, checked out or idle",
+    ["pool", "state"],
+)
+pool_capacity_gauge = registry.gauge(
+    "app_db_pool_capacity", "Pool size plus overflow, per pool", ["pool"]
+)
+
+
+class PoolWaitTracker:
+    """Accumulates how long checkouts waited for a pooled connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def drain(self) -> tuple[int, float]:
+        """Return (checkouts, worst wait) since the previous drain and reset."""
+        count, worst = self.count, self.max_seconds
+        self.count, self.total_seconds, self.max_seconds = 0, 0.0, 0.0
+        return count, worst
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout, including waits for a free slot.
+
+    Waits are tracked per named pool (the engine's `pool_logging_name`),
+    across the databases the pool spans.
+    """
+
+    waits: defaultdict[str, PoolWaitTracker] = defaultdict(PoolWaitTracker)
+
+    @property
+    def pool_name(self) -> str:
+        return self.logging_name or DEFAULT_POOL
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts_counter.inc(pool=self.pool_name)
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.waits[self.pool_name].record(waited)
+            pool_checkouts_counter.inc(pool=self.pool_name)
+            pool_wait_counter.inc(waited, pool=self.pool_name)
 
-async def get_db():
-    async with local_session() as session:
-        yield session
+
+def enable_sqlite_foreign_keys(db_engine: AsyncEngine) -> AsyncEngine:
+    """Have SQLite enforce foreign keys on `db_engine`'s connections.
+
+    SQLite ignores FOREIGN KEY clauses (and so ON DELETE CASCADE) unless
+    enabled per connection. Only the app's engines turn them on: migrations
+    rebuild tables with SQLite's default, off, so that rows an earlier
+    schema let through do not stop them.
+    """
+
+    @event.listens_for(db_engine.sync_engine, "connect")
+    def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+        if "sqlite" in type(dbapi_connection).__module__:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    return db_engine
+
+
+def pool_settings() -> dict[str, PoolSettings]:
+    """Every named pool's settings, the default pool's included."""
+    return {
+        DEFAULT_POOL: PoolSettings(
+            size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            timeout_seconds=settings.db_pool_timeout_seconds,
+        ),
+        **settings.db_pools,
+    }
+
+
+def _is_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def _engine_options(url: str, pool: str = DEFAULT_POOL) -> dict:
+    if _is_memory(url):
+        # In-memory SQLite keeps its single shared connection (StaticPool).
+        return {}
+    options = pool_settings()[pool]
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_logging_name": pool,
+        "pool_size": options.size,
+        "max_overflow": options.max_overflow,
+        "pool_timeout": options.timeout_seconds,
+    }
+
+
+def pool_status(db_engine: AsyncEngine) -> dict[str, int]:
+    """Point-in-time pool occupancy; empty for pools without a fixed size."""
+    pool = db_engine.sync_engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
 
 
 class Base(DeclarativeBase):
     pass
+
+
+# Sharding bookkeeping; only the primary database's copies are used.
+shard_map = Table(
+    "shard_map",
+    Base.metadata,
+    Column("user_id", Integer, primary_key=True, autoincrement=False),
+    Column("shard", String, nullable=False),
+    Column(
+        "assigned_at",
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    ),
+)
+id_allocations = Table(
+    "id_allocations",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+
+def _create_engine(url: str, pool: str = DEFAULT_POOL) -> AsyncEngine:
+    return enable_sqlite_foreign_keys(
+        create_async_engine(url, echo=settings.db_echo, **_engine_options(url, pool))
+    )
+
+
+def _create_shard_engine(url: str, pool: str = DEFAULT_POOL) -> AsyncEngine:
+    shard_engine = create_async_engine(
+        url, echo=settings.db_echo, **_engine_options(url, pool)
+    )
+
+    @event.listens_for(shard_engine.sync_engine, "connect")
+    def _disable_sqlite_foreign_keys(dbapi_connection, connection_record) -> None:
+        # Owners live on the primary, so a shard cannot check `user_id`;
+        # `UserService` deletes a user's rows on the shards itself.
+        if "sqlite" in type(dbapi_connection).__module__:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=OFF")
+            cursor.close()
+
+    return shard_engine
+
+
+def _create_pool_engines(
+    url: str, create: Callable[[str, str], AsyncEngine]
+) -> dict[str, AsyncEngine]:
+    """An engine per named pool on the database at `url`."""
+    if _is_memory(url):
+        # Each engine would open its own, empty database.
+        return dict.fromkeys(pool_settings(), create(url, DEFAULT_POOL))
+    return {pool: create(url, pool) for pool in pool_settings()}
+
+
+def _create_engines() -> dict[str, dict[str, AsyncEngine]]:
+    """Engines by pool, then by shard, the primary database first."""
+    engines: dict[str, dict[str, AsyncEngine]] = {pool: {} for pool in pool_settings()}
+    databases = {PRIMARY_SHARD: settings.db_url, **settings.db_shards}
+    for shard, url in databases.items():
+        create = _create_engine if shard == PRIMARY_SHARD else _create_shard_engine
+        for pool, pooled_engine in _create_pool_engines(url, create).items():
+            engines[pool][shard] = pooled_engine
+    return engines
+
+
+pool_engines = _create_engines()
+
+engine = pool_engines[DEFAULT_POOL][PRIMARY_SHARD]
+shard_router = ShardRouter(
+    pool_engines[DEFAULT_POOL],
+    shard_map=shard_map,
+    id_allocations=id_allocations,
+    sharded_tables=["todos", "todos_archive"],
+    vnodes=settings.shard_ring_vnodes,
+    cache_size=settings.shard_map_cache_size,
+    cache_seconds=settings.shard_map_cache_seconds,
+)
+
+
+def _session_factory(engines: dict[str, AsyncEngine]) -> async_sessionmaker:
+    if shard_router.enabled:
+        return async_sessionmaker(
+            class_=AsyncSession,
+            expire_on_commit=False,
+            **shard_router.session_options(engines),
+        )
+    return async_sessionmaker(
+        engines[PRIMARY_SHARD], class_=AsyncSession, expire_on_commit=False
+    )
+
+
+pool_sessions = {
+    pool: _session_factory(engines) for pool, engines in pool_engines.items()
+}
+local_session = pool_sessions[DEFAULT_POOL]
+
+
+def pool_engine(pool: str) -> AsyncEngine:
+    """The primary database's engine for `pool`, or the default pool's."""
+    return pool_engines.get(pool, pool_engines[DEFAULT_POOL])[PRIMARY_SHARD]
+
+
+def pool_session(pool: str) -> async_sessionmaker[AsyncSession]:
+    """Sessions on `pool`; pools missing from `db_pools` use the default."""
+    return pool_sessions.get(pool, local_session)
+
+
+async def dispose_engines() -> None:
+    disposed = set()
+    for engines in pool_engines.values():
+        for pooled_engine in engines.values():
+            if pooled_engine not in disposed:
+                disposed.add(pooled_engine)
+                await pooled_engine.dispose()
+
+
+def _collect_pool_metrics() -> None:
+    for pool, engines in pool_engines.items():
+        statuses = [
+            pool_status(pooled_engine) for pooled_engine in set(engines.values())
+        ]
+        statuses = [status for status in statuses if status]
+        if not statuses:
+            continue
+        for state in ("checked_out", "checked_in"):
+            pool_connections_gauge.set(
+                sum(status[state] for status in statuses), pool=pool, state=state
+            )
+        pool_capacity_gauge.set(
+            sum(status["size"] + status["max_overflow"] for status in statuses),
+            pool=pool,
+        )
+
+
+registry.add_collector(_collect_pool_metrics)
+
+
+# Session.info key for tasks still using the session; see `track_session_task`.
+_SESSION_TASKS = "session_tasks"
+
+# Sessions opened while serving the current request, when the route tracks
+# them (see `features.common.routing.SessionReleaseRoute`).
+_request_sessions: ContextVar[list[AsyncSession] | None] = ContextVar(
+    "request_sessions", default=None
+)
+
+
+def track_session(session: AsyncSession) -> None:
+    """Register `session` for early release at the end of the endpoint."""
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(session)
+
+
+def track_session_task(session: AsyncSession, task: asyncio.Task) -> None:
+    """Have `release_request_sessions` end `task` before closing `session`.
+
+    For work the request starts on its session in a task of its own, such as
+    a batch load, which could otherwise still be querying once it is closed.
+    """
+    tasks = session.info.setdefault(_SESSION_TASKS, set())
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+def start_session_tracking() -> object:
+    return _request_sessions.set([])
+
+
+def stop_session_tracking(token) -> None:
+    _request_sessions.reset(token)
+
+
+async def release_request_sessions() -> None:
+    """Return the current request's pooled connections to the pool now.
+
+    Closing ends any open transaction (a no-op after `db.begin()` blocks have
+    committed) and detaches loaded objects, whose already-loaded attributes
+    stay readable for response serialization. Tasks still using a session
+    are cancelled first; nobody is left to wait for their results.
+    """
+    sessions = _request_sessions.get()
+    while sessions:
+        session = sessions.pop()
+        tasks = session.info.pop(_SESSION_TASKS, set())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await session.close()
+
+
+# The current request's deadline (`time.monotonic()`) and the statements its
+# connections are running, as (DBAPI connection, SQL) by connection; see
+# `features.common.routing.SessionReleaseRoute`.
+_request_deadline: ContextVar[float | None] = ContextVar(
+    "request_deadline", default=None
+)
+_request_statements: ContextVar[dict[object, tuple[object, str]] | None] = ContextVar(
+    "request_statements", default=None
+)
+
+
+def start_deadline(deadline: float | None) -> tuple[object, object]:
+    """Track the current request's statements, bounded by `deadline` if set."""
+    return _request_deadline.set(deadline), _request_statements.set({})
+
+
+def stop_deadline(tokens: tuple[object, object]) -> None:
+    deadline_token, statements_token = tokens
+    _request_deadline.reset(deadline_token)
+    _request_statements.reset(statements_token)
+
+
+def interrupt_request_statements() -> list[str]:
+    """Abort the statements the current request is running; returns them.
+
+    SQLite statements are interrupted from here, since the driver thread
+    would otherwise finish them before the connection can be released.
+    Other drivers cancel the statement themselves when the awaiting task is
+    cancelled, and PostgreSQL also enforces the deadline as
+    `statement_timeout`.
+    """
+    statements = list((_request_statements.get() or {}).values())
+    for dbapi_connection, _ in statements:
+        driver = getattr(dbapi_connection, "driver_connection", None)
+        # aiosqlite's own interrupt() would queue behind the running statement.
+        sqlite_connection = getattr(driver, "_conn", None)
+        if sqlite_connection is not None:
+            sqlite_connection.interrupt()
+    return [statement for _, statement in statements]
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _track_request_statement(
+    conn, cursor, statement, parameters, context, executemany
+) -> None:
+    statements = _request_statements.get()
+    if statements is not None:
+        statements[conn] = (conn.connection.dbapi_connection, statement)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _untrack_request_statement(
+    conn, cursor, statement, parameters, context, executemany
+) -> None:
+    statements = _request_statements.get()
+    if statements is not None:
+        statements.pop(conn, None)
+
+
+@event.listens_for(Engine, "handle_error")
+def _untrack_failed_statement(exception_context) -> None:
+    statements = _request_statements.get()
+    if statements is not None:
+        statements.pop(exception_context.connection, None)
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_statement_timeout(session: Session, transaction, connection) -> None:
+    deadline = _request_deadline.get()
+    if deadline is None or connection.dialect.name != "postgresql":
+        return
+    remaining_ms = max(int((deadline - time.monotonic()) * 1000), 1)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {remaining_ms}")
+
+
+# Session.info key for callbacks waiting on the current transaction's commit.
+_AFTER_COMMIT = "after_commit_callbacks"
+
+
+def call_after_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Run `callback` once the session's current transaction commits.
+
+    Callbacks are dropped on rollback, so side effects such as notifying
+    other clients never announce writes that did not happen. They run
+    synchronously inside the commit and must not block.
+    """
+    session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop(_AFTER_COMMIT, ()):
+        try:
+            callback()
+        except Exception:
+            # The transaction is already committed; a failing listener must
+            # not turn it into an error for the caller.
+            logger.exception("after-commit callback failed")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_after_commit_callbacks(session: Session, previous_transaction) -> None:
+    if session.in_transaction():
+        # Only a savepoint rolled back; the outer transaction may still commit.
+        return
+    session.info.pop(_AFTER_COMMIT, None)
+
+
+def use_pool(pool: str) -> Callable[[Request], Awaitable[None]]:
+    """Dependency giving the route's `get_db` sessions a connection from `pool`.
+
+    Declare it on the route, ahead of the dependencies needing a session:
+    `dependencies=[Depends(use_pool("bulk"))]`.
+    """
+
+    async def select_pool(request: Request) -> None:
+        request.state.db_pool = pool
+
+    select_pool.__name__ = f"use_{pool}_pool"
+    return select_pool
+
+
+async def get_db(request: Request):
+    # AsyncSession checks out a connection lazily, on its first statement, so
+    # requests that never query hold no pool slot.
+    pool = getattr(request.state, "db_pool", DEFAULT_POOL)
+    async with pool_session(pool)() as session:
+        track_session(session)
+        yield session
@@ -1,16 +1,148 @@
-from fastapi.security import HTTPBearer
-from fastapi import Depends, HTTPException
+import time
+from typing import Any
 
-security = HTTPBearer()
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from features.common.cache import TTLCache
+from settings import settings
 
-def authenticate_token(token: str) -> bool:
-    # Placeholder for token authentication logic
-    return token == "Nina"
+from .jwt import InvalidTokenError, KeySet, decode
 
+security = HTTPBearer(auto_error=False)
 
-async def get_current_user(credentials=Depends(security)):
-    token = credentials.credentials
-    if not authenticate_token(token):
+Principal = dict[str, Any]
+
+# Principal returned for the development tokens listed in `auth_static_tokens`.
+STATIC_PRINCIPAL: Principal = {"user_id": 1, "username": "testuser"}
+
+
+class TokenVerifier:
+    """Verifies bearer tokens locally and caches the outcome.
+
+    Valid tokens are cached until the earlier of their `exp` claim and the
+    configured TTL; rejected tokens are cached for a shorter negative TTL so
+    replayed garbage does not pay for signature checks either.
+    """
+
+    def __init__(
+        self,
+        keys: KeySet,
+        *,
+        static_tokens: list[str] | None = None,
+        issuer: str | None = None,
+        audience: str | None = None,
+        leeway: float = 0,
+        cache_size: int = 10_000,
+        cache_ttl: float = 300,
+        negative_cache_ttl: float = 30,
+    ):
+        self.keys = keys
+        self.static_tokens = frozenset(static_tokens or ())
+        self.issuer = issuer
+        self.audience = audience
+        self.leeway = leeway
+        self.verified: TTLCache[str, Principal] = TTLCache(cache_size, cache_ttl)
+        self.rejected: TTLCache[str, str] = TTLCache(cache_size, negative_cache_ttl)
+
+    def verify(self, token: str) -> Principal:
+        principal = self.verified.get(token)
+        if principal is not None:
+            return principal
+
+        reason = self.rejected.get(token)
+        if reason is not None:
+            raise InvalidTokenError(reason)
+
+        try:
+            principal, ttl = self._verify_uncached(token)
+        except InvalidTokenError as exc:
+            self.rejected.set(token, str(exc))
+            raise
+
+        self.verified.set(token, principal, ttl)
+        return principal
+
+    def _verify_uncached(self, token: str) -> tuple[Principal, float | None]:
+        if token in self.static_tokens:
+            return STATIC_PRINCIPAL, None
+        if not self.keys:
+            raise InvalidTokenError("Token verification is not configured")
+
+        claims = decode(
+            token,
+            self.keys,
+            issuer=self.issuer,
+            audience=self.audience,
+            leeway=self.leeway,
+        )
+        subject = claims.get("sub")
+        if subject is None:
+            raise InvalidTokenError("Token is missing a subject")
+
+        principal: Principal = {
+            "user_id": int(subject) if str(subject).isdigit() else subject,
+            "username": claims.get("preferred_username", subject),
+            "claims": claims,
+        }
+        exp = claims.get("exp")
+        ttl = exp + self.leeway - time.time() if exp is not None else None
+        return principal, ttl
+
+
+verifier = TokenVerifier(
+    KeySet(settings.auth_jwt_keys, settings.auth_jwt_algorithms),
+    static_tokens=settings.auth_static_tokens,
+    issuer=settings.auth_jwt_issuer,
+    audience=settings.auth_jwt_audience,
+    leeway=settings.auth_jwt_leeway_seconds,
+    cache_size=settings.auth_cache_size,
+    cache_ttl=settings.auth_cache_ttl_seconds,
+    negative_cache_ttl=settings.auth_negative_cache_ttl_seconds,
+)
+
+PUBLIC_PATHS = frozenset(settings.auth_public_paths)
+ADMIN_USERNAMES = frozenset(settings.auth_admin_usernames)
+
+
+def authenticate_token(token: str) -> Principal | None:
+    try:
+        return verifier.verify(token)
+    except InvalidTokenError:
+        return None
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+) -> Principal | None:
+    if request.scope["path"] in PUBLIC_PATHS:
+        return None
+
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    principal = authenticate_token(credentials.credentials)
+    if principal is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return {"user_id": 1, "username": "testuser"}
+
+    request.state.principal = principal
+    return principal
+
+
+def is_admin(principal: Principal | None) -> bool:
+    return principal is not None and principal.get("username") in ADMIN_USERNAMES
+
+
+async def require_admin(
+    principal: Principal | None = Depends(get_current_user),
+) -> Principal:
+    if not is_admin(principal):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required"
+        )
+    return principal
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Iterable, Mapping
+
+_ALGORITHMS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+class InvalidTokenError(Exception):
+    """Raised when a token is malformed, badly signed or not currently valid."""
+
+
+class KeySet:
+    """Preloaded HMAC verification keys, indexed by `kid`.
+
+    Keys are loaded once at startup so verification never performs I/O. A
+    token without a `kid` header is accepted only when the set holds exactly
+    one key.
+    """
+
+    def __init__(
+        self,
+        keys: Mapping[str, str | bytes],
+        algorithms: Iterable[str] = ("HS256",),
+    ):
+        unsupported = set(algorithms) - _ALGORITHMS.keys()
+        if unsupported:
+            raise ValueError(f"Unsupported JWT algorithms: {sorted(unsupported)}")
+        self.algorithms = frozenset(algorithms)
+        self._keys = {
+            kid: key.encode() if isinstance(key, str) else key
+            for kid, key in keys.items()
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self._keys)
+
+    def key_for(self, kid: str | None) -> bytes:
+        if kid is None:
+            if len(self._keys) == 1:
+                return next(iter(self._keys.values()))
+            raise InvalidTokenError("Token is missing a key id")
+        try:
+            return self._keys[kid]
+        except KeyError:
+            raise InvalidTokenError("Unknown signing key") from None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(segment: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+    except (ValueError, TypeError):
+        raise InvalidTokenError("Malformed token") from None
+
+
+def _numeric_claim(claims: Mapping[str, Any], name: str) -> float | None:
+    value = claims.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidTokenError(f"Invalid '{name}' claim")
+    return float(value)
+
+
+def _sign(signing_input: bytes, key: bytes, algorithm: str) -> bytes:
+    return hmac.new(key, signing_input, _ALGORITHMS[algorithm]).digest()
+
+
+def encode(
+    claims: Mapping[str, Any],
+    key: str | bytes,
+    *,
+    algorithm: str = "HS256",
+    kid: str | None = None,
+) -> str:
+    """Sign `claims` into a compact JWT (used by tests, tooling and benchmarks)."""
+    if algorithm not in _ALGORITHMS:
+        raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+    header: dict[str, str] = {"alg": algorithm, "typ": "JWT"}
+    if kid is not None:
+        header["kid"] = kid
+    signing_input = ".".join(
+        _b64encode(json.dumps(part, separators=(",", ":")).encode())
+        for part in (header, dict(claims))
+    ).encode("ascii")
+    key_bytes = key.encode() if isinstance(key, str) else key
+    signature = _b64encode(_sign(signing_input, key_bytes, algorithm))
+    return f"{signing_input.decode('ascii')}.{signature}"
+
+
+def decode(
+    token: str,
+    keys: KeySet,
+    *,
+    issuer: str | None = None,
+    audience: str | None = None,
+    leeway: float = 0,
+    now: float | None = None,
+) -> dict[str, Any]:
+    """Verify `token` locally against `keys` and return its claims."""
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+    except ValueError:
+        raise InvalidTokenError("Malformed token") from None
+
+    try:
+        header = json.loads(_b64decode(header_segment))
+        claims = json.loads(_b64decode(payload_segment))
+    except ValueError:
+        raise InvalidTokenError("Malformed token") from None
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise InvalidTokenError("Malformed token")
+
+    algorithm, kid = header.get("alg"), header.get("kid")
+    if not isinstance(algorithm, str) or algorithm not in keys.algorithms:
+        raise InvalidTokenError("Disallowed signing algorithm")
+    if kid is not None and not isinstance(kid, str):
+        raise InvalidTokenError("Malformed token")
+
+    signing_input = f"{header_segment}.{payload_segment}".encode("ascii")
+    expected = _sign(signing_input, keys.key_for(kid), algorithm)
+    if not hmac.compare_digest(expected, _b64decode(signature_segment)):
+        raise InvalidTokenError("Signature verification failed")
+
+    now = time.time() if now is None else now
+    exp = _numeric_claim(claims, "exp")
+    if exp is not None and now > exp + leeway:
+        raise InvalidTokenError("Token has expired")
+    nbf = _numeric_claim(claims, "nbf")
+    if nbf is not None and now < nbf - leeway:
+        raise InvalidTokenError("Token is not yet valid")
+    if issuer is not None and claims.get("iss") != issuer:
+        raise InvalidTokenError("Invalid issuer")
+    if audience is not None:
+        aud = claims.get("aud")
+        audiences = aud if isinstance(aud, list) else [aud]
+        if audience not in audiences:
+            raise InvalidTokenError("Invalid audience")
+
+    return claims
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from database import Base
+from sqlalchemy import DateTime, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class ChangeLogEntry(Base):
+    """One create/update/delete of a row, appended in the writer's transaction.
+
+    `id` is the sync cursor: it only grows, so "changes since N" is a range
+    scan. Entries carry no foreign key, as they must outlive deleted rows.
+    """
+
+    __tablename__ = "change_log"
+    __table_args__ = (Index("ix_change_log_entity_id", "entity", "id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    entity: Mapped[str] = mapped_column(nullable=False)
+    entity_id: Mapped[int] = mapped_column(nullable=False)
+    operation: Mapped[str] = mapped_column(nullable=False)
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+class ChangeLogCompaction(Base):
+    """Watermarks of compaction runs; cursors below one cannot resume."""
+
+    __tablename__ = "change_log_compactions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    pruned_through: Mapped[int] = mapped_column(nullable=False)
+    compacted_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -0,0 +1,23 @@
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+
+class ChangeEntity(str, Enum):
+    todo = "todo"
+    user = "user"
+
+
+class ChangeOperation(str, Enum):
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+
+class ChangeSet(BaseModel):
+    cursor: int = Field(description="Pass as `since` to fetch the next delta")
+    changed: list[int] = Field(description="Ids created or updated since the cursor")
+    deleted: list[int] = Field(
+        description="Ids deleted, or archived out of the live list, since the cursor"
+    )
+    has_more: bool = Field(description="More changes are waiting past `cursor`")
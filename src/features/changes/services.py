@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from database import pool_session, shard_router
+from fastapi import HTTPException
+from features.common.periodic import PeriodicTask
+from logger import logger
+from settings import settings
+from sqlalchemy import delete, event, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from .models import ChangeLogCompaction, ChangeLogEntry
+from .schemas import ChangeEntity, ChangeOperation, ChangeSet
+
+# Session.info key holding created objects whose ids are not known until flush.
+_PENDING_CREATED = "change_log_pending_created"
+
+
+@event.listens_for(Session, "after_flush")
+def _log_created_rows(session: Session, flush_context) -> None:
+    pending = session.info.get(_PENDING_CREATED)
+    if not pending:
+        return
+
+    rows, unflushed = [], []
+    for entity, obj in pending:
+        if obj.id is None:
+            unflushed.append((entity, obj))
+        else:
+            rows.append(
+                {
+                    "entity": entity.value,
+                    "entity_id": obj.id,
+                    "operation": ChangeOperation.created.value,
+                }
+            )
+    session.info[_PENDING_CREATED] = unflushed
+    if rows:
+        # Same transaction as the rows just inserted (on the primary, when
+        # those rows went to a shard).
+        session.connection(
+            bind_arguments={"mapper": ChangeLogEntry.__mapper__}
+        ).execute(insert(ChangeLogEntry.__table__), rows)
+
+
+class ChangeLog:
+    """Append-only change log written through the caller's session.
+
+    Entries share the transaction of the write they describe, so a rolled
+    back write leaves no entry behind and a committed one always has one.
+
+    Cursors are entry ids, which assumes entries commit in id order. SQLite
+    serializes writers, so they do. On databases with concurrent writers,
+    such as PostgreSQL, a transaction holding a lower id can commit after a
+    reader has moved its cursor past it, and that reader misses the entry.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def record_created(self, entity: ChangeEntity, obj: Any) -> None:
+        """Log the creation of `obj` as soon as its insert is flushed."""
+        self.db.info.setdefault(_PENDING_CREATED, []).append((entity, obj))
+
+    async def record(
+        self, entity: ChangeEntity, ids: Iterable[int], operation: ChangeOperation
+    ) -> None:
+        rows = [
+            {
+                "entity": entity.value,
+                "entity_id": entity_id,
+                "operation": operation.value,
+            }
+            for entity_id in ids
+        ]
+        if rows:
+            # The table, not the entity: ORM bulk inserts refuse sharded
+            # sessions.
+            await self.db.execute(insert(ChangeLogEntry.__table__), rows)
+
+    async def record_matching(
+        self,
+        entity: ChangeEntity,
+        id_column: InstrumentedAttribute[int],
+        where: ColumnElement[bool],
+        operation: ChangeOperation,
+    ) -> None:
+        """Log every row matching `where` with one `INSERT ... SELECT`.
+
+        For writes the database fans out itself, such as cascading deletes.
+        Sharded rows live apart from the log, so their ids are read first.
+        """
+        if shard_router.enabled:
+            ids = await self.db.scalars(select(id_column).where(where))
+            await self.record(entity, ids, operation)
+            return
+
+        rows = select(literal(entity.value), id_column, literal(operation.value)).where(
+            where
+        )
+        await self.db.execute(
+            insert(ChangeLogEntry).from_select(
+                ["entity", "entity_id", "operation"], rows
+            )
+        )
+
+    async def head(self) -> int:
+        return int(await self.db.scalar(select(func.max(ChangeLogEntry.id))) or 0)
+
+    async def since(self, entity: ChangeEntity, cursor: int, limit: int) -> ChangeSet:
+        """Net changes to `entity` after `cursor`, at most `limit` log entries.
+
+        Several entries for one id collapse into its latest state, so a
+        client only learns whether to refetch or drop each id.
+        """
+        watermark = await self.db.scalar(
+            select(func.max(ChangeLogCompaction.pruned_through))
+        )
+        if watermark is not None and cursor < watermark:
+            raise HTTPException(
+                status_code=410,
+                detail="Cursor is older than the change log; resync the full list",
+            )
+
+        rows = (
+            await self.db.execute(
+                select(
+                    ChangeLogEntry.id,
+                    ChangeLogEntry.entity_id,
+                    ChangeLogEntry.operation,
+                )
+                .where(
+                    ChangeLogEntry.entity == entity.value, ChangeLogEntry.id > cursor
+                )
+                .order_by(ChangeLogEntry.id)
+                .limit(limit + 1)
+            )
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        latest: dict[int, str] = {}
+        for _, entity_id, operation in rows:
+            latest.pop(entity_id, None)
+            latest[entity_id] = operation
+
+        deleted = ChangeOperation.deleted.value
+        return ChangeSet(
+            cursor=rows[-1].id if rows else cursor,
+            changed=[i for i, operation in latest.items() if operation != deleted],
+            deleted=[i for i, operation in latest.items() if operation == deleted],
+            has_more=has_more,
+        )
+
+
+async def compact_change_log(
+    *,
+    retention_seconds: float,
+    chunk_size: int = 1000,
+    session_factory: async_sessionmaker[AsyncSession] = pool_session("bulk"),
+) -> int:
+    """Prune entries older than the retention window, in chunks.
+
+    Records the highest id to prune as a watermark before deleting anything,
+    so clients holding an older cursor get `410` and fall back to a full
+    resync even while pruning runs or after it failed halfway. Returns
+    entries removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+    async with session_factory() as db:
+        through = await db.scalar(
+            select(func.max(ChangeLogEntry.id)).where(
+                ChangeLogEntry.changed_at < cutoff
+            )
+        )
+    if through is None:
+        return 0
+
+    async with session_factory() as db, db.begin():
+        db.add(ChangeLogCompaction(pruned_through=through))
+
+    removed = 0
+    while True:
+        async with session_factory() as db, db.begin():
+            chunk = (
+                select(ChangeLogEntry.id)
+                .where(ChangeLogEntry.id <= through)
+                .limit(chunk_size)
+            )
+            deleted = (
+                await db.scalars(
+                    delete(ChangeLogEntry)
+                    .where(ChangeLogEntry.id.in_(chunk))
+                    .returning(ChangeLogEntry.id)
+                )
+            ).all()
+        removed += len(deleted)
+        if len(deleted) < chunk_size:
+            break
+
+    await logger.ainfo(
+        f"Compacted {removed} change log entries", pruned_through=through
+    )
+    return removed
+
+
+class ChangeLogCompactor:
+    """Runs `compact_change_log` periodically for the app's lifetime."""
+
+    def __init__(self, *, interval: float, retention_seconds: float, chunk_size: int):
+        self.retention_seconds = retention_seconds
+        self.chunk_size = chunk_size
+        self._runner = PeriodicTask(
+            self._compact, interval=interval, name="Change log compaction"
+        )
+
+    def start(self) -> None:
+        self._runner.start()
+
+    async def stop(self) -> None:
+        await self._runner.stop()
+
+    async def _compact(self) -> None:
+        await compact_change_log(
+            retention_seconds=self.retention_seconds, chunk_size=self.chunk_size
+        )
+
+
+change_log_compactor = ChangeLogCompactor(
+    interval=settings.change_log_compaction_interval_seconds,
+    retention_seconds=settings.change_log_retention_seconds,
+    chunk_size=settings.change_log_compaction_chunk_size,
+)
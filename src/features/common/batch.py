@@ -0,0 +1,54 @@
+from typing import Annotated, Generic, TypeVar
+
+from fastapi import Query
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field
+
+from settings import settings
+
+T = TypeVar("T")
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: list[T] = Field(description="Found rows, in the requested order")
+    missing: list[int] = Field(description="Requested ids that do not exist")
+
+
+def batch_ids(
+    ids: Annotated[
+        str,
+        Query(
+            description=(
+                "Comma-separated ids, at most "
+                f"{settings.batch_max_ids}; duplicates are ignored"
+            ),
+            examples=["3,1,2"],
+        ),
+    ],
+) -> list[int]:
+    """Parse `?ids=3,1,2` into unique ids, keeping the requested order."""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        parsed = None
+
+    error = None
+    if not parsed or any(value < 1 for value in parsed):
+        error = "Expected a comma-separated list of positive integer ids"
+    else:
+        parsed = list(dict.fromkeys(parsed))
+        if len(parsed) > settings.batch_max_ids:
+            error = f"At most {settings.batch_max_ids} ids per request"
+
+    if error:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("query", "ids"),
+                    "msg": error,
+                    "input": ids,
+                }
+            ]
+        )
+    return parsed
@@ -0,0 +1,155 @@
+"""Sparse fieldsets: `?fields=id,title,user.username`."""
+
+from types import UnionType
+from typing import Annotated, Any, Callable, Union, get_args, get_origin
+
+from fastapi import Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+
+def _nested_schema(annotation: Any) -> type[BaseModel] | None:
+    """The model behind a relation field such as `UserRead | None`."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    if get_origin(annotation) in (Union, UnionType):
+        for arg in get_args(annotation):
+            nested = _nested_schema(arg)
+            if nested is not None:
+                return nested
+    return None
+
+
+def selectable_fields(schema: type[BaseModel]) -> list[str]:
+    """Every name `fields=` accepts for `schema`, nested ones dotted."""
+    names: list[str] = []
+    for name, field in schema.model_fields.items():
+        names.append(name)
+        nested = _nested_schema(field.annotation)
+        if nested is not None:
+            names.extend(f"{name}.{sub}" for sub in nested.model_fields)
+    return names
+
+
+class FieldSelection:
+    """A validated `fields=` selection against a response schema.
+
+    `columns` are the requested scalar fields, in request order. `nested` maps
+    a relation field to the names requested from it; naming the relation bare
+    selects all of its fields.
+    """
+
+    def __init__(self, columns: tuple[str, ...], nested: dict[str, tuple[str, ...]]):
+        self.columns = columns
+        self.nested = nested
+        # Part of the list statement cache key: the load options differ.
+        self.key = (columns, tuple(nested.items()))
+
+    @classmethod
+    def parse(cls, raw: str, schema: type[BaseModel]) -> "FieldSelection":
+        columns: dict[str, None] = {}
+        nested: dict[str, dict[str, None]] = {}
+        unknown: list[str] = []
+
+        for name in filter(None, (part.strip() for part in raw.split(","))):
+            head, _, tail = name.partition(".")
+            field = schema.model_fields.get(head)
+            nested_schema = _nested_schema(field.annotation) if field else None
+            if field is None or (tail and nested_schema is None):
+                unknown.append(name)
+            elif nested_schema is None:
+                columns[head] = None
+            elif not tail:
+                nested[head] = dict.fromkeys(nested_schema.model_fields)
+            elif tail in nested_schema.model_fields:
+                nested.setdefault(head, {})[tail] = None
+            else:
+                unknown.append(name)
+
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if not columns and not nested:
+            raise ValueError("Select at least one field")
+        return cls(tuple(columns), {k: tuple(v) for k, v in nested.items()})
+
+    def load_options(self, model: Any) -> list:
+        """ORM options that load only the selected columns and relations.
+
+        `model` may also be an `aliased()` entity, as listed from a subquery.
+        """
+        mapper = inspect(model).mapper
+        attributes = [getattr(model, column.key) for column in mapper.primary_key]
+        attributes.extend(getattr(model, name) for name in self.columns)
+
+        options = []
+        for name, names in self.nested.items():
+            relationship = mapper.relationships[name]
+            # The foreign key is needed to load the related rows at all.
+            attributes.extend(
+                getattr(model, mapper.get_property_by_column(column).key)
+                for column in relationship.local_columns
+            )
+            target = relationship.mapper.class_
+            options.append(
+                selectinload(getattr(model, name)).load_only(
+                    *(getattr(target, sub) for sub in names)
+                )
+            )
+        return [load_only(*attributes), *options]
+
+    def dump(self, obj: Any) -> dict[str, Any]:
+        data = {name: getattr(obj, name) for name in self.columns}
+        for name, names in self.nested.items():
+            related = getattr(obj, name)
+            data[name] = (
+                None
+                if related is None
+                else {sub: getattr(related, sub) for sub in names}
+            )
+        return data
+
+
+def sparse_fields(
+    schema: type[BaseModel],
+) -> Callable[..., FieldSelection | None]:
+    """Dependency parsing the `fields` query parameter against `schema`."""
+    allowed = ", ".join(selectable_fields(schema))
+
+    def dependency(
+        fields: Annotated[
+            str | None,
+            Query(
+                description=(
+                    "Comma-separated subset of response fields to return. "
+                    f"Allowed: {allowed}"
+                ),
+                examples=["id,title,completed"],
+            ),
+        ] = None,
+    ) -> FieldSelection | None:
+        if fields is None:
+            return None
+        try:
+            return FieldSelection.parse(fields, schema)
+        except ValueError as exc:
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "value_error",
+                        "loc": ("query", "fields"),
+                        "msg": str(exc),
+                        "input": fields,
+                    }
+                ]
+            ) from exc
+
+    return dependency
+
+
+def sparse_response(content: Any) -> JSONResponse:
+    """Serialize a sparse payload directly; it no longer matches `response_model`."""
+    return JSONResponse(jsonable_encoder(content))
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Mapping, Sequence, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import track_session_task
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchLoadFn = Callable[[list[K]], Awaitable[Mapping[K, V]]]
+
+
+class BatchLoader(Generic[K, V]):
+    """Request-scoped loader that coalesces lookups issued in the same tick.
+
+    Every `load` call made before the event loop gets back to the loader is
+    collected into one batch, and `batch_fn` is awaited once with the unique
+    keys. Keys missing from the returned mapping resolve to `None`.
+
+    Batches run in tasks of their own. Pass the `session` that `batch_fn`
+    queries so that releasing it at the end of the request ends them first.
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchLoadFn[K, V],
+        *,
+        max_batch_size: int = 500,
+        session: AsyncSession | None = None,
+    ):
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._session = session
+        self._pending: dict[K, asyncio.Future[V | None]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: K) -> V | None:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = loop.create_future()
+            self._pending[key] = future
+        return await future
+
+    async def load_many(self, keys: Sequence[K]) -> list[V | None]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._resolve_chunks(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._session is not None:
+            track_session_task(self._session, task)
+
+    async def _resolve_chunks(self, batch: dict[K, asyncio.Future[V | None]]) -> None:
+        # Chunks run sequentially: the batch function usually shares one
+        # AsyncSession, which must not be used concurrently.
+        keys = list(batch)
+        try:
+            for start in range(0, len(keys), self._max_batch_size):
+                chunk = keys[start : start + self._max_batch_size]
+                results = await self._batch_fn(chunk)
+                for key in chunk:
+                    if not batch[key].done():
+                        batch[key].set_result(results.get(key))
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+        except BaseException:
+            for future in batch.values():
+                future.cancel()
+            raise
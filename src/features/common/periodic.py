@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from logger import logger
+
+
+class PeriodicTask:
+    """Runs `tick` every `interval` seconds in a background task.
+
+    A failing tick is logged and the loop carries on. `wake` runs the next
+    tick early. With `immediate`, the first tick runs on `start` rather than
+    one interval later. `stop` cancels the loop, or with `graceful` lets a
+    tick in progress finish and then ends it.
+    """
+
+    def __init__(
+        self,
+        tick: Callable[[], Awaitable[object]],
+        *,
+        interval: float,
+        name: str,
+        immediate: bool = False,
+        graceful: bool = False,
+    ):
+        self.tick = tick
+        self.interval = interval
+        self.name = name
+        self.immediate = immediate
+        self.graceful = graceful
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            # Bound to the loop that first waits on it, so one per run.
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        if self.graceful:
+            self._stopping = True
+            self._wake.set()
+        else:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._task = None
+            self._stopping = False
+
+    async def _run(self) -> None:
+        if not self.immediate:
+            await self._wait()
+        while not self._stopping:
+            try:
+                await self.tick()
+            except Exception:
+                await logger.aexception(f"{self.name} failed")
+            await self._wait()
+
+    async def _wait(self) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.interval)
+        except TimeoutError:
+            pass
+        self._wake.clear()
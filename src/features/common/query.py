@@ -1,6 +1,9 @@
+from collections import OrderedDict
 from enum import Enum
+from typing import Callable, Hashable
 
 from pydantic import Field
+from sqlalchemy.sql import Executable
 
 from .pagination import PaginationParams
 
@@ -12,3 +15,30 @@ class SortOrder(str, Enum):
 
 class BaseListQuery(PaginationParams):
     sort_order: SortOrder = Field(default=SortOrder.asc)
+
+
+class StatementCache:
+    """Bounded LRU of pre-built statements, keyed by query shape.
+
+    Statements stored here must take their per-request values as bound
+    parameters, so one instance serves every request of the same shape and
+    SQLAlchemy's memoized cache key is computed only once.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._statements: OrderedDict[Hashable, Executable] = OrderedDict()
+
+    def get(self, key: Hashable, build: Callable[[], Executable]) -> Executable:
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = build()
+            self._statements[key] = statement
+            if len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+        else:
+            self._statements.move_to_end(key)
+        return statement
+
+    def __len__(self) -> int:
+        return len(self._statements)
@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import inspect
+import time
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+from database import (
+    interrupt_request_statements,
+    release_request_sessions,
+    start_deadline,
+    start_session_tracking,
+    stop_deadline,
+    stop_session_tracking,
+)
+from logger import logger
+from settings import settings
+
+# Logged for requests abandoned because the client went away; nobody is
+# left to receive it.
+CLIENT_CLOSED_REQUEST = 499
+
+
+def _release_sessions_after(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            await release_request_sessions()
+
+    return wrapper
+
+
+def route_budget(path: str, methods: set[str]) -> float | None:
+    """Seconds a request to the route may take, or None for no deadline."""
+    timeouts = settings.request_route_timeouts
+    for method in sorted(methods):
+        if f"{method} {path}" in timeouts:
+            return timeouts[f"{method} {path}"] or None
+    return timeouts.get(path, settings.request_timeout_seconds) or None
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+class SessionReleaseRoute(APIRoute):
+    """Route that gives pooled connections back as soon as the endpoint returns.
+
+    With `db_session_release="early"`, sessions opened through `get_db` are
+    closed right after the endpoint's own work, before FastAPI validates and
+    serializes the response, instead of when the dependency exits after the
+    response is sent. With `"request"` the route behaves like `APIRoute`.
+
+    Requests also get a deadline (`route_budget`): when it passes, or when the
+    client disconnects first, the statements the request is running are
+    interrupted and the handler is cancelled, so the pool slot is freed. An
+    expired deadline answers `504`.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        self.release_early = (
+            settings.db_session_release == "early"
+            and inspect.iscoroutinefunction(endpoint)
+        )
+        if self.release_early:
+            endpoint = _release_sessions_after(endpoint)
+        # Needed by get_route_handler, which the base class calls.
+        self.budget = route_budget(path, set(kwargs.get("methods") or ["GET"]))
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+        if self.release_early:
+            handler = self._tracking_sessions(handler)
+        if self.budget is None and not settings.request_cancel_on_disconnect:
+            return handler
+
+        async def bounded_handler(request: Request) -> Response:
+            return await self._run_bounded(handler, request)
+
+        return bounded_handler
+
+    @staticmethod
+    def _tracking_sessions(handler: Callable[[Request], Any]):
+        async def tracked_handler(request: Request) -> Response:
+            token = start_session_tracking()
+            try:
+                return await handler(request)
+            finally:
+                stop_session_tracking(token)
+
+        return tracked_handler
+
+    async def _run_bounded(
+        self, handler: Callable[[Request], Any], request: Request
+    ) -> Response:
+        task = asyncio.current_task()
+        abandoned: list[tuple[str, list[str]]] = []
+
+        def abandon(reason: str) -> None:
+            if not abandoned:
+                abandoned.append((reason, interrupt_request_statements()))
+                task.cancel()
+
+        tokens = start_deadline(
+            time.monotonic() + self.budget if self.budget is not None else None
+        )
+        timer = watcher = None
+        if self.budget is not None:
+            timer = asyncio.get_running_loop().call_later(
+                self.budget, abandon, "deadline"
+            )
+        if settings.request_cancel_on_disconnect:
+            # Read the body first: the watcher must only see what follows it.
+            await request.body()
+            watcher = asyncio.create_task(_wait_for_disconnect(request))
+            watcher.add_done_callback(
+                lambda done: done.cancelled() or abandon("disconnect")
+            )
+
+        try:
+            return await handler(request)
+        except asyncio.CancelledError:
+            if not abandoned:
+                raise
+            task.uncancel()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if watcher is not None:
+                watcher.cancel()
+            stop_deadline(tokens)
+
+        reason, statements = abandoned[0]
+        if reason == "disconnect":
+            await logger.ainfo(
+                "Client disconnected; cancelled the request", statements=statements
+            )
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+        await logger.awarning(
+            f"Request exceeded its {self.budget}s deadline; cancelled",
+            budget_seconds=self.budget,
+            statements=statements,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded",
+        )
@@ -0,0 +1,105 @@
+"""Content codings available to `CompressionMiddleware`.
+
+gzip always works (zlib is in the standard library); `br` and `zstd` are
+offered only when the optional `brotli` / `zstandard` packages are installed.
+"""
+
+import zlib
+from typing import Callable, Protocol
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class StreamEncoder(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        """Compress `data` and flush, so the chunk is decodable on arrival."""
+
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class Codec:
+    """A content coding: one-shot compression for complete bodies and a
+    flushing stream encoder for chunked ones."""
+
+    def __init__(
+        self,
+        name: str,
+        compress: Callable[[bytes], bytes],
+        stream: Callable[[], StreamEncoder],
+    ):
+        self.name = name
+        self.compress = compress
+        self.stream = stream
+
+
+def available_codecs(
+    *, gzip_level: int, brotli_quality: int, zstd_level: int
+) -> list[Codec]:
+    """Installed codecs, most preferred first (used to break `q` ties)."""
+    codecs: list[Codec] = []
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=zstd_level)
+        codecs.append(
+            Codec("zstd", compressor.compress, lambda: ZstdEncoder(zstd_level))
+        )
+    if brotli is not None:
+        codecs.append(
+            Codec(
+                "br",
+                lambda data: brotli.compress(data, quality=brotli_quality),
+                lambda: BrotliEncoder(brotli_quality),
+            )
+        )
+    codecs.append(
+        Codec(
+            "gzip",
+            lambda data: zlib.compress(data, gzip_level, wbits=zlib.MAX_WBITS | 16),
+            lambda: GzipEncoder(gzip_level),
+        )
+    )
+    return codecs
@@ -0,0 +1,157 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .codecs import Codec
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+)
+# Event streams must reach the client message by message, unbuffered.
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def negotiate(accept_encoding: str, codecs: list[Codec]) -> Codec | None:
+    """Pick the codec with the highest `q`; ties go to the earlier codec."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for codec in codecs:
+        quality = weights.get(codec.name, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Negotiated response compression (`zstd`, `br`, `gzip`).
+
+    Complete bodies are compressed in one shot when they reach
+    `minimum_size`. Streaming bodies (`more_body=True`) are always
+    compressed, chunk by chunk, each chunk flushed so clients can decode it
+    as it arrives. Routes opt out through `exempt_paths` (exact paths, or
+    prefixes ending in `*`).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        codecs: list[Codec],
+        minimum_size: int = 500,
+        exempt_paths: list[str] | None = None,
+    ):
+        self.app = app
+        self.codecs = codecs
+        self.minimum_size = minimum_size
+        exempt_paths = exempt_paths or []
+        self.exempt_paths = frozenset(p for p in exempt_paths if not p.endswith("*"))
+        self.exempt_prefixes = tuple(p[:-1] for p in exempt_paths if p.endswith("*"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "HEAD"
+            or self._is_exempt(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codecs)
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, scope, codec, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+    def _is_exempt(self, path: str) -> bool:
+        return path in self.exempt_paths or path.startswith(self.exempt_prefixes)
+
+
+class _CompressingResponder:
+    """`send` wrapper that holds the response start until the first body
+    chunk shows whether (and how) to compress."""
+
+    def __init__(self, send: Send, scope: Scope, codec: Codec, minimum_size: int):
+        self.send = send
+        self.scope = scope
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.start: Message | None = None
+        self.encoder = None
+        self.decided = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.decided:
+            self.decided = True
+            headers = MutableHeaders(scope=self.start)
+            if not self._compressible(headers):
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            headers["content-encoding"] = self.codec.name
+            if not more_body:
+                body = self.codec.compress(body)
+                headers["content-length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            if "content-length" in headers:
+                del headers["content-length"]
+            self.encoder = self.codec.stream()
+            await self.send(self.start)
+
+        if self.encoder is None:
+            # Decided against compressing: pass the rest through untouched.
+            await self.send(message)
+            return
+
+        data = self.encoder.compress(body) if body else b""
+        if not more_body:
+            data += self.encoder.finish()
+        await self.send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES) and not (
+            content_type.startswith(UNCOMPRESSED_TYPES)
+        )
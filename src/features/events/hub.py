@@ -0,0 +1,159 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from metrics import registry
+
+from .pubsub import PubSub
+
+Predicate = Callable[[dict[str, Any]], bool]
+
+# Queued in place of dropped messages: the subscriber fell behind and must
+# refetch state instead of trusting the stream to be complete.
+RESYNC: dict[str, Any] = {"resync": True}
+
+subscribers_gauge = registry.gauge(
+    "app_sse_subscribers", "Open event-stream subscriptions", ["channel"]
+)
+resyncs_counter = registry.counter(
+    "app_sse_resyncs_total",
+    "Subscribers whose buffer overflowed and were told to resync",
+    ["channel"],
+)
+
+
+class HubFullError(Exception):
+    pass
+
+
+class Subscription:
+    """One subscriber's bounded buffer of matching messages."""
+
+    def __init__(self, predicate: Predicate, buffer_size: int):
+        self.predicate = predicate
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(buffer_size)
+        self.overflows = 0
+
+    def offer(self, message: dict[str, Any]) -> bool:
+        """Buffer `message` if it matches; returns False on overflow.
+
+        A full buffer is emptied and replaced by a single `RESYNC` marker,
+        so a slow consumer costs bounded memory and never blocks the
+        publisher.
+        """
+        if not self.predicate(message):
+            return True
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.overflows += 1
+            return False
+
+
+class BroadcastHub:
+    """Fans messages on one pub/sub channel out to this worker's subscribers."""
+
+    def __init__(
+        self,
+        channel: str,
+        pubsub: PubSub,
+        *,
+        max_subscribers: int,
+        buffer_size: int,
+    ):
+        self.channel = channel
+        self.pubsub = pubsub
+        self.max_subscribers = max_subscribers
+        self.buffer_size = buffer_size
+        self.subscriptions: set[Subscription] = set()
+        pubsub.subscribe(channel, self.deliver)
+
+    def publish(self, message: dict[str, Any]) -> None:
+        self.pubsub.publish(self.channel, message)
+
+    def deliver(self, message: dict[str, Any]) -> None:
+        for subscription in self.subscriptions:
+            if not subscription.offer(message):
+                resyncs_counter.inc(channel=self.channel)
+
+    def subscribe(self, predicate: Predicate = lambda message: True) -> Subscription:
+        if len(self.subscriptions) >= self.max_subscribers:
+            raise HubFullError(self.channel)
+        subscription = Subscription(predicate, self.buffer_size)
+        self.subscriptions.add(subscription)
+        subscribers_gauge.set(len(self.subscriptions), channel=self.channel)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+        subscribers_gauge.set(len(self.subscriptions), channel=self.channel)
+
+
+async def sse_events(
+    hub: BroadcastHub,
+    subscription: Subscription,
+    *,
+    event: str,
+    heartbeat: float,
+    retry_ms: int = 3000,
+) -> AsyncIterator[str]:
+    """Encode a subscription as Server-Sent Events until the client leaves.
+
+    Idle periods longer than `heartbeat` seconds send a comment line so
+    proxies keep the connection open. The subscription is released when the
+    response ends or is cancelled by a disconnect.
+    """
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is RESYNC:
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield f"event: {event}\ndata: {json.dumps(message)}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+class EventStreamResponse(StreamingResponse):
+    """`sse_events` as a response that always releases its subscription.
+
+    The generator's own cleanup only runs once it has started, and a client
+    that disconnects before the body is streamed never starts it.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(
+        self,
+        hub: BroadcastHub,
+        subscription: Subscription,
+        *,
+        event: str,
+        heartbeat: float,
+        headers: dict[str, str] | None = None,
+    ):
+        super().__init__(
+            sse_events(hub, subscription, event=event, heartbeat=heartbeat),
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            | (headers or {}),
+        )
+        self.hub = hub
+        self.subscription = subscription
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.hub.unsubscribe(self.subscription)
@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable
+
+Handler = Callable[[dict[str, Any]], None]
+
+
+class PubSub(ABC):
+    """Channel fan-out between workers.
+
+    `publish` is called from inside a database commit, so it must not block:
+    a networked backend (Redis, Postgres `NOTIFY`) should queue the message
+    and send it from a background task, and call the registered handlers
+    from its reader task as messages arrive. Messages are JSON-compatible
+    dicts.
+    """
+
+    @abstractmethod
+    def publish(self, channel: str, message: dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, channel: str, handler: Handler) -> None: ...
+
+
+class LocalPubSub(PubSub):
+    """Single-process stand-in: handlers are called directly on publish."""
+
+    def __init__(self):
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    def publish(self, channel: str, message: dict[str, Any]) -> None:
+        for handler in self._handlers[channel]:
+            handler(message)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel].append(handler)
+
+
+pubsub = LocalPubSub()
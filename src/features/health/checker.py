@@ -0,0 +1,140 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database import pool_engine, pool_settings, pool_status
+from features.common.periodic import PeriodicTask
+from features.loadshed.shedder import LoadShedder, load_shedder
+from logger import log_queue_depth, logger
+from settings import settings
+
+from .schemas import (
+    DatabaseHealth,
+    HealthReport,
+    LoadSheddingHealth,
+    MigrationHealth,
+)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def migration_heads() -> tuple[str, ...]:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return tuple(ScriptDirectory.from_config(config).get_heads())
+
+
+class HealthChecker:
+    """Refreshes a readiness report in the background at a fixed interval.
+
+    Probes read `report` and never touch the database themselves, so any
+    number of probers costs one check per interval instead of one pool
+    checkout per probe.
+    """
+
+    def __init__(
+        self,
+        db_engine: AsyncEngine,
+        shedder: LoadShedder,
+        *,
+        interval: float,
+        timeout: float,
+    ):
+        self.engine = db_engine
+        self.shedder = shedder
+        self.interval = interval
+        self.timeout = timeout
+        self.report: HealthReport | None = None
+        self._heads: tuple[str, ...] | None = None
+        self._refresher = PeriodicTask(
+            self.refresh,
+            interval=interval,
+            name="Health checker iteration",
+            immediate=True,
+        )
+
+    @property
+    def stale_after(self) -> float:
+        return self.interval * 3 + self.timeout
+
+    def is_ready(self) -> bool:
+        report = self.report
+        if report is None or report.status == "unavailable":
+            return False
+        age = (datetime.now(timezone.utc) - report.checked_at).total_seconds()
+        return age <= self.stale_after
+
+    async def refresh(self) -> HealthReport:
+        if self._heads is None:
+            self._heads = await asyncio.to_thread(migration_heads)
+
+        database, current_revision = await self._check_database()
+        migrations = MigrationHealth(
+            current=current_revision,
+            heads=list(self._heads),
+            up_to_date=current_revision in self._heads,
+        )
+        load_shedding = LoadSheddingHealth(
+            degraded=self.shedder.degraded,
+            shed_fraction=self.shedder.shed_fraction,
+            **self.shedder.last_sample,
+        )
+
+        if not database.ok:
+            status = "unavailable"
+        elif load_shedding.degraded or not migrations.up_to_date:
+            status = "degraded"
+        else:
+            status = "ok"
+
+        self.report = HealthReport(
+            status=status,
+            checked_at=datetime.now(timezone.utc),
+            database=database,
+            pools={pool: pool_status(pool_engine(pool)) for pool in pool_settings()},
+            migrations=migrations,
+            log_queue_depth=log_queue_depth(),
+            load_shedding=load_shedding,
+        )
+        return self.report
+
+    async def _check_database(self) -> tuple[DatabaseHealth, str | None]:
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.engine.connect() as conn:
+                    await conn.execute(select(1))
+                    current = await conn.run_sync(
+                        lambda sync_conn: MigrationContext.configure(
+                            sync_conn
+                        ).get_current_revision()
+                    )
+        except Exception as exc:
+            await logger.aerror("Health check failed", error=str(exc))
+            return DatabaseHealth(ok=False, error=str(exc) or type(exc).__name__), None
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        return DatabaseHealth(ok=True, latency_ms=latency_ms), current
+
+    def start(self) -> None:
+        self._refresher.start()
+
+    async def stop(self) -> None:
+        await self._refresher.stop()
+
+
+# Checks use their own small pool, so a saturated interactive pool shows up
+# in the report instead of stalling it.
+health_checker = HealthChecker(
+    pool_engine("health"),
+    load_shedder,
+    interval=settings.health_check_interval_seconds,
+    timeout=settings.health_check_timeout_seconds,
+)
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Response, status
+
+from features.auth.bearer import require_admin
+
+from .checker import health_checker
+from .schemas import (
+    HealthDetailsResponse,
+    HealthStatusResponse,
+    LivenessResponse,
+    ReadinessResponse,
+)
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/livez", response_model=LivenessResponse)
+async def livez():
+    return {"status": "ok"}
+
+
+@router.get(
+    "/readyz",
+    response_model=ReadinessResponse,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessResponse}},
+)
+async def readyz(response: Response):
+    """Public, so it only says whether to send traffic; see `/admin/health`."""
+    ready = health_checker.is_ready()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready}
+
+
+@router.get(
+    "/admin/health",
+    response_model=HealthDetailsResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def health_details():
+    """The latest health report, with database errors and pool statistics."""
+    return {"ready": health_checker.is_ready(), "report": health_checker.report}
+
+
+@router.get(
+    "/health",
+    response_model=HealthStatusResponse,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": HealthStatusResponse}},
+    deprecated=True,
+)
+async def health(response: Response):
+    """Legacy probe kept for existing monitors; prefer `/livez` and `/readyz`."""
+    report = health_checker.report
+    if not health_checker.is_ready():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": report.status if report else "unavailable"}
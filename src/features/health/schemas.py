@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class LivenessResponse(BaseModel):
+    status: Literal["ok"]
+
+
+class DatabaseHealth(BaseModel):
+    ok: bool
+    latency_ms: float | None = None
+    error: str | None = None
+
+
+class MigrationHealth(BaseModel):
+    current: str | None
+    heads: list[str]
+    up_to_date: bool
+
+
+class LoadSheddingHealth(BaseModel):
+    degraded: bool
+    shed_fraction: float
+    event_loop_lag_seconds: float | None = None
+    pool_checkout_wait_seconds: float | None = None
+    pool_utilization: float | None = None
+
+
+class HealthReport(BaseModel):
+    status: Literal["ok", "degraded", "unavailable"]
+    checked_at: datetime
+    database: DatabaseHealth
+    # Every named pool's occupancy, the default pool's included
+    pools: dict[str, dict[str, int]]
+    migrations: MigrationHealth
+    log_queue_depth: int
+    load_shedding: LoadSheddingHealth
+
+
+class HealthStatusResponse(BaseModel):
+    status: Literal["ok", "degraded", "unavailable"]
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+
+
+class HealthDetailsResponse(BaseModel):
+    ready: bool
+    report: HealthReport | None
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+from typing import Any
+
+from database import Base
+from sqlalchemy import JSON, DateTime, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Job(Base):
+    """A durable job, from its enqueue until it succeeds or gives up.
+
+    Succeeded jobs are deleted; jobs out of attempts stay as `failed` with
+    their last error. A `running` job whose `run_at` lease has passed was
+    lost with its worker; it is claimed again while it has attempts left,
+    and marked `failed` otherwise.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_due", "status", "run_at", "priority"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    priority: Mapped[int] = mapped_column(nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    # When a pending job is due, or when a running job's lease ends.
+    run_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=_now
+    )
+    last_error: Mapped[str | None] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
@@ -0,0 +1,413 @@
+"""In-process job queue for side effects that should not delay a response.
+
+Register a handler with `@job_queue.job("name")` and enqueue it by name:
+
+- `job_queue.enqueue_after_commit(db, "name", **kwargs)` inside a
+  `db.begin()` block runs the job only once that transaction commits;
+- `job_queue.enqueue("name", **kwargs)` queues it right away.
+
+Workers started in the app lifespan take jobs highest priority first. Each
+priority has its own bounded queue (`jobs_queue_size`), so a flood of low
+priority work cannot crowd out the rest; enqueueing into a full one raises
+`QueueFullError`. Failed jobs are retried with exponential backoff until
+they run out of attempts.
+
+With `jobs_enabled` off no workers start, and in-memory jobs are dropped
+when enqueued instead of piling up.
+
+Jobs registered with `durable=True` are also written to the `jobs` table in
+the enqueuing transaction, so they survive restarts. Workers claim due rows
+under a lease and delete them once they succeed; a job whose worker died is
+claimed again when its lease ends, and counts that lost run as an attempt.
+Durable jobs run at least once and must be idempotent; their arguments must
+be JSON.
+"""
+
+import asyncio
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from itertools import count
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import case, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from structlog.contextvars import bound_contextvars, get_contextvars
+
+from database import call_after_commit, pool_session
+from logger import logger
+from metrics import registry
+from settings import settings
+
+from .models import Job
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+queued_gauge = registry.gauge(
+    "app_jobs_queued", "Jobs waiting for a worker", ["priority"]
+)
+jobs_counter = registry.counter(
+    "app_jobs_total", "Finished job attempts by outcome", ["job", "outcome"]
+)
+
+
+class JobPriority(int, Enum):
+    high = 0
+    normal = 1
+    low = 2
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    handler: JobHandler
+    priority: JobPriority
+    max_attempts: int
+    durable: bool
+
+
+@dataclass(order=True)
+class _Entry:
+    priority: int
+    seq: int
+    name: str = field(compare=False)
+    kwargs: dict[str, Any] = field(compare=False)
+    attempt: int = field(compare=False, default=1)
+    # Row in `jobs` for durable jobs
+    job_id: int | None = field(compare=False, default=None)
+    # Log context of the enqueuing request, such as its request_id
+    log_context: dict[str, Any] = field(compare=False, default_factory=dict)
+
+
+class JobQueue:
+    """Runs registered jobs on a pool of workers for the app's lifetime."""
+
+    def __init__(
+        self,
+        *,
+        workers: int,
+        queue_size: int,
+        max_attempts: int,
+        backoff: float,
+        max_backoff: float,
+        poll_interval: float,
+        lease: float,
+        claim_batch_size: int,
+        shutdown_timeout: float,
+        enabled: bool = True,
+        session_factory: async_sessionmaker[AsyncSession] = pool_session("bulk"),
+    ):
+        self.enabled = enabled
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.claim_batch_size = claim_batch_size
+        self.shutdown_timeout = shutdown_timeout
+        self.session_factory = session_factory
+        self._jobs: dict[str, JobSpec] = {}
+        self._seq = count()
+        # Queued entries by priority; the asyncio queue only exists while
+        # running, so entries enqueued before `start` wait in `_backlog`.
+        self._depth = {priority: 0 for priority in JobPriority}
+        self._backlog: list[_Entry] = []
+        self._queue: asyncio.PriorityQueue[_Entry] | None = None
+        self._wake: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._poller: asyncio.Task | None = None
+        self._retries: set[asyncio.TimerHandle] = set()
+        self._claimed = 0
+        registry.add_collector(self._collect)
+
+    def job(
+        self,
+        name: str,
+        *,
+        priority: JobPriority = JobPriority.normal,
+        max_attempts: int | None = None,
+        durable: bool = False,
+    ) -> Callable[[JobHandler], JobHandler]:
+        """Register the decorated coroutine function as job `name`."""
+
+        def register(handler: JobHandler) -> JobHandler:
+            self._jobs[name] = JobSpec(
+                handler, priority, max_attempts or self.max_attempts, durable
+            )
+            return handler
+
+        return register
+
+    def enqueue(self, name: str, **kwargs: Any) -> None:
+        """Queue an in-memory run of job `name` now; a no-op when disabled."""
+        spec = self._spec(name)
+        if spec.durable:
+            raise ValueError(f"Durable job {name!r} needs enqueue_after_commit")
+        if not self.enabled:
+            return
+        if self._depth[spec.priority] >= self.queue_size:
+            raise QueueFullError(f"The {spec.priority.name} job queue is full")
+        self._put(
+            _Entry(
+                spec.priority,
+                next(self._seq),
+                name,
+                kwargs,
+                log_context=get_contextvars(),
+            )
+        )
+
+    def enqueue_after_commit(
+        self, session: AsyncSession, name: str, **kwargs: Any
+    ) -> None:
+        """Run job `name` once `session`'s current transaction commits.
+
+        Nothing runs if it rolls back. A durable job's row is added to the
+        transaction itself; other jobs are queued from the commit, where a
+        full queue is logged rather than raised.
+        """
+        spec = self._spec(name)
+        if not spec.durable:
+            call_after_commit(session, lambda: self.enqueue(name, **kwargs))
+            return
+
+        session.add(Job(name=name, payload=kwargs, priority=spec.priority))
+        if self._wake is not None:
+            call_after_commit(session, self._wake.set)
+
+    def start(self) -> None:
+        if self._tasks or not self.enabled:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._wake = asyncio.Event()
+        for entry in self._backlog:
+            self._queue.put_nowait(entry)
+        self._backlog.clear()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if any(spec.durable for spec in self._jobs.values()):
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        """Finish queued jobs for up to `shutdown_timeout` seconds, then stop.
+
+        In-memory jobs still queued or waiting to retry after that are lost;
+        durable ones are claimed again after a restart.
+        """
+        if not self._tasks:
+            return
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        try:
+            await asyncio.wait_for(self._queue.join(), self.shutdown_timeout)
+        except TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for retry in self._retries:
+            retry.cancel()
+
+        dropped = self._queue.qsize() + len(self._retries)
+        if dropped:
+            await logger.awarning(
+                f"Stopped the job queue with {dropped} jobs unfinished",
+                dropped=dropped,
+            )
+        self._tasks = []
+        self._retries.clear()
+        self._queue = self._wake = None
+        self._depth = {priority: 0 for priority in JobPriority}
+        self._claimed = 0
+
+    def _spec(self, name: str) -> JobSpec:
+        try:
+            return self._jobs[name]
+        except KeyError:
+            raise LookupError(f"Unknown job {name!r}") from None
+
+    def _put(self, entry: _Entry) -> None:
+        self._depth[JobPriority(entry.priority)] += 1
+        if self._queue is None:
+            self._backlog.append(entry)
+        else:
+            self._queue.put_nowait(entry)
+
+    async def _work(self) -> None:
+        while True:
+            entry = await self._queue.get()
+            self._depth[JobPriority(entry.priority)] -= 1
+            try:
+                await self._run(entry)
+            except Exception:
+                await logger.aexception("Job bookkeeping failed", job=entry.name)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, entry: _Entry) -> None:
+        spec = self._jobs.get(entry.name)
+        try:
+            if spec is None:
+                raise LookupError(f"Unknown job {entry.name!r}")
+            with bound_contextvars(**entry.log_context):
+                await spec.handler(**entry.kwargs)
+        except Exception as exc:
+            await self._failed(entry, spec, exc)
+        else:
+            if entry.job_id is not None:
+                async with self.session_factory() as db, db.begin():
+                    await db.execute(delete(Job).where(Job.id == entry.job_id))
+            jobs_counter.inc(job=entry.name, outcome="succeeded")
+        finally:
+            if entry.job_id is not None:
+                self._claimed -= 1
+
+    async def _failed(
+        self, entry: _Entry, spec: JobSpec | None, exc: Exception
+    ) -> None:
+        retry = spec is not None and entry.attempt < spec.max_attempts
+        delay = min(self.backoff * 2 ** (entry.attempt - 1), self.max_backoff)
+        await logger.aexception(
+            f"Job {entry.name} failed",
+            job=entry.name,
+            attempt=entry.attempt,
+            retry_in_seconds=delay if retry else None,
+        )
+        jobs_counter.inc(job=entry.name, outcome="retried" if retry else "failed")
+
+        if entry.job_id is not None:
+            values = {"status": "pending", "run_at": _now() + timedelta(seconds=delay)}
+            if not retry:
+                values = {"status": "failed"}
+            async with self.session_factory() as db, db.begin():
+                await db.execute(
+                    update(Job)
+                    .where(Job.id == entry.job_id)
+                    .values(last_error=repr(exc), **values)
+                )
+        elif retry:
+            again = replace(entry, attempt=entry.attempt + 1)
+            handle = asyncio.get_running_loop().call_later(
+                delay, lambda: self._retry(handle, again)
+            )
+            self._retries.add(handle)
+
+    def _retry(self, handle: asyncio.TimerHandle, entry: _Entry) -> None:
+        self._retries.discard(handle)
+        self._put(entry)
+
+    async def _poll(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self._claim()
+            except Exception:
+                await logger.aexception("Claiming durable jobs failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+
+    async def _claim(self) -> None:
+        """Queue due durable jobs, keeping at most a batch claimed at once."""
+        limit = self.claim_batch_size - self._claimed
+        if limit <= 0:
+            return
+        now = _now()
+        max_attempts = case(
+            {name: spec.max_attempts for name, spec in self._jobs.items()},
+            value=Job.name,
+            else_=self.max_attempts,
+        )
+        expired = (
+            Job.status == "running",
+            Job.name.in_(self._jobs),
+            Job.run_at <= now,
+        )
+        due = (
+            Job.status.in_(("pending", "running")),
+            Job.name.in_(self._jobs),
+            Job.run_at <= now,
+            # A lost run counts as an attempt, as a failed one does.
+            or_(Job.status == "pending", Job.attempts < max_attempts),
+        )
+        # `due` is repeated on the outer UPDATE so that concurrent claimers
+        # skip rows another worker's lease already covers.
+        batch = select(Job.id).where(*due).order_by(Job.priority, Job.id).limit(limit)
+        async with self.session_factory() as db, db.begin():
+            exhausted = (
+                await db.execute(
+                    update(Job)
+                    .where(*expired, Job.attempts >= max_attempts)
+                    .values(
+                        status="failed",
+                        last_error="Lease expired; its worker was lost",
+                    )
+                    .returning(Job.id, Job.name, Job.attempts)
+                )
+            ).all()
+            claimed = (
+                await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(batch), *due)
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        run_at=now + timedelta(seconds=self.lease),
+                    )
+                    .returning(
+                        Job.id, Job.name, Job.payload, Job.priority, Job.attempts
+                    )
+                )
+            ).all()
+
+        for row in exhausted:
+            await logger.aerror(
+                f"Job {row.name} failed",
+                job=row.name,
+                job_id=row.id,
+                attempt=row.attempts,
+                error="lease expired",
+            )
+            jobs_counter.inc(job=row.name, outcome="failed")
+
+        for row in sorted(claimed, key=lambda row: (row.priority, row.id)):
+            self._claimed += 1
+            self._put(
+                _Entry(
+                    row.priority,
+                    next(self._seq),
+                    row.name,
+                    row.payload,
+                    attempt=row.attempts,
+                    job_id=row.id,
+                )
+            )
+
+    def _collect(self) -> None:
+        for priority, depth in self._depth.items():
+            queued_gauge.set(depth, priority=priority.name)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+job_queue = JobQueue(
+    enabled=settings.jobs_enabled,
+    workers=settings.jobs_workers,
+    queue_size=settings.jobs_queue_size,
+    max_attempts=settings.jobs_max_attempts,
+    backoff=settings.jobs_backoff_seconds,
+    max_backoff=settings.jobs_max_backoff_seconds,
+    poll_interval=settings.jobs_poll_interval_seconds,
+    lease=settings.jobs_lease_seconds,
+    claim_batch_size=settings.jobs_claim_batch_size,
+    shutdown_timeout=settings.jobs_shutdown_timeout_seconds,
+)
@@ -0,0 +1,24 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from features.ratelimit.middleware import send_rejection
+
+from .shedder import LoadShedder
+
+
+class LoadSheddingMiddleware:
+    """Rejects low-priority requests with 503 while the shedder is degraded."""
+
+    def __init__(self, app: ASGIApp, *, shedder: LoadShedder):
+        self.app = app
+        self.shedder = shedder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and self.shedder.should_shed(scope):
+            await send_rejection(
+                send,
+                503,
+                "Service is shedding load, retry later",
+                self.shedder.sample_interval * 2,
+            )
+            return
+        await self.app(scope, receive, send)
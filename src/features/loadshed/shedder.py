@@ -0,0 +1,167 @@
+import asyncio
+import random
+from urllib.parse import parse_qs
+
+from starlette.types import Scope
+
+from database import DEFAULT_POOL, InstrumentedQueuePool, engine, pool_status
+from features.common.pagination import DEFAULT_PAGE_SIZE
+from features.common.periodic import PeriodicTask
+from logger import logger
+from metrics import registry
+from settings import settings
+
+loop_lag_gauge = registry.gauge(
+    "app_event_loop_lag_seconds", "Event-loop lag observed in the last sample"
+)
+pool_wait_gauge = registry.gauge(
+    "app_db_pool_checkout_wait_seconds",
+    "Worst pool checkout wait observed in the last sample",
+)
+pool_utilization_gauge = registry.gauge(
+    "app_db_pool_utilization", "Checked-out connections over pool capacity"
+)
+shed_fraction_gauge = registry.gauge(
+    "app_load_shed_fraction", "Share of low-priority requests currently rejected"
+)
+degraded_gauge = registry.gauge(
+    "app_load_degraded", "1 while the service is shedding load"
+)
+shed_counter = registry.counter(
+    "app_load_shed_requests_total", "Requests rejected by adaptive load shedding"
+)
+
+
+class LoadShedder:
+    """Samples event-loop lag and pool pressure and sheds low-priority work.
+
+    Crossing any threshold sheds every low-priority request. Each healthy
+    sample afterwards lowers the shed fraction by `recovery_step`, so
+    expensive traffic is let back in gradually instead of all at once.
+    """
+
+    def __init__(
+        self,
+        *,
+        sample_interval: float,
+        lag_threshold: float,
+        pool_wait_threshold: float,
+        pool_utilization_threshold: float,
+        recovery_step: float,
+        low_priority_paths: list[str],
+        deep_offset: int,
+    ):
+        self.sample_interval = sample_interval
+        self.lag_threshold = lag_threshold
+        self.pool_wait_threshold = pool_wait_threshold
+        self.pool_utilization_threshold = pool_utilization_threshold
+        self.recovery_step = recovery_step
+        self.low_priority_exact = frozenset(
+            path for path in low_priority_paths if not path.endswith("*")
+        )
+        self.low_priority_prefixes = tuple(
+            path[:-1] for path in low_priority_paths if path.endswith("*")
+        )
+        self.deep_offset = deep_offset
+        self.shed_fraction = 0.0
+        self.last_sample: dict[str, float] = {}
+        self._sampled_at = 0.0
+        self._sampler = PeriodicTask(
+            self._sample, interval=sample_interval, name="Load sampling"
+        )
+
+    @property
+    def degraded(self) -> bool:
+        return self.shed_fraction > 0
+
+    def observe(self, *, lag: float, pool_wait: float, pool_utilization: float) -> None:
+        overloaded = (
+            lag >= self.lag_threshold
+            or pool_wait >= self.pool_wait_threshold
+            or pool_utilization >= self.pool_utilization_threshold
+        )
+        if overloaded:
+            self.shed_fraction = 1.0
+        else:
+            self.shed_fraction = max(0.0, self.shed_fraction - self.recovery_step)
+
+        self.last_sample = {
+            "event_loop_lag_seconds": lag,
+            "pool_checkout_wait_seconds": pool_wait,
+            "pool_utilization": pool_utilization,
+        }
+        loop_lag_gauge.set(lag)
+        pool_wait_gauge.set(pool_wait)
+        pool_utilization_gauge.set(pool_utilization)
+        shed_fraction_gauge.set(self.shed_fraction)
+        degraded_gauge.set(1 if self.degraded else 0)
+
+    def is_low_priority(self, scope: Scope) -> bool:
+        path = scope["path"]
+        if path in self.low_priority_exact or path.startswith(
+            self.low_priority_prefixes
+        ):
+            return True
+        return self._offset(scope) >= self.deep_offset
+
+    def should_shed(self, scope: Scope) -> bool:
+        if not self.degraded or not self.is_low_priority(scope):
+            return False
+        if random.random() >= self.shed_fraction:
+            return False
+        shed_counter.inc()
+        return True
+
+    def start(self) -> None:
+        self._sampled_at = asyncio.get_running_loop().time()
+        self._sampler.start()
+
+    async def stop(self) -> None:
+        await self._sampler.stop()
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        # A busy loop wakes the sampler late; the delay is the lag.
+        lag = max(0.0, loop.time() - self._sampled_at - self.sample_interval)
+        _, pool_wait = InstrumentedQueuePool.waits[DEFAULT_POOL].drain()
+
+        was_degraded = self.degraded
+        self.observe(lag=lag, pool_wait=pool_wait, pool_utilization=_pool_utilization())
+        if self.degraded != was_degraded:
+            await logger.awarning(
+                "load shedding " + ("engaged" if self.degraded else "released"),
+                **self.last_sample,
+            )
+        self._sampled_at = loop.time()
+
+    @staticmethod
+    def _offset(scope: Scope) -> int:
+        query = scope.get("query_string", b"")
+        if b"page" not in query:
+            return 0
+        params = parse_qs(query.decode("latin-1"))
+        try:
+            page = int(params.get("page", ["1"])[0])
+            page_size = int(params.get("page_size", [DEFAULT_PAGE_SIZE])[0])
+        except ValueError:
+            return 0
+        return (page - 1) * page_size
+
+
+def _pool_utilization() -> float:
+    status = pool_status(engine)
+    capacity = status.get("size", 0) + status.get("max_overflow", 0)
+    if capacity <= 0:
+        return 0.0
+    return status["checked_out"] / capacity
+
+
+load_shedder = LoadShedder(
+    sample_interval=settings.load_shed_sample_interval_seconds,
+    lag_threshold=settings.load_shed_loop_lag_threshold_seconds,
+    pool_wait_threshold=settings.load_shed_pool_wait_threshold_seconds,
+    pool_utilization_threshold=settings.load_shed_pool_utilization_threshold,
+    recovery_step=settings.load_shed_recovery_step,
+    low_priority_paths=settings.load_shed_low_priority_paths,
+    deep_offset=settings.load_shed_deep_offset,
+)
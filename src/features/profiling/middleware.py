@@ -0,0 +1,110 @@
+import asyncio
+import random
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from structlog.contextvars import get_contextvars
+
+from features.auth.bearer import authenticate_token, is_admin
+from logger import logger
+from metrics import registry
+
+from .profiler import SamplingProfiler
+from .store import ProfileFormat, ProfileStore, profile_id
+
+profiles_counter = registry.counter(
+    "app_profiles_total", "Requests profiled, by what asked for it", ["trigger"]
+)
+
+
+class ProfilingMiddleware:
+    """Profiles a `sample_rate` share of requests, and any an admin asks for.
+
+    An admin asks by sending the `x-profile` header with their bearer token;
+    the header is ignored on anyone else's requests. Profile ids start with
+    the `request_id` of `StructlogRequestMiddleware`, which must wrap this
+    middleware, and the response names them in `x-profile-id`.
+
+    Only installed when `profiling_enabled` is set.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        profiler: SamplingProfiler,
+        store: ProfileStore,
+        sample_rate: float,
+        format: ProfileFormat = "speedscope",
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.store = store
+        self.sample_rate = sample_rate
+        self.format = format
+        self._warned = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if not self.profiler.available:
+            if not self._warned:
+                self._warned = True
+                await logger.awarning(
+                    "Profiling needs SIGPROF and the event loop on the main thread"
+                )
+            await self.app(scope, receive, send)
+            return
+
+        request_id = get_contextvars().get("request_id") or "unknown"
+        id = profile_id(request_id)
+        status_code: int | None = None
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["x-profile-id"] = id
+            await send(message)
+
+        name = f"{scope['method']} {scope['path']} {request_id}"
+        try:
+            with self.profiler.profile(name) as profile:
+                await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # Failed requests keep their profile too, without a status.
+            profiles_counter.inc(trigger=trigger)
+            try:
+                await asyncio.to_thread(
+                    self.store.save,
+                    profile,
+                    id=id,
+                    request_id=request_id,
+                    method=scope["method"],
+                    path=scope["path"],
+                    status_code=status_code,
+                    trigger=trigger,
+                    format=self.format,
+                )
+            except Exception:
+                await logger.aexception("Saving a request profile failed")
+
+    def _trigger(self, scope: Scope) -> str | None:
+        headers = Headers(scope=scope)
+        if "x-profile" in headers and self._from_admin(headers):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    @staticmethod
+    def _from_admin(headers: Headers) -> bool:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        return is_admin(authenticate_token(token))
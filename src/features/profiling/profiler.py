@@ -0,0 +1,155 @@
+"""Signal-driven sampling profiler that attributes samples to requests.
+
+While at least one request is being profiled, an `ITIMER_PROF` timer
+interrupts the main thread every `interval` seconds of process CPU time and
+records the Python stack it was running. A sample counts towards the
+profile in the interrupted code's context, so work done for other requests
+interleaved on the event loop is left out, including in tasks the profiled
+request spawned. Time spent waiting on I/O costs no CPU and is not sampled.
+
+The timer and its handler only exist while a profile is open, so code that
+is not being profiled runs untouched.
+"""
+
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import FrameType
+from typing import Any, Iterator
+
+# (function, file, first line) from the outermost frame inward
+Stack = tuple[tuple[str, str, int], ...]
+
+_active: ContextVar["Profile | None"] = ContextVar("active_profile", default=None)
+
+
+class ProfilingUnavailableError(Exception):
+    pass
+
+
+class Profile:
+    """Stack samples of one request."""
+
+    def __init__(self, name: str, interval: float, max_depth: int):
+        self.name = name
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: dict[Stack, int] = {}
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def add(self, frame: FrameType | None) -> None:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        key = tuple(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def speedscope(self) -> dict[str, Any]:
+        """The profile in speedscope's sampled file format."""
+        frames: dict[tuple[str, str, int], int] = {}
+        samples = []
+        weights = []
+        for stack, count in self.stacks.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "activeProfileIndex": 0,
+            "exporter": "fastapi-template",
+            "shared": {
+                "frames": [
+                    {"name": name, "file": file, "line": line}
+                    for name, file, line in frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.duration,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+    def collapsed(self) -> str:
+        """One `outer;...;inner count` line per stack, for flame graph tools."""
+        return "".join(
+            ";".join(f"{name} ({file}:{line})" for name, file, line in stack)
+            + f" {count}\n"
+            for stack, count in self.stacks.items()
+        )
+
+
+class SamplingProfiler:
+    """Samples the main thread on behalf of the profiles currently open.
+
+    Needs `SIGPROF` (not on Windows) and an event loop on the main thread,
+    where Python runs signal handlers.
+    """
+
+    def __init__(self, *, interval: float, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._open = 0
+        self._previous_handler: Any = None
+
+    @property
+    def available(self) -> bool:
+        return (
+            hasattr(signal, "SIGPROF")
+            and threading.current_thread() is threading.main_thread()
+        )
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[Profile]:
+        """Sample the current context, and tasks it starts, until exit."""
+        if not self.available:
+            raise ProfilingUnavailableError(
+                "Profiling needs SIGPROF and the event loop on the main thread"
+            )
+        profile = Profile(name, self.interval, self.max_depth)
+        token = _active.set(profile)
+        self._start()
+        try:
+            yield profile
+        finally:
+            _active.reset(token)
+            self._stop()
+            profile.duration = time.perf_counter() - profile.started
+
+    def _start(self) -> None:
+        self._open += 1
+        if self._open == 1:
+            self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def _stop(self) -> None:
+        self._open -= 1
+        if self._open == 0:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            # SIGPROF's default action ends the process; a signal already
+            # pending when the timer stopped must not.
+            previous = self._previous_handler
+            if previous in (None, signal.SIG_DFL):
+                previous = signal.SIG_IGN
+            signal.signal(signal.SIGPROF, previous)
+
+    @staticmethod
+    def _sample(signum: int, frame: FrameType | None) -> None:
+        profile = _active.get()
+        if profile is not None:
+            profile.add(frame)
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+from features.auth.bearer import require_admin
+
+from .schemas import ProfileInfo
+from .store import EXTENSIONS, MEDIA_TYPES, profile_store
+
+router = APIRouter(
+    prefix="/admin/profiles",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+# Plain functions: FastAPI runs them in its thread pool, off the event loop,
+# while they read the store.
+@router.get("/", response_model=list[ProfileInfo])
+def list_profiles():
+    """Stored request profiles, newest first."""
+    return profile_store.list()
+
+
+@router.get(
+    "/{profile_id}",
+    response_class=FileResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {media_type: {} for media_type in MEDIA_TYPES.values()}
+        }
+    },
+)
+def download_profile(profile_id: str):
+    """The profile as stored: speedscope JSON or collapsed stacks."""
+    found = profile_store.get(profile_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    info, artifact = found
+    return FileResponse(
+        artifact,
+        media_type=MEDIA_TYPES[info.format],
+        filename=f"{info.id}{EXTENSIONS[info.format]}",
+    )
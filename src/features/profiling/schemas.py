@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class ProfileInfo(BaseModel):
+    id: str = Field(description="Download key, derived from the request id")
+    request_id: str
+    method: str
+    path: str
+    status_code: int | None = Field(
+        description="Response status, null when the request failed"
+    )
+    trigger: Literal["sampled", "header"]
+    format: Literal["speedscope", "collapsed"]
+    created_at: datetime
+    duration_ms: float
+    samples: int
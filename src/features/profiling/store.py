@@ -0,0 +1,121 @@
+"""Local artifact store for request profiles.
+
+Each profile is saved as `<profile id>.speedscope.json` or
+`<profile id>.collapsed.txt`, next to a `<profile id>.meta.json` summary. The
+profile id is the request's `request_id`, reduced to characters that are
+safe in a file name, plus a random suffix: clients choose request ids, so
+two requests can share one, and neither may overwrite the other's profile.
+Only the newest `max_profiles` are kept.
+"""
+
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal
+
+from settings import settings
+
+from .profiler import Profile
+from .schemas import ProfileInfo
+
+ProfileFormat = Literal["speedscope", "collapsed"]
+
+EXTENSIONS: dict[str, str] = {
+    "speedscope": ".speedscope.json",
+    "collapsed": ".collapsed.txt",
+}
+MEDIA_TYPES: dict[str, str] = {
+    "speedscope": "application/json",
+    "collapsed": "text/plain",
+}
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def profile_id(request_id: str) -> str:
+    """A new, unique id for a profile of the request `request_id`."""
+    return f"{_UNSAFE.sub('_', request_id)[:95] or '_'}-{uuid.uuid4().hex}"
+
+
+class ProfileStore:
+    """Writes profiles to `directory` and finds them again by id.
+
+    Methods touch the disk; call them off the event loop.
+    """
+
+    def __init__(self, directory: Path, *, max_profiles: int):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(
+        self,
+        profile: Profile,
+        *,
+        id: str,
+        request_id: str,
+        method: str,
+        path: str,
+        status_code: int | None,
+        trigger: str,
+        format: ProfileFormat,
+    ) -> ProfileInfo:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        info = ProfileInfo(
+            id=id,
+            request_id=request_id,
+            method=method,
+            path=path,
+            status_code=status_code,
+            trigger=trigger,
+            format=format,
+            created_at=datetime.now(timezone.utc),
+            duration_ms=profile.duration * 1000,
+            samples=profile.samples,
+        )
+        if format == "speedscope":
+            body = json.dumps(profile.speedscope())
+        else:
+            body = profile.collapsed()
+        self._artifact(info).write_text(body)
+        self._meta(info.id).write_text(info.model_dump_json())
+        self._prune()
+        return info
+
+    def list(self) -> list[ProfileInfo]:
+        """Stored profiles, newest first."""
+        infos = []
+        for meta in self.directory.glob("*.meta.json"):
+            try:
+                infos.append(ProfileInfo.model_validate_json(meta.read_text()))
+            except (OSError, ValueError):
+                # Pruned or half-written by another worker meanwhile.
+                continue
+        return sorted(infos, key=lambda info: info.created_at, reverse=True)
+
+    def get(self, id: str) -> tuple[ProfileInfo, Path] | None:
+        """A profile's summary and artifact path, or `None` if it is gone."""
+        if not id or _UNSAFE.search(id):
+            return None
+        try:
+            info = ProfileInfo.model_validate_json(self._meta(id).read_text())
+        except (OSError, ValueError):
+            return None
+        artifact = self._artifact(info)
+        return (info, artifact) if artifact.exists() else None
+
+    def _prune(self) -> None:
+        for info in self.list()[self.max_profiles :]:
+            self._artifact(info).unlink(missing_ok=True)
+            self._meta(info.id).unlink(missing_ok=True)
+
+    def _artifact(self, info: ProfileInfo) -> Path:
+        return self.directory / f"{info.id}{EXTENSIONS[info.format]}"
+
+    def _meta(self, id: str) -> Path:
+        return self.directory / f"{id}.meta.json"
+
+
+profile_store = ProfileStore(
+    Path(settings.profiling_directory), max_profiles=settings.profiling_max_profiles
+)
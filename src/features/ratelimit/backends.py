@@ -0,0 +1,50 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class RateLimitStore(ABC):
+    """Storage for token buckets.
+
+    Implementations backed by a shared store (Redis, memcached, a database)
+    let several workers enforce one budget per client; the in-memory store
+    enforces it per worker process.
+    """
+
+    @abstractmethod
+    async def consume(
+        self, key: str, cost: float, *, rate: float, burst: float
+    ) -> float:
+        """Take `cost` tokens from the bucket for `key`.
+
+        `cost` must not exceed `burst`. Returns `0` when the tokens were taken,
+        otherwise the number of seconds until the bucket holds enough tokens
+        (nothing is taken).
+        """
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process token buckets with LRU eviction of idle clients."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def consume(
+        self, key: str, cost: float, *, rate: float, burst: float
+    ) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / rate if rate > 0 else float("inf")
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import math
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from features.auth.bearer import authenticate_token
+
+from .backends import RateLimitStore
+
+
+async def send_rejection(
+    send: Send, status_code: int, detail: str, retry_after: float
+) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def client_key(scope: Scope) -> str:
+    """Identify the caller: authenticated user when possible, else client IP."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                # Verification results are cached, so this costs a dict lookup.
+                principal = authenticate_token(token)
+                if principal is not None:
+                    return f"user:{principal['user_id']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """Token-bucket rate limiting per client, weighted per route.
+
+    `route_weights` maps either `"METHOD /path"` or `"/path"` to the number
+    of tokens a request costs (default 1), so expensive list endpoints drain
+    the bucket faster. No weight may exceed `burst`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: RateLimitStore,
+        rate: float,
+        burst: float,
+        route_weights: dict[str, float] | None = None,
+        exempt_paths: list[str] | None = None,
+    ):
+        heaviest = max([1.0, *(route_weights or {}).values()])
+        if heaviest > burst:
+            raise ValueError(
+                f"burst ({burst}) must be at least the heaviest route weight "
+                f"({heaviest})"
+            )
+        self.app = app
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.route_weights = route_weights or {}
+        self.exempt_paths = frozenset(exempt_paths or ())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self.store.consume(
+            client_key(scope),
+            self.weight_for(scope["method"], scope["path"]),
+            rate=self.rate,
+            burst=self.burst,
+        )
+        if retry_after > 0:
+            await send_rejection(send, 429, "Too many requests", retry_after)
+            return
+
+        await self.app(scope, receive, send)
+
+    def weight_for(self, method: str, path: str) -> float:
+        weight = self.route_weights.get(f"{method} {path}")
+        if weight is None:
+            weight = self.route_weights.get(path, 1.0)
+        return weight
+
+
+class ConcurrencyLimitMiddleware:
+    """Caps in-flight requests per worker and sheds the excess with 503.
+
+    A request that finds every slot busy waits at most `queue_timeout`
+    seconds (and only while fewer than `max_queue` requests are waiting)
+    before being rejected, so overload turns into fast 503s instead of a
+    queue on the database pool.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        limit: int,
+        max_queue: int = 0,
+        queue_timeout: float = 0.0,
+        retry_after: float = 1.0,
+        exempt_paths: list[str] | None = None,
+    ):
+        self.app = app
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.exempt_paths = frozenset(exempt_paths or ())
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self._acquire():
+            await send_rejection(
+                send, 503, "Server is busy, retry later", self.retry_after
+            )
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _acquire(self) -> bool:
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.waiting >= self.max_queue or self.queue_timeout <= 0:
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
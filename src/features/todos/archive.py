@@ -0,0 +1,116 @@
+"""Moves long-completed todos from `todos` into `todos_archive`.
+
+Keeps the hot table and its indexes sized to the todos people still work
+on. Archived todos are read-only and stay readable through
+`TodoService.get` and `TodoService.list` with `include_archived`.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import pool_session, shard_router
+from features.changes.schemas import ChangeEntity, ChangeOperation
+from features.changes.services import ChangeLog
+from features.common.periodic import PeriodicTask
+from logger import logger
+from settings import settings
+
+from .models import ArchivedTodo, Todo
+
+_MOVED_COLUMNS = ("id", "title", "description", "completed", "user_id", "completed_at")
+
+
+async def archive_completed_todos(
+    *,
+    older_than_seconds: float,
+    chunk_size: int = 500,
+    session_factory: async_sessionmaker[AsyncSession] = pool_session("bulk"),
+) -> int:
+    """Move todos completed before the cutoff, one short transaction per chunk.
+
+    Each chunk is a `DELETE ... RETURNING` from `todos` and an `INSERT` of the
+    returned rows into the archive, so a todo reopened concurrently is either
+    moved whole or left alone. Moved todos are logged as deleted, as they
+    leave the lists clients sync. With sharding enabled every shard archives
+    its own todos. Returns the number of todos moved.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds)
+    moved = 0
+    for shard in shard_router.shard_ids:
+        moved += await _archive_shard(shard, cutoff, chunk_size, session_factory)
+
+    if moved:
+        await logger.ainfo(f"Archived {moved} completed todos", archived=moved)
+    return moved
+
+
+async def _archive_shard(
+    shard: str,
+    cutoff: datetime,
+    chunk_size: int,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> int:
+    bind = shard_router.bind(shard)
+    moved = 0
+    while True:
+        async with session_factory() as db, db.begin():
+            chunk = (
+                select(Todo.id)
+                .where(
+                    Todo.completed.is_(True),
+                    Todo.completed_at < cutoff,
+                )
+                .order_by(Todo.id)
+                .limit(chunk_size)
+            )
+            rows = (
+                await db.execute(
+                    delete(Todo)
+                    .where(Todo.id.in_(chunk))
+                    .returning(*(getattr(Todo, name) for name in _MOVED_COLUMNS)),
+                    bind_arguments=bind,
+                )
+            ).all()
+            if rows:
+                await db.execute(
+                    insert(ArchivedTodo.__table__),
+                    [dict(row._mapping) for row in rows],
+                    bind_arguments=bind,
+                )
+                await ChangeLog(db).record(
+                    ChangeEntity.todo, [row.id for row in rows], ChangeOperation.deleted
+                )
+        moved += len(rows)
+        if len(rows) < chunk_size:
+            return moved
+
+
+class TodoArchiver:
+    """Runs `archive_completed_todos` periodically for the app's lifetime."""
+
+    def __init__(self, *, interval: float, older_than_seconds: float, chunk_size: int):
+        self.older_than_seconds = older_than_seconds
+        self.chunk_size = chunk_size
+        self._runner = PeriodicTask(
+            self._archive, interval=interval, name="Todo archiving"
+        )
+
+    def start(self) -> None:
+        self._runner.start()
+
+    async def stop(self) -> None:
+        await self._runner.stop()
+
+    async def _archive(self) -> None:
+        await archive_completed_todos(
+            older_than_seconds=self.older_than_seconds, chunk_size=self.chunk_size
+        )
+
+
+todo_archiver = TodoArchiver(
+    interval=settings.archive_interval_seconds,
+    older_than_seconds=settings.archive_after_seconds,
+    chunk_size=settings.archive_chunk_size,
+)
@@ -0,0 +1,266 @@
+"""Write-behind buffer for rapid, idempotent todo updates.
+
+Clients that toggle `completed` (or retype a title) many times a second
+would otherwise open a write transaction per request. With
+`todo_write_coalescing_enabled`, `TodoService.update` acknowledges updates
+that only set fields in `COALESCED_FIELDS` and leaves them here. Later values
+for the same todo replace earlier ones, and the buffer writes everything
+pending as batched UPDATEs in one transaction every
+`todo_write_coalescing_window_seconds`. A full buffer flushes sooner, and
+shutdown flushes the rest.
+
+`TodoService.get` and `get_many` overlay pending values, so a worker reads its own
+writes. Lists and other workers see a value once it is flushed, and a crash
+loses at most one window of acknowledged updates.
+"""
+
+import asyncio
+from typing import Any, Collection
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import call_after_commit, local_session, shard_router
+from features.changes.schemas import ChangeEntity, ChangeOperation
+from features.changes.services import ChangeLog
+from features.common.periodic import PeriodicTask
+from logger import logger
+from metrics import registry
+from settings import settings
+
+from .events import todo_hub, todo_message
+from .models import Todo
+from .schemas.base import TodoRead
+
+# Fields whose updates can be acknowledged before they are written. Setting
+# them twice is the same as setting them once, and no other row depends on
+# them; `user_id` must be checked and can move the todo to another shard.
+COALESCED_FIELDS = frozenset({"title", "description", "completed"})
+
+pending_gauge = registry.gauge(
+    "app_todo_writes_pending", "Todos with buffered, unwritten updates"
+)
+coalesced_counter = registry.counter(
+    "app_todo_writes_coalesced_total",
+    "Buffered updates merged into an earlier one for the same todo",
+)
+flushed_counter = registry.counter(
+    "app_todo_writes_flushed_total", "Todos written by write-behind flushes"
+)
+rejected_counter = registry.counter(
+    "app_todo_writes_rejected_total",
+    "Buffered todo updates dropped because the database refused them",
+)
+
+
+class TodoWriteBuffer:
+    """Buffers coalescable todo updates and writes them behind in batches."""
+
+    def __init__(
+        self,
+        *,
+        enabled: bool,
+        window: float,
+        max_pending: int,
+        session_factory: async_sessionmaker[AsyncSession] = local_session,
+    ):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        # todo id -> column values, newest last
+        self._pending: dict[int, dict[str, Any]] = {}
+        # The batch being written; still overlaid until it has committed.
+        self._flushing: dict[int, dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        # Cancelling could interrupt a flush halfway; stopping lets it finish.
+        self._flusher = PeriodicTask(
+            self.flush,
+            interval=window,
+            name="Flushing buffered todo writes",
+            graceful=True,
+        )
+        registry.add_collector(lambda: pending_gauge.set(len(self._pending)))
+
+    def accepts(self, changes: Collection[str]) -> bool:
+        return self.enabled and bool(changes) and set(changes) <= COALESCED_FIELDS
+
+    def put(self, todo_id: int, values: dict[str, Any]) -> None:
+        """Buffer `values` for `todo_id`, replacing pending values for it."""
+        pending = self._pending.get(todo_id)
+        if pending is None:
+            self._pending[todo_id] = dict(values)
+        else:
+            pending.update(values)
+            coalesced_counter.inc()
+        if len(self._pending) >= self.max_pending:
+            self._flusher.wake()
+
+    async def pending(self, todo_id: int) -> dict[str, Any]:
+        """A copy of `todo_id`'s pending values, for a direct write.
+
+        Waits for a flush writing `todo_id` to commit first; committing
+        after the direct write, its older values would overwrite it. The
+        values stay buffered until the direct write `forget`s them on commit.
+        """
+        while todo_id in self._flushing:
+            await self.settled()
+        return dict(self._pending.get(todo_id, {}))
+
+    async def settled(self) -> None:
+        """Wait for a flush in progress, if any, to commit."""
+        async with self._lock:
+            pass
+
+    def discard(self, todo_id: int) -> None:
+        """Drop `todo_id`'s pending values, for a deleted todo."""
+        self._pending.pop(todo_id, None)
+
+    def forget(self, todo_ids: Collection[int], names: Collection[str]) -> None:
+        """Drop pending `names` of `todo_ids`, overwritten by a later write."""
+        for todo_id in todo_ids:
+            pending = self._pending.get(todo_id)
+            if pending is None:
+                continue
+            for name in names:
+                pending.pop(name, None)
+            if not pending:
+                del self._pending[todo_id]
+
+    def overlay(self, todo: Todo) -> None:
+        """Show `todo` with its pending values, without marking it dirty."""
+        values = {
+            **self._flushing.get(todo.id, {}),
+            **self._pending.get(todo.id, {}),
+        }
+        for name, value in values.items():
+            set_committed_value(todo, name, value)
+
+    async def flush(self) -> int:
+        """Write every pending update in one transaction. Returns the count.
+
+        When the database refuses the batch, its todos are written one per
+        transaction instead, and the ones it still refuses are dropped and
+        logged, so a bad row never holds back the others.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            try:
+                written = await self._write_batch(self._flushing)
+            except BaseException:
+                # Keep the batch for the next flush, also when cancelled;
+                # newer values win.
+                for todo_id, values in self._flushing.items():
+                    self._pending[todo_id] = {
+                        **values,
+                        **self._pending.get(todo_id, {}),
+                    }
+                raise
+            finally:
+                self._flushing = {}
+        flushed_counter.inc(written)
+        return written
+
+    async def _write_batch(self, batch: dict[int, dict[str, Any]]) -> int:
+        """Write `batch`, removing each todo from it once it is settled."""
+        try:
+            await self._write(batch)
+        except (IntegrityError, DataError):
+            pass
+        else:
+            written = len(batch)
+            batch.clear()
+            return written
+
+        written = 0
+        for todo_id in list(batch):
+            try:
+                await self._write({todo_id: batch[todo_id]})
+            except (IntegrityError, DataError):
+                rejected_counter.inc()
+                await logger.aexception(
+                    "Dropped a buffered todo update the database refused",
+                    todo_id=todo_id,
+                    fields=sorted(batch[todo_id]),
+                )
+            else:
+                written += 1
+            # Written or dropped, it is not put back if a later row fails.
+            del batch[todo_id]
+        return written
+
+    async def _write(self, batch: dict[int, dict[str, Any]]) -> None:
+        table = Todo.__table__
+        # One executemany per combination of columns set.
+        rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for todo_id, values in batch.items():
+            rows_by_columns.setdefault(tuple(sorted(values)), []).append(
+                {"todo_id": todo_id, **values}
+            )
+
+        async with self.session_factory() as db, db.begin():
+            # Streams need the old values of fields their filters check.
+            toggled = [
+                todo_id for todo_id, values in batch.items() if "completed" in values
+            ]
+            previous = {}
+            if toggled:
+                rows = await db.execute(
+                    select(Todo.id, Todo.user_id, Todo.completed).where(
+                        Todo.id.in_(toggled)
+                    )
+                )
+                previous = {
+                    row.id: {"user_id": row.user_id, "completed": row.completed}
+                    for row in rows
+                }
+
+            stmt = update(table).where(table.c.id == bindparam("todo_id"))
+            for rows in rows_by_columns.values():
+                for shard in shard_router.shard_ids:
+                    await db.execute(
+                        stmt, rows, bind_arguments=shard_router.bind(shard)
+                    )
+
+            # Todos deleted meanwhile are simply not there any more.
+            todos = list(await db.scalars(select(Todo).where(Todo.id.in_(batch))))
+            await ChangeLog(db).record(
+                ChangeEntity.todo, [todo.id for todo in todos], ChangeOperation.updated
+            )
+            messages = [
+                todo_message(
+                    ChangeOperation.updated,
+                    TodoRead.model_validate(todo).model_dump(mode="json"),
+                    previous.get(todo.id),
+                )
+                for todo in todos
+            ]
+
+            def publish() -> None:
+                for message in messages:
+                    todo_hub.publish(message)
+
+            call_after_commit(db, publish)
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    async def stop(self) -> None:
+        await self._flusher.stop()
+        try:
+            await self.flush()
+        except Exception:
+            await logger.aexception(
+                "Flushing buffered todo writes on shutdown failed",
+                pending=len(self._pending),
+            )
+
+
+todo_write_buffer = TodoWriteBuffer(
+    enabled=settings.todo_write_coalescing_enabled,
+    window=settings.todo_write_coalescing_window_seconds,
+    max_pending=settings.todo_write_coalescing_max_pending,
+)
@@ -0,0 +1,56 @@
+from typing import Any
+
+from features.changes.schemas import ChangeOperation
+from features.events.hub import BroadcastHub, Predicate
+from features.events.pubsub import pubsub
+from settings import settings
+
+from .schemas.base import TodoFilterParams
+
+# Fields stream subscribers filter on; see `matches`.
+FILTERED_FIELDS = frozenset({"user_id", "completed"})
+
+todo_hub = BroadcastHub(
+    "todos",
+    pubsub,
+    max_subscribers=settings.sse_max_subscribers,
+    buffer_size=settings.sse_buffer_size,
+)
+
+
+def todo_message(
+    operation: ChangeOperation,
+    todo: dict[str, Any],
+    previous: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Stream payload; deletes carry only `id`, `user_id` and `completed`.
+
+    Updates that set a filtered field also carry `previous`, the todo's
+    `FILTERED_FIELDS` before the update.
+    """
+    message = {"operation": operation.value, "todo": todo}
+    if previous is not None:
+        message["previous"] = previous
+    return message
+
+
+def matches(filters: TodoFilterParams) -> Predicate:
+    """Messages about todos that match `filters`, or matched them before.
+
+    A todo leaving the filter is sent too, so the subscriber can drop it.
+    """
+
+    def matching(todo: dict[str, Any]) -> bool:
+        if filters.user_id is not None and todo["user_id"] != filters.user_id:
+            return False
+        if filters.completed is not None and todo["completed"] != filters.completed:
+            return False
+        return True
+
+    def predicate(message: dict[str, Any]) -> bool:
+        todo = message["todo"]
+        if matching(todo):
+            return True
+        return "previous" in message and matching({**todo, **message["previous"]})
+
+    return predicate
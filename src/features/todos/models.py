@@ -1,6 +1,10 @@
+from datetime import datetime
+from functools import cache
+
 from database import Base
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, aliased, mapped_column, relationship
+from sqlalchemy.orm.util import AliasedClass
+from sqlalchemy import DateTime, ForeignKey, func, select, union_all
 from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
@@ -9,12 +13,67 @@ if TYPE_CHECKING:
 
 class Todo(Base):
     __tablename__ = "todos"
+    # Without AUTOINCREMENT SQLite reuses the highest id once it is deleted,
+    # which may be the id of an archived todo.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(nullable=False)
     description: Mapped[str | None] = mapped_column(nullable=True)
     completed: Mapped[bool] = mapped_column(default=False, nullable=False)
     user_id: Mapped[Optional[int]] = mapped_column(
-        ForeignKey("users.id"), nullable=True
+        ForeignKey("users.id", name="fk_todos_user_id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    # Set when `completed` turns true, cleared when it turns false; the
+    # archiver moves todos completed longer ago than the archive age.
+    completed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
     )
     user: Mapped[Optional["User"]] = relationship(back_populates="todos")
+
+
+class ArchivedTodo(Base):
+    """A completed todo moved out of `todos` by the archiver. Read-only.
+
+    Keeps the id it had in `todos`, so reads spanning both tables see one
+    id space.
+    """
+
+    __tablename__ = "todos_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    title: Mapped[str] = mapped_column(nullable=False)
+    description: Mapped[str | None] = mapped_column(nullable=True)
+    completed: Mapped[bool] = mapped_column(nullable=False)
+    user_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id", name="fk_todos_archive_user_id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
+    completed_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+_SHARED_COLUMNS = ("id", "title", "description", "completed", "user_id", "completed_at")
+
+
+@cache
+def todos_with_archive() -> AliasedClass[Todo]:
+    """Live and archived todos as one `Todo`-shaped entity.
+
+    For reads spanning both tables; archived rows keep their ids, so
+    identities never clash. Built on first use, once every mapper exists.
+    """
+    return aliased(
+        Todo,
+        union_all(
+            select(*(getattr(Todo, name) for name in _SHARED_COLUMNS)),
+            select(*(getattr(ArchivedTodo, name) for name in _SHARED_COLUMNS)),
+        ).subquery("todos_with_archive"),
+        name="todos_with_archive",
+    )
@@ -1,17 +1,35 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_db, use_pool
+from features.changes.schemas import ChangeEntity, ChangeSet
+from features.changes.services import ChangeLog
+from features.common.batch import BatchResponse, batch_ids
+from features.common.fields import FieldSelection, sparse_fields, sparse_response
 from features.common.pagination import PaginatedResponse, paginate
+from features.common.routing import SessionReleaseRoute
+from features.events.hub import EventStreamResponse, HubFullError
+from .events import matches, todo_hub
 from .services import TodoService, get_todo_service
-from .schemas.base import TodoCreate, TodoListParams, TodoRead, TodoUpdate
+from .schemas.base import (
+    TodoBulkComplete,
+    TodoBulkReassign,
+    TodoBulkResult,
+    TodoCreate,
+    TodoFilterParams,
+    TodoListParams,
+    TodoRead,
+    TodoUpdate,
+)
 from features.todos.schemas.relational import TodoReadWithUser
+from settings import settings
 
 TodoListQuery = Annotated[TodoListParams, Query()]
 
-router = APIRouter(prefix="/todos", tags=["todos"])
+router = APIRouter(prefix="/todos", tags=["todos"], route_class=SessionReleaseRoute)
 
 
 @router.post("/", response_model=TodoRead, status_code=status.HTTP_201_CREATED)
@@ -25,29 +43,135 @@ async def create_todo(
     return todo
 
 
+@router.post(
+    "/actions/complete",
+    response_model=TodoBulkResult,
+    dependencies=[Depends(use_pool("bulk"))],
+)
+async def complete_todos(
+    action: TodoBulkComplete,
+    db: AsyncSession = Depends(get_db),
+    todo_service: TodoService = Depends(get_todo_service),
+):
+    async with db.begin():
+        result = await todo_service.complete_many(action)
+    return result
+
+
+@router.post(
+    "/actions/reassign",
+    response_model=TodoBulkResult,
+    dependencies=[Depends(use_pool("bulk"))],
+)
+async def reassign_todos(
+    action: TodoBulkReassign,
+    db: AsyncSession = Depends(get_db),
+    todo_service: TodoService = Depends(get_todo_service),
+):
+    async with db.begin():
+        result = await todo_service.reassign_many(action)
+    return result
+
+
+@router.get("/batch", response_model=BatchResponse[TodoRead])
+async def get_todos_batch(
+    ids: list[int] = Depends(batch_ids),
+    todo_service: TodoService = Depends(get_todo_service),
+):
+    """Several todos by id with one query, in the requested order."""
+    todos = await todo_service.get_many(ids)
+    return {
+        "items": [todo for todo in todos if todo is not None],
+        "missing": [i for i, todo in zip(ids, todos) if todo is None],
+    }
+
+
+@router.get("/changes", response_model=ChangeSet)
+async def list_todo_changes(
+    since: Annotated[
+        int | None,
+        Query(
+            ge=0,
+            description=(
+                "Cursor from a previous response; omit to get the current "
+                "cursor before a full sync"
+            ),
+        ),
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=settings.change_log_max_page)] = 500,
+    db: AsyncSession = Depends(get_db),
+):
+    """Ids of todos changed or deleted since `since` (`410` once compacted)."""
+    changes = ChangeLog(db)
+    if since is None:
+        return ChangeSet(
+            cursor=await changes.head(), changed=[], deleted=[], has_more=False
+        )
+    return await changes.since(ChangeEntity.todo, since, limit)
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {"content": {"text/event-stream": {}}},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Too many subscribers"},
+    },
+)
+async def stream_todos(filters: Annotated[TodoFilterParams, Query()]):
+    """Server-Sent Events of committed todo changes matching the filters.
+
+    `event: todo` carries `{"operation", "todo"}`; `event: resync` means
+    the client fell behind and should refetch (or use `/todos/changes`).
+    """
+    try:
+        subscription = todo_hub.subscribe(matches(filters))
+    except HubFullError:
+        raise HTTPException(status_code=503, detail="Too many event stream subscribers")
+    return EventStreamResponse(
+        todo_hub,
+        subscription,
+        event="todo",
+        heartbeat=settings.sse_heartbeat_seconds,
+    )
+
+
 @router.get("/with-users", response_model=PaginatedResponse[TodoReadWithUser])
 async def list_todos_with_users(
     pagination: TodoListQuery,
+    fields: FieldSelection | None = Depends(sparse_fields(TodoReadWithUser)),
     todo_service: TodoService = Depends(get_todo_service),
 ):
-    todos, total = await todo_service.list_with_users(pagination)
+    todos, total = await todo_service.list_with_users(pagination, fields)
+    if fields:
+        return sparse_response(paginate(map(fields.dump, todos), total, pagination))
     return paginate(todos, total, pagination)
 
 
 @router.get("/{todo_id}", response_model=TodoRead)
 async def get_todo(
     todo_id: int,
+    fields: FieldSelection | None = Depends(sparse_fields(TodoRead)),
+    include_archived: bool = Query(
+        False, description="Also look the todo up in the archive"
+    ),
     todo_service: TodoService = Depends(get_todo_service),
 ):
-    return await todo_service.get(todo_id)
+    todo = await todo_service.get(todo_id, fields, include_archived)
+    if fields:
+        return sparse_response(fields.dump(todo))
+    return todo
 
 
 @router.get("/", response_model=PaginatedResponse[TodoRead])
 async def list_todos(
     pagination: TodoListQuery,
+    fields: FieldSelection | None = Depends(sparse_fields(TodoRead)),
     todo_service: TodoService = Depends(get_todo_service),
 ):
-    todos, total = await todo_service.list(pagination)
+    todos, total = await todo_service.list(pagination, fields=fields)
+    if fields:
+        return sparse_response(paginate(map(fields.dump, todos), total, pagination))
     return paginate(todos, total, pagination)
 
 
@@ -1,6 +1,6 @@
 from enum import Enum
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from features.common.query import BaseListQuery
 
@@ -22,6 +22,14 @@ class TodoUpdate(BaseModel):
     completed: bool | None = None
     user_id: int | None = None
 
+    @field_validator("title", "completed")
+    @classmethod
+    def _not_null(cls, value):
+        # Omit these to leave them unchanged; the columns are NOT NULL.
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 
 class TodoRead(TodoBase):
     id: int
@@ -35,7 +43,39 @@ class TodoSortField(str, Enum):
     user_id = "user_id"
 
 
-class TodoListParams(BaseListQuery):
+class TodoFilterParams(BaseModel):
     completed: bool | None = Field(default=None)
     user_id: int | None = Field(default=None, ge=1)
+
+
+class TodoListParams(BaseListQuery, TodoFilterParams):
     sort_by: TodoSortField = Field(default=TodoSortField.id)
+    include_archived: bool = Field(
+        default=False, description="Also list completed todos moved to the archive"
+    )
+
+
+class TodoBulkAction(TodoFilterParams):
+    dry_run: bool = Field(
+        default=False, description="Only count the matching todos; change nothing"
+    )
+    return_ids: bool = Field(
+        default=False, description="Include the ids of the changed todos"
+    )
+
+
+class TodoBulkComplete(TodoBulkAction):
+    pass
+
+
+class TodoBulkReassign(TodoBulkAction):
+    to_user_id: int | None = Field(
+        ge=1, description="New owner, or null to unassign the todos"
+    )
+
+
+class TodoBulkResult(BaseModel):
+    matched: int
+    affected: int
+    dry_run: bool
+    ids: list[int] | None = None
@@ -1,20 +1,55 @@
-from .models import Todo
-from .schemas.base import TodoCreate, TodoListParams, TodoSortField, TodoUpdate
-from database import get_db
+from __future__ import annotations
+
+import heapq
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Sequence
+
+from .coalescing import todo_write_buffer
+from .events import FILTERED_FIELDS, todo_hub, todo_message
+from .models import ArchivedTodo, Todo, todos_with_archive
+from .schemas.base import (
+    TodoBulkAction,
+    TodoBulkComplete,
+    TodoBulkReassign,
+    TodoBulkResult,
+    TodoCreate,
+    TodoFilterParams,
+    TodoListParams,
+    TodoRead,
+    TodoSortField,
+    TodoUpdate,
+)
+from database import call_after_commit, get_db, shard_router
 from fastapi import Depends, HTTPException
-from features.common.query import SortOrder
+from features.changes.schemas import ChangeEntity, ChangeOperation
+from features.changes.services import ChangeLog
+from features.common.fields import FieldSelection
+from features.common.loader import BatchLoader
+from features.common.query import SortOrder, StatementCache
+from features.jobs.queue import JobPriority, job_queue
 from features.users.services import UserService, get_user_service
 from logger import logger
-from sqlalchemy import func, select
+from settings import settings
+from sharding.router import move_rows
+from sqlalchemy import bindparam, case, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, undefer
+from sqlalchemy.orm.util import identity_key
 
 
 class TodoService:
+    # List statements are built once per (filters, sort, total mode) shape and
+    # take their values as bound parameters.
+    list_statements = StatementCache()
 
     def __init__(self, db: AsyncSession, user_service: UserService):
         self.db = db
         self.user_service = user_service
+        self.changes = ChangeLog(db)
+        self.loader: BatchLoader[int, Todo] = BatchLoader(self._load_by_ids, session=db)
+        self.shards = shard_router
+        self.writes = todo_write_buffer
 
     async def create(self, todo_create: TodoCreate, *, flush: bool = True) -> Todo:
         """Create a new todo item."""
@@ -22,68 +57,333 @@ class TodoService:
             # Verify that the user exists
             await self.user_service.get(todo_create.user_id)
 
-        todo = Todo(**todo_create.model_dump())
+        todo = Todo(
+            **todo_create.model_dump(),
+            completed_at=_now() if todo_create.completed else None,
+        )
+        if self.shards.enabled:
+            await self.shards.place(self.db, todo.user_id)
+            todo.id = await self.shards.next_id(self.db, Todo.__tablename__)
         self.db.add(todo)
+        self.changes.record_created(ChangeEntity.todo, todo)
+        self._announce(ChangeOperation.created, todo)
         if flush:
             await self.db.flush()
-        await logger.ainfo(f"Created todo item with id {todo.id}", todo_id=todo.id)
+        # Read at commit, when the id is known either way.
+        call_after_commit(
+            self.db, lambda: job_queue.enqueue("todos.log_created", todo_id=todo.id)
+        )
         return todo
 
-    async def get(self, todo_id: int) -> Todo:
-        todo = await self.db.get(Todo, todo_id)
+    async def get(
+        self,
+        todo_id: int,
+        fields: FieldSelection | None = None,
+        include_archived: bool = False,
+    ) -> Todo | ArchivedTodo:
+        options = fields.load_options(Todo) if fields else None
+        todo: Todo | ArchivedTodo | None = await self.db.get(
+            Todo, todo_id, options=options
+        )
+        if todo is None and include_archived:
+            options = fields.load_options(ArchivedTodo) if fields else None
+            todo = await self.db.get(ArchivedTodo, todo_id, options=options)
 
         if not todo:
             raise HTTPException(status_code=404, detail="Todo not found")
 
+        if isinstance(todo, Todo):
+            self.writes.overlay(todo)
         return todo
 
+    async def get_many(self, todo_ids: Sequence[int]) -> list[Todo | None]:
+        """Todos in `todo_ids` order, `None` for ids that do not exist.
+
+        Todos already in the identity map are reused; the rest are fetched
+        with one `IN` query through `loader`. Buffered writes are overlaid,
+        as in `get`.
+        """
+        todos = [self.db.identity_map.get(identity_key(Todo, i)) for i in todo_ids]
+        misses = [i for i, todo in zip(todo_ids, todos) if todo is None]
+        loaded = dict(zip(misses, await self.loader.load_many(misses)))
+        todos = [todo or loaded[i] for i, todo in zip(todo_ids, todos)]
+        for todo in todos:
+            if todo is not None:
+                self.writes.overlay(todo)
+        return todos
+
+    async def _load_by_ids(self, todo_ids: list[int]) -> dict[int, Todo]:
+        """Batch function behind `loader`: one `IN` query per tick."""
+        todos = await self.db.scalars(select(Todo).where(Todo.id.in_(todo_ids)))
+        return {todo.id: todo for todo in todos}
+
     async def list(
-        self, params: TodoListParams, include_user: bool = False
+        self,
+        params: TodoListParams,
+        include_user: bool = False,
+        fields: FieldSelection | None = None,
     ) -> tuple[list[Todo], int]:
-        filters = self._filters(params)
+        """A page of todos matching `params`, and the total.
 
-        count_stmt = select(func.count()).select_from(Todo)
-        if filters:
-            count_stmt = count_stmt.where(*filters)
-        total = int(await self.db.scalar(count_stmt) or 0)
+        Reads only the live table unless `params.include_archived` is set;
+        then completed todos are read from the live table and the archive
+        together. Incomplete todos are never archived, so `completed=false`
+        stays on the live table either way.
 
-        stmt = select(Todo)
-        if include_user:
-            stmt = stmt.options(selectinload(Todo.user))
-        if filters:
-            stmt = stmt.where(*filters)
-        stmt = stmt.order_by(self._ordering_column(params))
-        stmt = stmt.offset(params.offset).limit(params.page_size)
+        With sharding enabled, a list scoped to `user_id` runs on that
+        owner's shard only; any other list is gathered from every shard.
+        """
+        values = self._filter_values(params)
+        shape = frozenset(values)
+        archived = params.include_archived and params.completed is not False
+        entity = todos_with_archive() if archived else Todo
+
+        count_stmt = self.list_statements.get(
+            ("count", shape, archived),
+            lambda: self._count_statement(shape, entity),
+        )
+        bind = None
+        if self.shards.enabled and params.user_id is not None:
+            bind = self.shards.bind(await self.shards.locate(self.db, params.user_id))
+        # Unpinned counts run on every shard, one row each.
+        total = sum(await self.db.scalars(count_stmt, values, bind_arguments=bind))
+        merged = self.shards.enabled and bind is None
 
-        todos = list(await self.db.scalars(stmt))
+        page_stmt = self.list_statements.get(
+            (
+                "page",
+                shape,
+                archived,
+                params.sort_by,
+                params.sort_order,
+                include_user,
+                fields.key if fields else None,
+                merged,
+            ),
+            lambda: self._page_statement(
+                shape, params, include_user, fields, entity, merged=merged
+            ),
+        )
+        if merged:
+            return await self._gather_page(page_stmt, values, params), total
+
+        todos = list(
+            await self.db.scalars(
+                page_stmt,
+                {**values, "offset": params.offset, "limit": params.page_size},
+                bind_arguments=bind,
+            )
+        )
         return todos, total
 
+    async def _gather_page(
+        self, page_stmt, values: dict, params: TodoListParams
+    ) -> list[Todo]:
+        """One page merged from the sorted leading rows of every shard.
+
+        Each shard returns its first `offset + page_size` rows, so deep pages
+        cost more here than on a single database.
+        """
+        window = {**values, "offset": 0, "limit": params.offset + params.page_size}
+        runs = [
+            list(
+                await self.db.scalars(
+                    page_stmt, window, bind_arguments=self.shards.bind(shard)
+                )
+            )
+            for shard in self.shards.shard_ids
+        ]
+        name = self._ordering_column(params).element.key
+
+        def key(todo: Todo):
+            # NULLs first when ascending, as SQLite sorts them; ties by id.
+            value = getattr(todo, name)
+            return value is not None, value, todo.id
+
+        merged = heapq.merge(
+            *runs, key=key, reverse=params.sort_order == SortOrder.desc
+        )
+        return list(islice(merged, params.offset, params.offset + params.page_size))
+
     async def list_with_users(
-        self, params: TodoListParams
+        self, params: TodoListParams, fields: FieldSelection | None = None
     ) -> tuple[list[Todo], int]:
-        return await self.list(params, include_user=True)
+        return await self.list(params, include_user=True, fields=fields)
 
-    async def update(
-        self, todo_id: int, todo_update: TodoUpdate, *, flush: bool = False
-    ) -> Todo:
-        todo = await self.get(todo_id)
+    async def update(self, todo_id: int, todo_update: TodoUpdate) -> Todo:
+        """Apply a partial update with a single `UPDATE ... RETURNING`.
 
-        for field, value in todo_update.model_dump(exclude_unset=True).items():
-            setattr(todo, field, value)
+        With write coalescing enabled, updates of `COALESCED_FIELDS` only are
+        buffered in `todo_write_buffer` instead and written behind.
+        """
+        changes = todo_update.model_dump(exclude_unset=True)
+        if not changes:
+            return await self.get(todo_id)
 
-        self.db.add(todo)
-        if flush:
-            await self.db.flush()
+        if self.writes.accepts(changes):
+            return await self._write_behind(todo_id, changes)
+        if changes.get("user_id") is not None:
+            # Verify that the new owner exists
+            await self.user_service.get(changes["user_id"])
+        if self.writes.enabled:
+            # This write lands first, so buffered values must go with it.
+            changes = {**(await self.writes.pending(todo_id)), **changes}
+
+        if "completed_at" in changes:
+            # Taken over from the buffer, already resolved.
+            pass
+        elif changes.get("completed"):
+            # Completing an already completed todo keeps its completion time.
+            changes["completed_at"] = case(
+                (Todo.completed.is_(True), Todo.completed_at), else_=_now()
+            )
+        elif "completed" in changes:
+            changes["completed_at"] = None
+
+        previous = {}
+        if FILTERED_FIELDS & changes.keys():
+            # RETURNING only has the new values; streams need the old ones.
+            previous = await self._filtered_values(Todo.id == todo_id)
+        todo = await self.db.scalar(
+            update(Todo).where(Todo.id == todo_id).values(**changes).returning(Todo)
+        )
+
+        if not todo:
+            raise HTTPException(status_code=404, detail="Todo not found")
 
+        if self.shards.enabled and "user_id" in changes:
+            await self._relocate([todo])
+        await self.changes.record(ChangeEntity.todo, [todo.id], ChangeOperation.updated)
+        # Kept buffered until now, so a failed write loses none of them.
+        call_after_commit(self.db, lambda: self.writes.forget([todo.id], changes))
+        self._announce(ChangeOperation.updated, todo, previous.get(todo.id))
         return todo
 
-    async def delete(self, todo_id: int) -> None:
-        """Delete a todo item."""
+    async def _write_behind(self, todo_id: int, changes: dict) -> Todo:
+        """Acknowledge `changes` now and leave the write to the buffer."""
         todo = await self.get(todo_id)
+        if changes.get("completed"):
+            changes["completed_at"] = todo.completed_at if todo.completed else _now()
+        elif "completed" in changes:
+            changes["completed_at"] = None
+
+        self.writes.put(todo.id, changes)
+        self.writes.overlay(todo)
+        return todo
+
+    async def delete(self, todo_id: int) -> None:
+        """Delete a todo item with a single `DELETE ... RETURNING`."""
+        deleted = (
+            await self.db.execute(
+                delete(Todo)
+                .where(Todo.id == todo_id)
+                .returning(Todo.id, Todo.user_id, Todo.completed)
+            )
+        ).one_or_none()
 
-        await self.db.delete(todo)
+        if deleted is None:
+            raise HTTPException(status_code=404, detail="Todo not found")
+
+        await self.changes.record(
+            ChangeEntity.todo, [deleted.id], ChangeOperation.deleted
+        )
+        call_after_commit(self.db, lambda: self.writes.discard(deleted.id))
+        snapshot = dict(deleted._mapping)
+        call_after_commit(
+            self.db,
+            lambda: todo_hub.publish(todo_message(ChangeOperation.deleted, snapshot)),
+        )
+
+    async def complete_many(self, action: TodoBulkComplete) -> TodoBulkResult:
+        """Mark every todo matching the filter as completed."""
+        return await self._bulk_update(
+            action,
+            Todo.completed.is_(False),
+            {"completed": True, "completed_at": _now()},
+        )
+
+    async def reassign_many(self, action: TodoBulkReassign) -> TodoBulkResult:
+        """Move every todo matching the filter to another owner."""
+        if action.to_user_id is not None:
+            # Verify that the new owner exists
+            await self.user_service.get(action.to_user_id)
+
+        return await self._bulk_update(
+            action,
+            Todo.user_id.is_distinct_from(action.to_user_id),
+            {"user_id": action.to_user_id},
+        )
+
+    async def _bulk_update(
+        self, action: TodoBulkAction, pending, values: dict
+    ) -> TodoBulkResult:
+        """Run one set-based UPDATE over the filtered todos.
+
+        `pending` narrows the write to rows that would actually change, so
+        `affected` counts real modifications while `matched` counts the
+        filter's rows. Filters matching more than `todo_bulk_max_rows` are
+        refused outright. Rows added between the count and the UPDATE are
+        caught when the rows to write are selected, at most one past the
+        cap, so an oversized write is refused before it starts.
+        """
+        cap = settings.todo_bulk_max_rows
+        filters = self._filters(action)
+
+        count_stmt = select(func.count()).select_from(Todo)
+        if filters:
+            count_stmt = count_stmt.where(*filters)
+        matched = sum(await self.db.scalars(count_stmt))
+
+        if matched > cap:
+            raise _over_bulk_cap(matched)
+
+        if action.dry_run:
+            affected = sum(await self.db.scalars(count_stmt.where(pending)))
+            return TodoBulkResult(matched=matched, affected=affected, dry_run=True)
+
+        if self.writes.enabled:
+            # A batch written meanwhile must not overwrite this write.
+            await self.writes.settled()
+        # Selected first for the cap, and for the old values streams need.
+        previous = await self._filtered_values(*filters, pending, limit=cap + 1)
+        if len(previous) > cap:
+            raise _over_bulk_cap(f"more than {cap}")
+        stmt = update(Todo).where(Todo.id.in_(previous), pending).values(**values)
+        todos = list(await self.db.scalars(stmt.returning(Todo)))
+        ids = [todo.id for todo in todos]
+        if self.shards.enabled and "user_id" in values:
+            await self._relocate(todos)
+        await self.changes.record(ChangeEntity.todo, ids, ChangeOperation.updated)
+        # Buffered values of these columns are older than this write.
+        call_after_commit(self.db, lambda: self.writes.forget(ids, values))
+        for todo in todos:
+            self._announce(ChangeOperation.updated, todo, previous.get(todo.id))
+
+        await logger.ainfo(
+            f"Bulk updated {len(ids)} todos", matched=matched, affected=len(ids)
+        )
+        return TodoBulkResult(
+            matched=matched,
+            affected=len(ids),
+            dry_run=False,
+            ids=ids if action.return_ids else None,
+        )
 
-    def _filters(self, params: TodoListParams) -> list:
+    async def _relocate(self, todos: list[Todo]) -> None:
+        """Move reassigned todos to the shard of their new owner."""
+        ids_by_target: dict[str, list[int]] = {}
+        for todo in todos:
+            target = await self.shards.place(self.db, todo.user_id)
+            ids_by_target.setdefault(target, []).append(todo.id)
+
+        for target, ids in ids_by_target.items():
+            for source in self.shards.shard_ids:
+                if source != target:
+                    await move_rows(
+                        self.db, Todo, Todo.id.in_(ids), source=source, target=target
+                    )
+
+    def _filters(self, params: TodoFilterParams) -> list:
         clauses = []
         if params.completed is not None:
             clauses.append(Todo.completed == params.completed)
@@ -91,22 +391,116 @@ class TodoService:
             clauses.append(Todo.user_id == params.user_id)
         return clauses
 
-    def _ordering_column(self, params: TodoListParams):
+    async def _filtered_values(
+        self, *where, limit: int | None = None
+    ) -> dict[int, dict]:
+        """`FILTERED_FIELDS` of the todos matching `where`, by id."""
+        rows = await self.db.execute(
+            select(Todo.id, Todo.user_id, Todo.completed).where(*where).limit(limit)
+        )
+        return {
+            row.id: {"user_id": row.user_id, "completed": row.completed} for row in rows
+        }
+
+    def _announce(
+        self, operation: ChangeOperation, todo: Todo, previous: dict | None = None
+    ) -> None:
+        """Publish `todo` to stream subscribers once the transaction commits."""
+        # Serialized at commit time, when a created todo has its id.
+        call_after_commit(
+            self.db,
+            lambda: todo_hub.publish(
+                todo_message(
+                    operation,
+                    TodoRead.model_validate(todo).model_dump(mode="json"),
+                    previous,
+                )
+            ),
+        )
+
+    def _filter_values(self, params: TodoFilterParams) -> dict:
+        """Bound parameter values for the filters set on `params`."""
+        values = {"completed": params.completed, "user_id": params.user_id}
+        return {name: value for name, value in values.items() if value is not None}
+
+    def _bound_filters(self, names: frozenset[str], entity=Todo) -> list:
+        columns = {"completed": entity.completed, "user_id": entity.user_id}
+        return [columns[name] == bindparam(name) for name in sorted(names)]
+
+    def _count_statement(self, names: frozenset[str], entity=Todo):
+        return (
+            select(func.count())
+            .select_from(entity)
+            .where(*self._bound_filters(names, entity))
+        )
+
+    def _page_statement(
+        self,
+        names: frozenset[str],
+        params: TodoListParams,
+        include_user: bool,
+        fields: FieldSelection | None,
+        entity=Todo,
+        *,
+        merged: bool = False,
+    ):
+        """The page query; `merged` pages are sorted again across shards."""
+        ordering = [self._ordering_column(params, entity)]
+        name = ordering[0].element.key
+        if name != "id":
+            # The id breaks ties, so equal sort keys page deterministically.
+            descending = params.sort_order == SortOrder.desc
+            ordering.append(entity.id.desc() if descending else entity.id.asc())
+        stmt = select(entity).where(*self._bound_filters(names, entity))
+        if fields:
+            # The selection names the relations to load, if any.
+            stmt = stmt.options(*fields.load_options(entity))
+            if merged:
+                # `_gather_page` reads the sort key off every row.
+                stmt = stmt.options(undefer(getattr(entity, name)))
+        elif include_user:
+            stmt = stmt.options(selectinload(entity.user))
+        return (
+            stmt.order_by(*ordering)
+            .offset(bindparam("offset"))
+            .limit(bindparam("limit"))
+        )
+
+    def _ordering_column(self, params: TodoListParams, entity=Todo):
         match params.sort_by:
             case TodoSortField.title:
-                column = Todo.title
+                column = entity.title
             case TodoSortField.completed:
-                column = Todo.completed
+                column = entity.completed
             case TodoSortField.user_id:
-                column = Todo.user_id
+                column = entity.user_id
             case _:
-                column = Todo.id
+                column = entity.id
 
         if params.sort_order == SortOrder.desc:
             return column.desc()
         return column.asc()
 
 
+@job_queue.job("todos.log_created", priority=JobPriority.low, max_attempts=1)
+async def log_created(todo_id: int) -> None:
+    await logger.ainfo(f"Created todo item with id {todo_id}", todo_id=todo_id)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _over_bulk_cap(matched: int | str) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=(
+            f"Filter matches {matched} todos; bulk actions are limited "
+            f"to {settings.todo_bulk_max_rows}"
+        ),
+    )
+
+
 async def get_todo_service(
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(get_user_service),
@@ -14,6 +14,8 @@ class User(Base):
     email: Mapped[str] = mapped_column(nullable=False, unique=True)
     full_name: Mapped[str | None] = mapped_column(nullable=True)
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
+    # Rows are removed by ON DELETE CASCADE on fk_todos_user_id; the ORM never
+    # loads a user's todos just to delete them.
     todos: Mapped[list["Todo"]] = relationship(
-        back_populates="user", cascade="all, delete-orphan"
+        back_populates="user", cascade="all, delete-orphan", passive_deletes=True
     )
@@ -1,17 +1,22 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
+from settings import settings
+from features.common.batch import BatchResponse, batch_ids
+from features.common.fields import FieldSelection, sparse_fields, sparse_response
 from features.common.pagination import PaginatedResponse, paginate
+from features.common.routing import SessionReleaseRoute
+from features.jobs.queue import job_queue
 
 from .services import UserService, get_user_service
 from .schemas.base import UserCreate, UserListParams, UserRead, UserUpdate
 
 UserListQuery = Annotated[UserListParams, Query()]
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=SessionReleaseRoute)
 
 
 @router.post("/", response_model=UserRead, status_code=status.HTTP_201_CREATED)
@@ -25,20 +30,40 @@ async def create_user(
     return user
 
 
+@router.get("/batch", response_model=BatchResponse[UserRead])
+async def get_users_batch(
+    ids: list[int] = Depends(batch_ids),
+    user_service: UserService = Depends(get_user_service),
+):
+    """Several users by id with one query, in the requested order."""
+    users = await user_service.get_many(ids)
+    return {
+        "items": [user for user in users if user is not None],
+        "missing": [i for i, user in zip(ids, users) if user is None],
+    }
+
+
 @router.get("/{user_id}", response_model=UserRead)
 async def get_user(
     user_id: int,
+    fields: FieldSelection | None = Depends(sparse_fields(UserRead)),
     user_service: UserService = Depends(get_user_service),
 ):
-    return await user_service.get(user_id)
+    user = await user_service.get(user_id, fields)
+    if fields:
+        return sparse_response(fields.dump(user))
+    return user
 
 
 @router.get("/", response_model=PaginatedResponse[UserRead])
 async def list_users(
     pagination: UserListQuery,
+    fields: FieldSelection | None = Depends(sparse_fields(UserRead)),
     user_service: UserService = Depends(get_user_service),
 ):
-    users, total = await user_service.list(pagination)
+    users, total = await user_service.list(pagination, fields)
+    if fields:
+        return sparse_response(paginate(map(fields.dump, users), total, pagination))
     return paginate(users, total, pagination)
 
 
@@ -54,11 +79,32 @@ async def update_user(
     return user
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={status.HTTP_202_ACCEPTED: {"description": "Purge scheduled"}},
+)
 async def delete_user(
     user_id: int,
+    response: Response,
+    background: Annotated[
+        bool,
+        Query(description="Deactivate now and purge todos in chunks afterwards"),
+    ] = False,
     db: AsyncSession = Depends(get_db),
     user_service: UserService = Depends(get_user_service),
 ):
     async with db.begin():
-        await user_service.delete(user_id)
+        if background:
+            await user_service.deactivate(user_id)
+            job_queue.enqueue_after_commit(
+                db,
+                "users.purge",
+                user_id=user_id,
+                chunk_size=settings.user_purge_chunk_size,
+            )
+        else:
+            await user_service.delete(user_id)
+
+    if background:
+        response.status_code = status.HTTP_202_ACCEPTED
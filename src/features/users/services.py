@@ -1,23 +1,40 @@
+from __future__ import annotations
+
+from typing import Sequence
+
 from .models import User
 from .schemas.base import UserCreate, UserListParams, UserSortField, UserUpdate
-from database import get_db
+from database import get_db, pool_session, shard_router
 from fastapi import Depends, HTTPException
-from features.common.query import SortOrder
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from features.changes.schemas import ChangeEntity, ChangeOperation
+from features.changes.services import ChangeLog
+from features.common.fields import FieldSelection
+from features.common.loader import BatchLoader
+from features.common.query import SortOrder, StatementCache
+from features.jobs.queue import JobPriority, job_queue
+from features.todos.models import ArchivedTodo, Todo
+from sqlalchemy import bindparam, delete, func, select, update
+from logger import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql.elements import ColumnElement
 
 
 class UserService:
+    # See `TodoService.list_statements`.
+    list_statements = StatementCache()
 
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.loader: BatchLoader[int, User] = BatchLoader(self._load_by_ids, session=db)
+        self.changes = ChangeLog(db)
 
     async def create(self, user_create: UserCreate, *, flush: bool = True) -> User:
         """Create a new user."""
         user = User(**user_create.model_dump())
         self.db.add(user)
+        self.changes.record_created(ChangeEntity.user, user)
 
         try:
             if flush:
@@ -29,71 +46,151 @@ class UserService:
 
         return user
 
-    async def get(self, user_id: int) -> User:
-        user = await self.db.get(User, user_id)
+    async def get(self, user_id: int, fields: FieldSelection | None = None) -> User:
+        user = self.db.identity_map.get(identity_key(User, user_id))
+        if user is None and fields:
+            user = await self.db.get(User, user_id, options=fields.load_options(User))
+        elif user is None:
+            user = await self.loader.load(user_id)
 
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         return user
 
-    async def list(self, params: UserListParams) -> tuple[list[User], int]:
-        filters = self._filters(params)
+    async def get_many(self, user_ids: Sequence[int]) -> list[User | None]:
+        """Users in `user_ids` order, `None` for ids that do not exist.
 
-        count_stmt = select(func.count()).select_from(User)
-        if filters:
-            count_stmt = count_stmt.where(*filters)
-        total = int(await self.db.scalar(count_stmt) or 0)
+        Goes through the identity map and `loader` like `get`, so everything
+        not already loaded is fetched with one `IN` query.
+        """
+        users = [self.db.identity_map.get(identity_key(User, i)) for i in user_ids]
+        misses = [i for i, user in zip(user_ids, users) if user is None]
+        loaded = dict(zip(misses, await self.loader.load_many(misses)))
+        return [user or loaded[i] for i, user in zip(user_ids, users)]
 
-        stmt = select(User)
-        if filters:
-            stmt = stmt.where(*filters)
-        stmt = stmt.order_by(self._ordering_column(params))
-        stmt = stmt.offset(params.offset).limit(params.page_size)
+    async def _load_by_ids(self, user_ids: list[int]) -> dict[int, User]:
+        """Batch function behind `loader`: one `IN` query per tick."""
+        users = await self.db.scalars(select(User).where(User.id.in_(user_ids)))
+        return {user.id: user for user in users}
 
-        users = list(await self.db.scalars(stmt))
-        return users, total
+    async def list(
+        self, params: UserListParams, fields: FieldSelection | None = None
+    ) -> tuple[list[User], int]:
+        values = self._filter_values(params)
+        shape = frozenset(values)
 
-    async def update(
-        self, user_id: int, user_update: UserUpdate, *, flush: bool = True
-    ) -> User:
-        user = await self.get(user_id)
+        count_stmt = self.list_statements.get(
+            ("count", shape), lambda: self._count_statement(shape)
+        )
+        total = int(await self.db.scalar(count_stmt, values) or 0)
 
-        for field, value in user_update.model_dump(exclude_unset=True).items():
-            setattr(user, field, value)
+        page_stmt = self.list_statements.get(
+            (
+                "page",
+                shape,
+                params.sort_by,
+                params.sort_order,
+                fields.key if fields else None,
+            ),
+            lambda: self._page_statement(shape, params, fields),
+        )
+        users = list(
+            await self.db.scalars(
+                page_stmt,
+                {**values, "offset": params.offset, "limit": params.page_size},
+            )
+        )
+        return users, total
 
-        self.db.add(user)
+    async def update(self, user_id: int, user_update: UserUpdate) -> User:
+        """Apply a partial update with a single `UPDATE ... RETURNING`."""
+        changes = user_update.model_dump(exclude_unset=True)
+        if not changes:
+            return await self.get(user_id)
 
         try:
-            if flush:
-                await self.db.flush()
+            user = await self.db.scalar(
+                update(User).where(User.id == user_id).values(**changes).returning(User)
+            )
         except IntegrityError:
             raise HTTPException(
                 status_code=400, detail="Username or email already exists"
             )
 
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        await self.changes.record(ChangeEntity.user, [user.id], ChangeOperation.updated)
         return user
 
     async def delete(self, user_id: int) -> None:
-        """Delete a user."""
-        user = await self.get(user_id)
+        """Delete a user; the database cascades the delete to their todos."""
+        # The cascade happens inside the database, so log the todos it will
+        # remove up front.
+        await self.changes.record_matching(
+            ChangeEntity.todo, Todo.id, Todo.user_id == user_id, ChangeOperation.deleted
+        )
+        if shard_router.enabled:
+            # Shards hold no users, so nothing cascades there.
+            await self.db.execute(delete(Todo).where(Todo.user_id == user_id))
+            await self.db.execute(
+                delete(ArchivedTodo).where(ArchivedTodo.user_id == user_id)
+            )
+        deleted_id = await self.db.scalar(
+            delete(User).where(User.id == user_id).returning(User.id)
+        )
+
+        if deleted_id is None:
+            raise HTTPException(status_code=404, detail="User not found")
 
-        await self.db.delete(user)
+        await self.changes.record(
+            ChangeEntity.user, [deleted_id], ChangeOperation.deleted
+        )
 
-    def _filters(self, params: UserListParams) -> list[ColumnElement[bool]]:
-        clauses: list[ColumnElement[bool]] = []
+    async def deactivate(self, user_id: int) -> None:
+        """Mark a user inactive ahead of a background purge."""
+        await self.update(user_id, UserUpdate(is_active=False))
+
+    def _filter_values(self, params: UserListParams) -> dict:
+        """Bound parameter values for the filters set on `params`."""
+        values = {}
         if params.username:
-            clauses.append(
-                func.lower(User.username).like(self._normalize_like(params.username))
-            )
+            values["username"] = self._normalize_like(params.username)
         if params.email:
-            clauses.append(
-                func.lower(User.email).like(self._normalize_like(params.email))
-            )
+            values["email"] = self._normalize_like(params.email)
         if params.is_active is not None:
-            clauses.append(User.is_active == params.is_active)
+            values["is_active"] = params.is_active
+        return values
+
+    def _bound_filters(self, names: frozenset[str]) -> list[ColumnElement[bool]]:
+        clauses: list[ColumnElement[bool]] = []
+        if "username" in names:
+            clauses.append(func.lower(User.username).like(bindparam("username")))
+        if "email" in names:
+            clauses.append(func.lower(User.email).like(bindparam("email")))
+        if "is_active" in names:
+            clauses.append(User.is_active == bindparam("is_active"))
         return clauses
 
+    def _count_statement(self, names: frozenset[str]):
+        return select(func.count()).select_from(User).where(*self._bound_filters(names))
+
+    def _page_statement(
+        self,
+        names: frozenset[str],
+        params: UserListParams,
+        fields: FieldSelection | None,
+    ):
+        stmt = select(User).where(*self._bound_filters(names))
+        if fields:
+            stmt = stmt.options(*fields.load_options(User))
+        return (
+            stmt.order_by(self._ordering_column(params))
+            .offset(bindparam("offset"))
+            .limit(bindparam("limit"))
+        )
+
     def _ordering_column(self, params: UserListParams):
         if params.sort_by == UserSortField.username:
             column = User.username
@@ -110,6 +207,68 @@ class UserService:
         return f"%{value.lower()}%"
 
 
+@job_queue.job("users.purge", priority=JobPriority.low, durable=True)
+async def purge_user(
+    user_id: int,
+    *,
+    chunk_size: int = 1000,
+    session_factory: async_sessionmaker[AsyncSession] = pool_session("bulk"),
+) -> int:
+    """Delete a user's todos in chunks, one short transaction each, then the user.
+
+    Used for owners too large to cascade inside a single request: every
+    chunk holds locks only briefly and other writers interleave between
+    chunks. Returns the number of todos removed.
+    """
+    removed = 0
+    while True:
+        async with session_factory() as db, db.begin():
+            chunk = select(Todo.id).where(Todo.user_id == user_id).limit(chunk_size)
+            deleted = (
+                await db.scalars(
+                    delete(Todo).where(Todo.id.in_(chunk)).returning(Todo.id)
+                )
+            ).all()
+            await ChangeLog(db).record(
+                ChangeEntity.todo, deleted, ChangeOperation.deleted
+            )
+        removed += len(deleted)
+        if len(deleted) < chunk_size:
+            break
+
+    # Archived todos are outside the change log; just clear them in chunks too.
+    while True:
+        async with session_factory() as db, db.begin():
+            chunk = (
+                select(ArchivedTodo.id)
+                .where(ArchivedTodo.user_id == user_id)
+                .limit(chunk_size)
+            )
+            archived = (
+                await db.scalars(
+                    delete(ArchivedTodo)
+                    .where(ArchivedTodo.id.in_(chunk))
+                    .returning(ArchivedTodo.id)
+                )
+            ).all()
+        if len(archived) < chunk_size:
+            break
+
+    async with session_factory() as db, db.begin():
+        deleted_id = await db.scalar(
+            delete(User).where(User.id == user_id).returning(User.id)
+        )
+        if deleted_id is not None:
+            await ChangeLog(db).record(
+                ChangeEntity.user, [deleted_id], ChangeOperation.deleted
+            )
+
+    await logger.ainfo(
+        f"Purged user {user_id} and {removed} todos", user_id=user_id, todos=removed
+    )
+    return removed
+
+
 async def get_user_service(
     db: AsyncSession = Depends(get_db),
 ) -> UserService:
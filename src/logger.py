@@ -1,11 +1,42 @@
+import functools
+import inspect
+
 from structlog import configure, get_logger, make_filtering_bound_logger
 from structlog.contextvars import merge_contextvars
 from structlog.processors import JSONRenderer, TimeStamper
 from settings import settings
 
+# Async log calls handed to the executor and not yet written.
+_pending_writes = 0
+
+
+def _counted(method):
+    @functools.wraps(method)
+    async def counted(self, *args, **kw):
+        global _pending_writes
+        _pending_writes += 1
+        try:
+            return await method(self, *args, **kw)
+        finally:
+            _pending_writes -= 1
+
+    return counted
+
+
+_FilteringLogger = make_filtering_bound_logger(min_level=settings.log_level)
+# The same logger, counting its `a*` methods' writes for `log_queue_depth`.
+_CountingLogger = type(
+    "CountingBoundLogger",
+    (_FilteringLogger,),
+    {
+        name: _counted(method)
+        for name, method in inspect.getmembers(_FilteringLogger)
+        if inspect.iscoroutinefunction(method)
+    },
+)
 
 configure(
-    wrapper_class=make_filtering_bound_logger(min_level=settings.log_level),
+    wrapper_class=_CountingLogger,
     processors=[
         merge_contextvars,
         TimeStamper(fmt="iso"),
@@ -14,3 +45,12 @@ configure(
 )
 
 logger = get_logger("app_logger")
+
+
+def log_queue_depth() -> int:
+    """Number of log writes queued behind structlog's `a*` methods.
+
+    Counted by the logger itself: each async call is pending from the moment
+    it is made until the executor has written the record.
+    """
+    return _pending_writes
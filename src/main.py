@@ -1,20 +1,84 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from features.auth.bearer import get_current_user
 from logger import logger
 
+from features.changes.services import change_log_compactor
+from features.compression.codecs import available_codecs
+from features.compression.middleware import CompressionMiddleware
+from features.health.checker import health_checker
+from features.jobs.queue import job_queue
+from features.health.routes import router as health_router
+from features.loadshed.middleware import LoadSheddingMiddleware
+from features.loadshed.shedder import load_shedder
+from features.profiling.middleware import ProfilingMiddleware
+from features.profiling.profiler import SamplingProfiler
+from features.profiling.routes import router as profiling_router
+from features.profiling.store import profile_store
+from features.ratelimit.backends import InMemoryRateLimitStore
+from features.ratelimit.middleware import (
+    ConcurrencyLimitMiddleware,
+    RateLimitMiddleware,
+)
+from features.todos.archive import todo_archiver
+from features.todos.coalescing import todo_write_buffer
 from features.todos.routes import router as todos_router
 from features.users.routes import router as users_router
 from middleware import StructlogRequestMiddleware
-from database import get_db
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from database import dispose_engines
 from typing import Literal
+from metrics import registry
 from settings import settings
 
-app = FastAPI(dependencies=[Depends(get_current_user)])
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.jobs_enabled:
+        job_queue.start()
+    if settings.load_shed_enabled:
+        load_shedder.start()
+    health_checker.start()
+    change_log_compactor.start()
+    if settings.archive_enabled:
+        todo_archiver.start()
+    if settings.todo_write_coalescing_enabled:
+        todo_write_buffer.start()
+    yield
+    await todo_write_buffer.stop()
+    await todo_archiver.stop()
+    await change_log_compactor.stop()
+    await health_checker.stop()
+    await load_shedder.stop()
+    await job_queue.stop()
+    await dispose_engines()
+
+
+app = FastAPI(dependencies=[Depends(get_current_user)], lifespan=lifespan)
+
+if settings.concurrency_limit > 0:
+    app.add_middleware(
+        ConcurrencyLimitMiddleware,
+        limit=settings.concurrency_limit,
+        max_queue=settings.concurrency_max_queue,
+        queue_timeout=settings.concurrency_queue_timeout_seconds,
+        # Event streams stay open indefinitely; the hub caps them instead.
+        exempt_paths=[*settings.rate_limit_exempt_paths, "/todos/stream"],
+    )
+if settings.load_shed_enabled:
+    app.add_middleware(LoadSheddingMiddleware, shedder=load_shedder)
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=InMemoryRateLimitStore(),
+        rate=settings.rate_limit_per_second,
+        burst=settings.rate_limit_burst,
+        route_weights=settings.rate_limit_route_weights,
+        exempt_paths=settings.rate_limit_exempt_paths,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_allow_origins,
@@ -24,6 +88,26 @@ app.add_middleware(
     expose_headers=settings.cors_expose_headers,
     max_age=settings.cors_max_age,
 )
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        codecs=available_codecs(
+            gzip_level=settings.compression_gzip_level,
+            brotli_quality=settings.compression_brotli_quality,
+            zstd_level=settings.compression_zstd_level,
+        ),
+        minimum_size=settings.compression_minimum_size,
+        exempt_paths=settings.compression_exempt_paths,
+    )
+if settings.profiling_enabled:
+    # Inside StructlogRequestMiddleware, whose request_id names the profiles.
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=SamplingProfiler(interval=settings.profiling_interval_seconds),
+        store=profile_store,
+        sample_rate=settings.profiling_sample_rate,
+        format=settings.profiling_format,
+    )
 app.add_middleware(StructlogRequestMiddleware)
 
 
@@ -37,15 +121,12 @@ async def read_status():
     return {"status": "ok"}
 
 
-@app.get("/health", response_model=StatusResponse)
-async def health(db: AsyncSession = Depends(get_db)):
-    try:
-        await db.execute(select(1))
-        return {"status": "ok"}
-    except Exception as e:
-        await logger.aerror("Health check failed", error=str(e))
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database connection failed")
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
+app.include_router(health_router)
 app.include_router(todos_router)
 app.include_router(users_router)
+app.include_router(profiling_router)
@@ -0,0 +1,95 @@
+from typing import Callable, Iterable
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[tuple[tuple[str, ...], float]]:
+        return self._values.items()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = float(value)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Registry:
+    """Process-local metrics rendered in the Prometheus text format.
+
+    Collectors are called right before rendering, so values that are cheap
+    to read but expensive to push (pool stats, queue depths) are pulled only
+    when scraped.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for label_values, value in metric.samples():
+                labels = ",".join(
+                    f'{name}="{label}"'
+                    for name, label in zip(metric.labelnames, label_values)
+                )
+                lines.append(
+                    f"{metric.name}{{{labels}}} {value}"
+                    if labels
+                    else f"{metric.name} {value}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"Metric {metric.name} already registered")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+
+registry = Registry()
@@ -0,0 +1,231 @@
+"""Helpers for changing large tables without long write locks.
+
+Use them from Alembic revisions instead of `op.batch_alter_table` (which
+copies the whole table on SQLite) when a change touches many rows:
+
+    from migrations.helpers import backfill, create_index_concurrently
+
+    def upgrade() -> None:
+        op.add_column("todos", sa.Column("priority", sa.Integer(), nullable=True))
+        create_index_concurrently("ix_todos_priority", "todos", ["priority"])
+        backfill(
+            "todos",
+            {"priority": 0},
+            revision=revision,
+            where=lambda t: t.c.priority.is_(None),
+        )
+
+    def downgrade() -> None:
+        clear_checkpoints(revision)
+        ...
+
+Backfills commit chunk by chunk outside the migration's transaction, so
+they must be idempotent, and schema changes they depend on must already be
+committed. Put them in their own revision, after the expand step.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.engine import Connection
+
+from logger import logger
+from settings import settings
+
+# Kept out of `Base.metadata` (and out of autogenerate, see `alembic/env.py`):
+# it belongs to the tooling, not the application schema.
+checkpoint_metadata = sa.MetaData()
+checkpoints = sa.Table(
+    "migration_checkpoints",
+    checkpoint_metadata,
+    sa.Column("name", sa.String(), primary_key=True),
+    sa.Column("last_key", sa.Integer(), nullable=False),
+    sa.Column("rows_done", sa.Integer(), nullable=False, default=0),
+    sa.Column("completed", sa.Boolean(), nullable=False, default=False),
+    sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+)
+
+Where = sa.ColumnElement[bool] | Callable[[sa.Table], sa.ColumnElement[bool]]
+
+
+@dataclass
+class Checkpoint:
+    last_key: int = 0
+    rows_done: int = 0
+    completed: bool = False
+
+
+def load_checkpoint(bind: Connection, name: str) -> Checkpoint:
+    checkpoint_metadata.create_all(bind, checkfirst=True)
+    row = bind.execute(
+        sa.select(
+            checkpoints.c.last_key, checkpoints.c.rows_done, checkpoints.c.completed
+        ).where(checkpoints.c.name == name)
+    ).first()
+    return Checkpoint(*row) if row else Checkpoint()
+
+
+def save_checkpoint(bind: Connection, name: str, checkpoint: Checkpoint) -> None:
+    values = {
+        "last_key": checkpoint.last_key,
+        "rows_done": checkpoint.rows_done,
+        "completed": checkpoint.completed,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    updated = bind.execute(
+        sa.update(checkpoints).where(checkpoints.c.name == name).values(**values)
+    )
+    if not updated.rowcount:
+        bind.execute(sa.insert(checkpoints).values(name=name, **values))
+
+
+def clear_checkpoints(revision: str) -> None:
+    """Forget the checkpoints of `revision`'s backfills.
+
+    Call it from the revision's `downgrade()`, so upgrading again reruns
+    the backfills instead of finding them already completed.
+    """
+    bind = op.get_bind()
+    checkpoint_metadata.create_all(bind, checkfirst=True)
+    bind.execute(
+        sa.delete(checkpoints).where(checkpoints.c.name.startswith(f"{revision}:"))
+    )
+
+
+class Progress:
+    """Logs done/total, throughput and ETA at most every `interval` seconds."""
+
+    def __init__(self, name: str, total: int, done: int = 0, interval: float = 5.0):
+        self.name = name
+        self.total = total
+        self.done = done
+        self.interval = interval
+        self._started = time.perf_counter()
+        self._start_done = done
+        self._last_report = 0.0
+
+    def advance(self, rows: int, *, force: bool = False) -> None:
+        self.done += rows
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self._started
+        rate = (self.done - self._start_done) / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.done, 0)
+        logger.info(
+            f"{self.name}: {self.done}/{self.total} rows",
+            migration_step=self.name,
+            rows_done=self.done,
+            rows_total=self.total,
+            rows_per_second=round(rate, 1),
+            eta_seconds=round(remaining / rate, 1) if rate else None,
+        )
+
+
+def backfill(
+    table: str,
+    values: dict[str, Any],
+    *,
+    revision: str,
+    where: Where | None = None,
+    key: str = "id",
+    chunk_size: int | None = None,
+    pause_seconds: float | None = None,
+    name: str | None = None,
+) -> int:
+    """Apply `UPDATE table SET values` in key-ordered chunks, one commit each.
+
+    Each chunk covers at most `chunk_size` consecutive keys, so a write lock
+    is held only for one chunk, and the loop sleeps `pause_seconds` between
+    chunks to leave room for application writes. Progress is checkpointed
+    under `name`, prefixed with the calling `revision`'s id so that
+    `clear_checkpoints` can forget it on downgrade; rerunning an interrupted
+    migration resumes after the last committed chunk. Returns the number of
+    rows updated by this run.
+    """
+    chunk_size = chunk_size or settings.migration_backfill_chunk_size
+    if pause_seconds is None:
+        pause_seconds = settings.migration_backfill_pause_seconds
+    name = name or f"backfill:{table}:{','.join(sorted(values))}"
+    name = f"{revision}:{name}"
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        target = sa.Table(table, sa.MetaData(), autoload_with=bind)
+        key_column = target.c[key]
+        condition = where(target) if callable(where) else where
+        filters = [condition] if condition is not None else []
+
+        checkpoint = load_checkpoint(bind, name)
+        if checkpoint.completed:
+            logger.info(f"{name}: already completed", migration_step=name)
+            return 0
+
+        remaining = bind.scalar(
+            sa.select(sa.func.count())
+            .select_from(target)
+            .where(key_column > checkpoint.last_key, *filters)
+        )
+        progress = Progress(
+            name, checkpoint.rows_done + remaining, checkpoint.rows_done
+        )
+        updated = 0
+
+        while True:
+            # Upper key of the next chunk; None once fewer than chunk_size remain.
+            upper = bind.scalar(
+                sa.select(key_column)
+                .where(key_column > checkpoint.last_key)
+                .order_by(key_column)
+                .offset(chunk_size - 1)
+                .limit(1)
+            )
+            in_chunk = [key_column > checkpoint.last_key]
+            if upper is not None:
+                in_chunk.append(key_column <= upper)
+
+            # Autocommit: the chunk is durable before its checkpoint is, so
+            # a crash in between only repeats one (idempotent) chunk.
+            result = bind.execute(
+                sa.update(target).where(*in_chunk, *filters).values(**values)
+            )
+            if upper is not None:
+                checkpoint.last_key = upper
+            checkpoint.rows_done += result.rowcount
+            checkpoint.completed = upper is None
+            save_checkpoint(bind, name, checkpoint)
+
+            updated += result.rowcount
+            progress.advance(result.rowcount, force=checkpoint.completed)
+            if checkpoint.completed:
+                return updated
+            time.sleep(pause_seconds)
+
+
+def create_index_concurrently(
+    index_name: str, table: str, columns: Sequence[str], **kwargs: Any
+) -> None:
+    """Create an index without blocking writes where the database allows it.
+
+    On PostgreSQL this is `CREATE INDEX CONCURRENTLY`, which cannot run in a
+    transaction and therefore runs in an autocommit block. Other databases
+    fall back to a plain `CREATE INDEX`: SQLite builds it under a write lock
+    but, unlike `batch_alter_table`, without copying the table.
+    """
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                index_name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs,
+            )
+    else:
+        op.create_index(index_name, table, columns, if_not_exists=True, **kwargs)
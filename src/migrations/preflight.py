@@ -0,0 +1,170 @@
+"""Estimate rows touched and lock time of pending revisions before upgrading.
+
+Revisions describe their large-table work with a module-level list:
+
+    from migrations.preflight import TableChange
+
+    table_changes = [TableChange("todos", "backfill", chunk_size=1000)]
+
+Revisions without one are scanned for `op.batch_alter_table("<table>")`,
+which rewrites the whole table on SQLite, so older revisions are covered.
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import Script, ScriptDirectory
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from settings import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+# Writing a row (plus WAL/index maintenance) costs several times reading it.
+WRITE_COST_FACTOR = 4.0
+SAMPLE_ROWS = 10_000
+
+_BATCH_ALTER = re.compile(r"batch_alter_table\(\s*[\"'](\w+)[\"']")
+
+ChangeKind = Literal["rewrite", "backfill", "index", "metadata"]
+
+
+@dataclass(frozen=True)
+class TableChange:
+    """One revision's work on one table.
+
+    `rewrite` copies the table under a write lock, `backfill` updates it in
+    chunks through `migrations.helpers.backfill`, `index` builds an index
+    (concurrently on PostgreSQL) and `metadata` touches only the catalog.
+    """
+
+    table: str
+    kind: ChangeKind
+    chunk_size: int | None = None
+
+
+@dataclass(frozen=True)
+class StepEstimate:
+    revision: str
+    table: str
+    kind: ChangeKind
+    rows: int
+    lock_seconds: float
+    duration_seconds: float
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    return config
+
+
+def declared_changes(script: Script) -> list[TableChange]:
+    declared = getattr(script.module, "table_changes", None)
+    if declared is not None:
+        return list(declared)
+    source = Path(script.path).read_text()
+    tables = dict.fromkeys(_BATCH_ALTER.findall(source))
+    return [TableChange(table, "rewrite") for table in tables]
+
+
+def pending_revisions(connection: Connection, scripts: ScriptDirectory) -> list[Script]:
+    """Revisions `alembic upgrade heads` would run, oldest first."""
+    current = MigrationContext.configure(connection).get_current_heads()
+    return list(reversed(list(scripts.iterate_revisions("heads", current))))
+
+
+def count_rows(connection: Connection, table: str) -> int:
+    if not sa.inspect(connection).has_table(table):
+        return 0
+    if connection.dialect.name == "postgresql":
+        # Planner statistics: instant, unlike count(*) on a large table.
+        estimate = connection.scalar(
+            sa.text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+            {"table": table},
+        )
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return int(
+        connection.scalar(sa.select(sa.func.count()).select_from(sa.table(table)))
+    )
+
+
+def read_rate(connection: Connection, table: str) -> float:
+    """Rows per second for a sequential read of up to `SAMPLE_ROWS` rows."""
+    quoted = connection.dialect.identifier_preparer.quote(table)
+    start = time.perf_counter()
+    rows = len(
+        connection.execute(
+            sa.text(f"SELECT * FROM {quoted} LIMIT :n"), {"n": SAMPLE_ROWS}
+        ).all()
+    )
+    elapsed = time.perf_counter() - start
+    return rows / elapsed if rows and elapsed > 0 else float("inf")
+
+
+def estimate_change(
+    connection: Connection, revision: str, change: TableChange
+) -> StepEstimate:
+    rows = count_rows(connection, change.table)
+    rate = read_rate(connection, change.table) if rows else float("inf")
+    write_seconds = rows * WRITE_COST_FACTOR / rate
+
+    if change.kind == "rewrite":
+        lock, duration = write_seconds, write_seconds
+    elif change.kind == "index":
+        concurrent = connection.dialect.name == "postgresql"
+        lock, duration = (0.0 if concurrent else write_seconds), write_seconds
+    elif change.kind == "backfill":
+        chunk = change.chunk_size or settings.migration_backfill_chunk_size
+        chunks = -(-rows // chunk)
+        lock = min(chunk, rows) * WRITE_COST_FACTOR / rate
+        duration = write_seconds + chunks * settings.migration_backfill_pause_seconds
+    else:
+        lock, duration = 0.0, 0.0
+
+    return StepEstimate(revision, change.table, change.kind, rows, lock, duration)
+
+
+def estimate_pending(
+    connection: Connection, scripts: ScriptDirectory
+) -> list[StepEstimate]:
+    return [
+        estimate_change(connection, script.revision, change)
+        for script in pending_revisions(connection, scripts)
+        for change in declared_changes(script)
+    ]
+
+
+async def preflight(db_url: str | None = None) -> list[StepEstimate]:
+    """Estimate every pending revision's table work against `db_url`."""
+    scripts = ScriptDirectory.from_config(alembic_config())
+    engine = create_async_engine(db_url or settings.db_url, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            return await connection.run_sync(estimate_pending, scripts)
+    finally:
+        await engine.dispose()
+
+
+def format_report(estimates: list[StepEstimate]) -> str:
+    if not estimates:
+        return "No large-table changes pending."
+    lines = [
+        f"{'revision':<14}{'table':<16}{'kind':<10}{'rows':>12}"
+        f"{'lock (s)':>12}{'duration (s)':>14}"
+    ]
+    for step in estimates:
+        lines.append(
+            f"{step.revision:<14}{step.table:<16}{step.kind:<10}{step.rows:>12}"
+            f"{step.lock_seconds:>12.2f}{step.duration_seconds:>14.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,56 @@
+"""Preflight-gated `alembic upgrade` for production deploys.
+
+Run from `src/`:
+
+    python -m migrations.runner --preflight-only
+    python -m migrations.runner [--target head] [--max-lock-seconds 5] [--force]
+
+The upgrade is refused when any pending step is estimated to hold a write
+lock longer than `--max-lock-seconds` (default `migration_max_lock_seconds`).
+Interrupted backfills resume from their checkpoints when run again.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from alembic import command
+
+from settings import settings
+
+from .preflight import alembic_config, format_report, preflight
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="heads")
+    parser.add_argument(
+        "--max-lock-seconds", type=float, default=settings.migration_max_lock_seconds
+    )
+    parser.add_argument("--preflight-only", action="store_true")
+    parser.add_argument(
+        "--force", action="store_true", help="Upgrade despite long estimated locks"
+    )
+    args = parser.parse_args(argv)
+
+    estimates = asyncio.run(preflight())
+    print(format_report(estimates))
+    if args.preflight_only:
+        return 0
+
+    blocking = [s for s in estimates if s.lock_seconds > args.max_lock_seconds]
+    if blocking and not args.force:
+        print(
+            f"Refusing to upgrade: {len(blocking)} step(s) would hold a write "
+            f"lock longer than {args.max_lock_seconds}s. Rewrite them with "
+            "migrations.helpers, or pass --force during a maintenance window.",
+            file=sys.stderr,
+        )
+        return 1
+
+    command.upgrade(alembic_config(), args.target)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,53 @@
-from pydantic import field_validator
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class PoolSettings(BaseModel):
+    size: int
+    max_overflow: int = 0
+    timeout_seconds: float = 30
+
+
 class Settings(BaseSettings):
     # Database settings
     db_url: str = ""
     db_pool_size: int = 10
     db_echo: bool = False
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30
+    db_session_release: Literal["early", "request"] = "early"
+    # Further connection pools by name, each sized apart from the default
+    # "interactive" pool above; see `database.use_pool`.
+    db_pools: dict[str, PoolSettings] = {
+        "bulk": PoolSettings(size=2, max_overflow=2, timeout_seconds=60),
+        "health": PoolSettings(size=1, timeout_seconds=5),
+    }
+
+    # Sharding settings
+    # Extra databases holding todos, by shard name; empty disables sharding.
+    db_shards: dict[str, str] = {}
+    shard_ring_vnodes: int = 64
+    shard_map_cache_size: int = 10_000
+    shard_map_cache_seconds: float = 5
+    shard_rebalance_chunk_size: int = 500
+
+    # Request deadline settings
+    # Budget per request in seconds, 0 for none; per route by "METHOD /path"
+    # or "/path" (the route's path template) in request_route_timeouts.
+    request_timeout_seconds: float = 30
+    request_route_timeouts: dict[str, float] = {
+        "GET /todos/with-users": 10,
+        "GET /todos/": 10,
+        "GET /users/": 10,
+    }
+    request_cancel_on_disconnect: bool = True
+
+    # Migration settings
+    migration_backfill_chunk_size: int = 1000
+    migration_backfill_pause_seconds: float = 0.05
+    migration_max_lock_seconds: float = 5
 
     # Logging settings
     log_level: str = "INFO"
@@ -19,6 +60,110 @@ class Settings(BaseSettings):
     cors_allow_credentials: bool = False
     cors_max_age: int = 600
 
+    # Auth settings
+    auth_jwt_keys: dict[str, str] = {}
+    auth_jwt_algorithms: list[str] = ["HS256"]
+    auth_jwt_issuer: str | None = None
+    auth_jwt_audience: str | None = None
+    auth_jwt_leeway_seconds: float = 30
+    auth_static_tokens: list[str] = []
+    auth_cache_size: int = 10_000
+    auth_cache_ttl_seconds: float = 300
+    auth_negative_cache_ttl_seconds: float = 30
+    auth_public_paths: list[str] = ["/livez", "/readyz", "/health"]
+    # Usernames allowed on admin endpoints such as /admin/profiles.
+    auth_admin_usernames: list[str] = []
+
+    # Rate limiting settings
+    rate_limit_enabled: bool = False
+    rate_limit_per_second: float = 20
+    rate_limit_burst: float = 40
+    rate_limit_route_weights: dict[str, float] = {
+        "GET /todos/with-users": 5,
+        "GET /todos/": 2,
+        "GET /users/": 2,
+    }
+    rate_limit_exempt_paths: list[str] = ["/livez", "/readyz", "/health", "/metrics"]
+    concurrency_limit: int = 100
+    concurrency_max_queue: int = 50
+    concurrency_queue_timeout_seconds: float = 0.1
+
+    # Load shedding settings
+    load_shed_enabled: bool = True
+    load_shed_sample_interval_seconds: float = 0.5
+    load_shed_loop_lag_threshold_seconds: float = 0.1
+    load_shed_pool_wait_threshold_seconds: float = 0.05
+    load_shed_pool_utilization_threshold: float = 0.9
+    load_shed_recovery_step: float = 0.1
+    load_shed_low_priority_paths: list[str] = ["/todos/with-users", "/todos/export*"]
+    load_shed_deep_offset: int = 1000
+
+    # Compression settings
+    compression_enabled: bool = True
+    compression_minimum_size: int = 500
+    compression_gzip_level: int = Field(default=6, ge=1, le=9)
+    compression_brotli_quality: int = Field(default=4, ge=0, le=11)
+    compression_zstd_level: int = Field(default=3, ge=1, le=22)
+    compression_exempt_paths: list[str] = []
+
+    # Health check settings
+    health_check_interval_seconds: float = 5
+    health_check_timeout_seconds: float = 2
+
+    # Profiling settings
+    # Off installs no middleware at all. When on, a sample_rate share of
+    # requests is profiled, plus any admin request with an x-profile header.
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = Field(default=0.0, ge=0, le=1)
+    profiling_interval_seconds: float = 0.001
+    profiling_format: Literal["speedscope", "collapsed"] = "speedscope"
+    profiling_directory: str = "profiles"
+    profiling_max_profiles: int = 100
+
+    # Batch lookup settings
+    batch_max_ids: int = 100
+
+    # Todo settings
+    todo_bulk_max_rows: int = 1000
+
+    # Write coalescing settings
+    todo_write_coalescing_enabled: bool = False
+    todo_write_coalescing_window_seconds: float = 0.05
+    todo_write_coalescing_max_pending: int = 1000
+
+    # Archive settings
+    archive_enabled: bool = False
+    archive_after_seconds: float = 90 * 24 * 3600
+    archive_interval_seconds: float = 3600
+    archive_chunk_size: int = 500
+
+    # Job queue settings
+    jobs_enabled: bool = True
+    jobs_workers: int = 4
+    jobs_queue_size: int = 1000
+    jobs_max_attempts: int = 5
+    jobs_backoff_seconds: float = 1
+    jobs_max_backoff_seconds: float = 300
+    jobs_poll_interval_seconds: float = 1
+    # Longer than the slowest durable job, or it may run twice at once.
+    jobs_lease_seconds: float = 600
+    jobs_claim_batch_size: int = 20
+    jobs_shutdown_timeout_seconds: float = 10
+
+    # User settings
+    user_purge_chunk_size: int = 1000
+
+    # Event stream settings
+    sse_max_subscribers: int = 500
+    sse_buffer_size: int = 100
+    sse_heartbeat_seconds: float = 15
+
+    # Change log settings
+    change_log_max_page: int = 1000
+    change_log_retention_seconds: float = 7 * 24 * 3600
+    change_log_compaction_interval_seconds: float = 3600
+    change_log_compaction_chunk_size: int = 1000
+
     # Pydantic Settings Config
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -30,6 +175,12 @@ class Settings(BaseSettings):
         "cors_allow_methods",
         "cors_allow_headers",
         "cors_expose_headers",
+        "auth_jwt_algorithms",
+        "auth_static_tokens",
+        "auth_public_paths",
+        "rate_limit_exempt_paths",
+        "load_shed_low_priority_paths",
+        "compression_exempt_paths",
         mode="before",
     )
     @classmethod
@@ -38,6 +189,18 @@ class Settings(BaseSettings):
             return [item.strip() for item in value.split(",") if item.strip()]
         return value
 
+    @model_validator(mode="after")
+    def _check_rate_limit_weights(self) -> "Settings":
+        # A bucket never holds more than the burst, so a heavier request
+        # could never be admitted.
+        heaviest = max([1.0, *self.rate_limit_route_weights.values()])
+        if heaviest > self.rate_limit_burst:
+            raise ValueError(
+                f"rate_limit_burst ({self.rate_limit_burst}) must be at least "
+                f"the heaviest route weight ({heaviest})"
+            )
+        return self
+
 
 # Instantiate settings
 settings = Settings()
@@ -0,0 +1,214 @@
+"""Move owners' todos between shards while the app keeps serving them.
+
+Run from `src/`:
+
+    python -m sharding.rebalance --adopt
+    python -m sharding.rebalance --plan
+    python -m sharding.rebalance --apply [--chunk-size 500] [--settle-seconds 10]
+    python -m sharding.rebalance --user 42 --to shard2
+
+`--adopt` records the owners of todos created before sharding was enabled
+as living on the primary; run it once, right after adding the first shard.
+`--plan` lists owners whose recorded shard is not where the ring places
+them (after shards were added, say) and `--apply` moves all of them.
+
+A move copies the owner's rows in chunks, switches `shard_map` over, waits
+`--settle-seconds` for workers' cached placements to expire, then moves
+whatever was written to the old shard meanwhile. Updates and deletes by id
+reach every shard, so they apply to both copies while the move runs.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import delete, exists, insert, literal, select, union
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import local_session, shard_map, shard_router
+from features.todos.models import ArchivedTodo, Todo
+from logger import logger
+from settings import settings
+
+from .router import PRIMARY_SHARD, ShardRouter, copy_rows, move_rows
+
+SHARDED_MODELS = (Todo, ArchivedTodo)
+
+
+async def adopt_existing(
+    session_factory: async_sessionmaker[AsyncSession] = local_session,
+) -> int:
+    """Pin every owner of pre-sharding rows to the primary. Returns the count."""
+    owners = union(
+        *(
+            select(model.user_id).where(
+                model.user_id.is_not(None),
+                ~exists().where(shard_map.c.user_id == model.user_id),
+            )
+            for model in SHARDED_MODELS
+        )
+    ).subquery()
+    async with session_factory() as db, db.begin():
+        result = await db.execute(
+            insert(shard_map).from_select(
+                ["user_id", "shard"],
+                select(owners.c.user_id, literal(PRIMARY_SHARD)),
+            ),
+            bind_arguments=ShardRouter.bind(PRIMARY_SHARD),
+        )
+    return result.rowcount
+
+
+async def plan(
+    router: ShardRouter = shard_router,
+    session_factory: async_sessionmaker[AsyncSession] = local_session,
+) -> list[tuple[int, str, str]]:
+    """`(user_id, current shard, ring shard)` for every misplaced owner."""
+    async with session_factory() as db:
+        rows = await db.execute(
+            select(shard_map.c.user_id, shard_map.c.shard).order_by(
+                shard_map.c.user_id
+            ),
+            bind_arguments=ShardRouter.bind(PRIMARY_SHARD),
+        )
+        return [
+            (user_id, shard, router.ring.shard_for(user_id))
+            for user_id, shard in rows
+            if shard != router.ring.shard_for(user_id)
+        ]
+
+
+async def move_user(
+    user_id: int,
+    target: str,
+    *,
+    chunk_size: int = 500,
+    settle_seconds: float = 10.0,
+    router: ShardRouter = shard_router,
+    session_factory: async_sessionmaker[AsyncSession] = local_session,
+) -> int:
+    """Move `user_id`'s rows to `target` online. Returns rows moved."""
+    if target not in router.engines:
+        raise ValueError(f"Unknown shard {target!r}")
+    async with session_factory() as db:
+        source = await router.locate(db, user_id)
+    if source == target:
+        return 0
+
+    # Copy while the source stays authoritative.
+    for model in SHARDED_MODELS:
+        last_id = 0
+        while True:
+            async with session_factory() as db, db.begin():
+                chunk = (
+                    select(model.id)
+                    .where(model.user_id == user_id, model.id > last_id)
+                    .order_by(model.id)
+                    .limit(chunk_size)
+                )
+                ids = await copy_rows(
+                    db, model, model.id.in_(chunk), source=source, target=target
+                )
+            if len(ids) < chunk_size:
+                break
+            last_id = max(ids)
+
+    # Cut over; other workers follow as their cached placements expire.
+    async with session_factory() as db, db.begin():
+        await router.assign(db, user_id, target)
+    await logger.ainfo(
+        f"Moved user {user_id} to shard {target}; settling",
+        user_id=user_id,
+        source=source,
+        target=target,
+    )
+    await asyncio.sleep(settle_seconds)
+
+    # Move what reached the source in the meantime and drop it there.
+    moved = 0
+    for model in SHARDED_MODELS:
+        while True:
+            async with session_factory() as db, db.begin():
+                chunk = (
+                    select(model.id).where(model.user_id == user_id).limit(chunk_size)
+                )
+                ids = await move_rows(
+                    db, model, model.id.in_(chunk), source=source, target=target
+                )
+                if model is ArchivedTodo and ids:
+                    # Archived on the source after its live copy was taken.
+                    await db.execute(
+                        delete(Todo).where(Todo.id.in_(ids)),
+                        bind_arguments=ShardRouter.bind(target),
+                    )
+            moved += len(ids)
+            if len(ids) < chunk_size:
+                break
+
+    await logger.ainfo(
+        f"Rebalanced user {user_id} from {source} to {target}",
+        user_id=user_id,
+        rows=moved,
+    )
+    return moved
+
+
+async def _run(args: argparse.Namespace) -> int:
+    try:
+        if args.adopt:
+            print(f"Pinned {await adopt_existing()} owners to {PRIMARY_SHARD}")
+            return 0
+
+        if args.user is not None:
+            moves = [(args.user, args.to)]
+        else:
+            misplaced = await plan()
+            for user_id, current, placed in misplaced:
+                print(f"user {user_id}: {current} -> {placed}")
+            print(f"{len(misplaced)} owner(s) to move")
+            if args.plan:
+                return 0
+            moves = [(user_id, placed) for user_id, _, placed in misplaced]
+
+        for user_id, target in moves:
+            await move_user(
+                user_id,
+                target,
+                chunk_size=args.chunk_size,
+                settle_seconds=args.settle_seconds,
+            )
+        return 0
+    finally:
+        for engine in shard_router.engines.values():
+            await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--adopt", action="store_true")
+    action.add_argument("--plan", action="store_true")
+    action.add_argument("--apply", action="store_true")
+    action.add_argument("--user", type=int, help="Move one owner; needs --to")
+    parser.add_argument("--to", help="Target shard for --user")
+    parser.add_argument(
+        "--chunk-size", type=int, default=settings.shard_rebalance_chunk_size
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=2 * settings.shard_map_cache_seconds,
+        help="Wait after cutover, at least shard_map_cache_seconds",
+    )
+    args = parser.parse_args(argv)
+
+    if args.user is not None and not args.to:
+        parser.error("--user needs --to")
+    if not shard_router.enabled:
+        print("Sharding is disabled; configure db_shards first.", file=sys.stderr)
+        return 1
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
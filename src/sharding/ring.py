@@ -0,0 +1,34 @@
+"""Consistent hashing of user ids onto shard names."""
+
+import bisect
+import hashlib
+from typing import Iterable
+
+
+def _point(value: str) -> int:
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    """Maps keys to shards so that adding a shard moves only ~1/N of them.
+
+    Every shard owns `vnodes` points on the ring; a key belongs to the first
+    point at or after its own hash. The layout depends only on the shard
+    names, so every worker computes the same placement.
+    """
+
+    def __init__(self, shards: Iterable[str], vnodes: int = 64):
+        points = sorted(
+            (_point(f"{shard}#{replica}"), shard)
+            for shard in shards
+            for replica in range(vnodes)
+        )
+        if not points:
+            raise ValueError("A hash ring needs at least one shard")
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: int | str) -> str:
+        index = bisect.bisect_left(self._points, _point(str(key)))
+        return self._shards[index % len(self._shards)]
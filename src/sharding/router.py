@@ -0,0 +1,296 @@
+"""User-keyed sharding across several databases.
+
+Users, the change log and every other table stay on the primary database.
+Rows of the sharded tables (todos and their archive) live on the shard of
+their owner: new owners are placed by consistent hashing, and the placement
+is recorded in the `shard_map` table so that rebalancing can move an owner
+without changing the ring. Owners without an entry, and unowned rows, are on
+the primary.
+
+`ShardRouter.session_options()` configures a SQLAlchemy `ShardedSession`:
+
+- flushes of a sharded row go to its owner's shard, which must have been
+  resolved with `ShardRouter.place` first;
+- statements on sharded tables without a `shard_id` bind argument, and
+  lookups by primary key, run on every shard and merge the results;
+- everything else runs on the primary.
+
+Ids of sharded rows are allocated on the primary (`ShardRouter.next_id`),
+so they stay unique when rows move between shards.
+"""
+
+from collections import OrderedDict
+import time
+from typing import Any, Collection
+
+from sqlalchemy import (
+    ColumnElement,
+    Insert,
+    Table,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Mapper
+
+from .ring import HashRing
+
+PRIMARY_SHARD = "primary"
+
+
+class ShardRouter:
+    def __init__(
+        self,
+        engines: dict[str, AsyncEngine],
+        *,
+        shard_map: Table,
+        id_allocations: Table,
+        sharded_tables: Collection[str],
+        vnodes: int = 64,
+        cache_size: int = 10_000,
+        cache_seconds: float = 5.0,
+    ):
+        if PRIMARY_SHARD not in engines:
+            raise ValueError(f"The {PRIMARY_SHARD!r} shard is required")
+        self.engines = engines
+        self.shard_ids = list(engines)
+        self.ring = HashRing(self.shard_ids, vnodes)
+        self.shard_map = shard_map
+        self.id_allocations = id_allocations
+        self.sharded_tables = frozenset(sharded_tables)
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+        # user id -> (shard, expiry); entries expire so that every worker
+        # picks up a rebalance within `cache_seconds`.
+        self._placements: OrderedDict[int, tuple[str, float]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.engines) > 1
+
+    @staticmethod
+    def bind(shard: str) -> dict[str, Any]:
+        """Bind arguments pinning one statement to `shard`."""
+        return {"shard_id": shard}
+
+    async def locate(self, db: AsyncSession, user_id: int | None) -> str:
+        """The shard holding `user_id`'s rows."""
+        if user_id is None:
+            return PRIMARY_SHARD
+        shard = self._cached(user_id)
+        if shard is None:
+            shard = await self._lookup(db, user_id) or PRIMARY_SHARD
+            self._remember(user_id, shard)
+        return shard
+
+    async def place(self, db: AsyncSession, user_id: int | None) -> str:
+        """Like `locate`, placing an owner seen for the first time on the ring.
+
+        Call it before adding a row for `user_id`; the flush reads the
+        placement back through `placed`.
+        """
+        if user_id is None:
+            return PRIMARY_SHARD
+        shard = self._cached(user_id) or await self._lookup(db, user_id)
+        if shard is None:
+            # A concurrent first placement wins; read back whichever landed.
+            await db.execute(
+                self._insert_ignoring_conflicts(self.shard_map).values(
+                    user_id=user_id, shard=self.ring.shard_for(user_id)
+                ),
+                bind_arguments=self.bind(PRIMARY_SHARD),
+            )
+            shard = await self._lookup(db, user_id)
+        self._remember(user_id, shard)
+        return shard
+
+    def placed(self, user_id: int | None) -> str:
+        """The shard `place` resolved for `user_id`, for flushes."""
+        if user_id is None:
+            return PRIMARY_SHARD
+        try:
+            return self._placements[user_id][0]
+        except KeyError:
+            raise LookupError(
+                f"Owner {user_id} was not placed before flushing its rows"
+            ) from None
+
+    async def assign(self, db: AsyncSession, user_id: int, shard: str) -> None:
+        """Record `shard` as the home of `user_id` (see `sharding.rebalance`)."""
+        bind = self.bind(PRIMARY_SHARD)
+        result = await db.execute(
+            update(self.shard_map)
+            .where(self.shard_map.c.user_id == user_id)
+            .values(shard=shard, assigned_at=func.now()),
+            bind_arguments=bind,
+        )
+        if not result.rowcount:
+            await db.execute(
+                insert(self.shard_map).values(user_id=user_id, shard=shard),
+                bind_arguments=bind,
+            )
+        self._remember(user_id, shard)
+
+    async def next_id(self, db: AsyncSession, name: str) -> int:
+        """A globally unique id for a new row of the sharded table `name`.
+
+        Taken from the primary's `id_allocations` row inside the caller's
+        transaction: a separate one could not get SQLite's write lock while
+        the caller holds it, and a rolled back insert returns its id.
+        """
+        allocations = self.id_allocations
+        bind = self.bind(PRIMARY_SHARD)
+        take = (
+            update(allocations)
+            .where(allocations.c.name == name)
+            .values(next_id=allocations.c.next_id + 1)
+            .returning(allocations.c.next_id)
+        )
+        following = await db.scalar(take, bind_arguments=bind)
+        if following is None:
+            await db.execute(
+                self._insert_ignoring_conflicts(allocations).values(
+                    name=name, next_id=await self._first_id(db, name)
+                ),
+                bind_arguments=bind,
+            )
+            following = await db.scalar(take, bind_arguments=bind)
+        return following - 1
+
+    def session_options(
+        self, engines: dict[str, AsyncEngine] | None = None
+    ) -> dict[str, Any]:
+        """`async_sessionmaker` keyword arguments for a sharded session.
+
+        `engines` connects the shards through other engines than the
+        router's own, such as those of another connection pool.
+        """
+        engines = self.engines if engines is None else engines
+        return {
+            "sync_session_class": ShardedSession,
+            "shards": {shard: engine.sync_engine for shard, engine in engines.items()},
+            "shard_chooser": self._choose_for_flush,
+            "identity_chooser": self._choose_for_identity,
+            "execute_chooser": self._choose_for_statement,
+        }
+
+    def _cached(self, user_id: int) -> str | None:
+        entry = self._placements.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        self._placements.move_to_end(user_id)
+        return entry[0]
+
+    def _remember(self, user_id: int, shard: str) -> None:
+        self._placements[user_id] = (shard, time.monotonic() + self.cache_seconds)
+        self._placements.move_to_end(user_id)
+        while len(self._placements) > self.cache_size:
+            self._placements.popitem(last=False)
+
+    async def _lookup(self, db: AsyncSession, user_id: int) -> str | None:
+        return await db.scalar(
+            select(self.shard_map.c.shard).where(self.shard_map.c.user_id == user_id),
+            bind_arguments=self.bind(PRIMARY_SHARD),
+        )
+
+    async def _first_id(self, db: AsyncSession, name: str) -> int:
+        """Where allocation starts: after every id handed out unsharded.
+
+        Rows created before sharding was enabled all live on the primary,
+        in `name` or, once archived, in `<name>_archive`.
+        """
+        tables = self.shard_map.metadata.tables
+        last_ids = [
+            await db.scalar(
+                select(func.max(table.c.id)), bind_arguments=self.bind(PRIMARY_SHARD)
+            )
+            for table in (tables[name], tables.get(f"{name}_archive"))
+            if table is not None
+        ]
+        return max((last_id or 0 for last_id in last_ids), default=0) + 1
+
+    def _insert_ignoring_conflicts(self, table: Table) -> Insert:
+        match self.engines[PRIMARY_SHARD].dialect.name:
+            case "sqlite":
+                return sqlite_insert(table).on_conflict_do_nothing()
+            case "postgresql":
+                return postgresql_insert(table).on_conflict_do_nothing()
+            case _:
+                return insert(table)
+
+    def _is_sharded(self, mapper: Mapper | None) -> bool:
+        return mapper is not None and mapper.local_table.name in self.sharded_tables
+
+    def _choose_for_flush(self, mapper, instance, clause=None) -> str:
+        if self._is_sharded(mapper) and instance is not None:
+            return self.placed(instance.user_id)
+        return PRIMARY_SHARD
+
+    def _choose_for_identity(self, mapper, primary_key, **kwargs) -> list[str]:
+        return self.shard_ids if self._is_sharded(mapper) else [PRIMARY_SHARD]
+
+    def _choose_for_statement(self, orm_context) -> list[str]:
+        if self._is_sharded(orm_context.bind_mapper):
+            return self.shard_ids
+        return [PRIMARY_SHARD]
+
+
+async def copy_rows(
+    db: AsyncSession,
+    model: type,
+    where: ColumnElement[bool],
+    *,
+    source: str,
+    target: str,
+) -> list[int]:
+    """Copy the rows of `model` matching `where` from `source` to `target`.
+
+    Rows already on `target` with the same ids are replaced, so repeating a
+    copy is harmless. Returns the ids copied.
+    """
+    rows = (
+        await db.execute(
+            select(*model.__table__.columns).where(where),
+            bind_arguments=ShardRouter.bind(source),
+        )
+    ).all()
+    await _replace_rows(db, model, rows, target)
+    return [row.id for row in rows]
+
+
+async def move_rows(
+    db: AsyncSession,
+    model: type,
+    where: ColumnElement[bool],
+    *,
+    source: str,
+    target: str,
+) -> list[int]:
+    """Like `copy_rows`, deleting the rows from `source` in the same step."""
+    rows = (
+        await db.execute(
+            delete(model).where(where).returning(*model.__table__.columns),
+            bind_arguments=ShardRouter.bind(source),
+        )
+    ).all()
+    await _replace_rows(db, model, rows, target)
+    return [row.id for row in rows]
+
+
+async def _replace_rows(db: AsyncSession, model: type, rows, target: str) -> None:
+    if not rows:
+        return
+    bind = ShardRouter.bind(target)
+    ids = [row.id for row in rows]
+    await db.execute(delete(model).where(model.id.in_(ids)), bind_arguments=bind)
+    await db.execute(
+        insert(model.__table__),
+        [dict(row._mapping) for row in rows],
+        bind_arguments=bind,
+    )
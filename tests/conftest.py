@@ -4,6 +4,7 @@ from pathlib import Path
 
 # Set test database URL before importing any modules
 os.environ["DB_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["AUTH_STATIC_TOKENS"] = '["Nina"]'
 
 # Add src directory to Python path
 src_path = Path(__file__).parent.parent / "src"
@@ -16,7 +17,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from sqlalchemy.pool import StaticPool
 
 from main import app
-from database import Base, get_db
+from database import Base, enable_sqlite_foreign_keys, engine, get_db, track_session
 
 
 # Use in-memory SQLite database for testing
@@ -32,10 +33,12 @@ def anyio_backend():
 @pytest_asyncio.fixture
 async def db_engine():
     """Create a test database engine."""
-    engine = create_async_engine(
-        TEST_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+    engine = enable_sqlite_foreign_keys(
+        create_async_engine(
+            TEST_DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
     )
 
     async with engine.begin() as conn:
@@ -49,6 +52,17 @@ async def db_engine():
     await engine.dispose()
 
 
+@pytest_asyncio.fixture
+async def app_engine():
+    """The application's own engine, disposed after the test.
+
+    Its single in-memory connection is bound to the test's event loop, so it
+    must not outlive it.
+    """
+    yield engine
+    await engine.dispose()
+
+
 @pytest_asyncio.fixture
 async def db_session(db_engine):
     """Create a test database session."""
@@ -65,6 +79,7 @@ async def client(db_session):
     """Create a test HTTP client with database dependency override."""
 
     async def override_get_db():
+        track_session(db_session)
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
@@ -77,3 +92,18 @@ async def client(db_session):
         yield ac
 
     app.dependency_overrides.clear()
+
+
+async def create_todo(
+    client: AsyncClient,
+    title: str,
+    user_id: int | None = None,
+    *,
+    completed: bool = False,
+) -> int:
+    """Create a todo through the API and return its id."""
+    response = await client.post(
+        "/todos/", json={"title": title, "completed": completed, "user_id": user_id}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
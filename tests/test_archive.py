@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from conftest import create_todo
+from features.todos.archive import archive_completed_todos
+from features.todos.models import Todo
+
+
+async def archive(db_engine, db_session, older_than_seconds: float = 0) -> int:
+    moved = await archive_completed_todos(
+        older_than_seconds=older_than_seconds,
+        chunk_size=2,
+        session_factory=async_sessionmaker(db_engine, class_=AsyncSession),
+    )
+    # The client's session would otherwise keep serving moved rows from
+    # its identity map.
+    db_session.expunge_all()
+    return moved
+
+
+class TestTodoArchive:
+    """Test suite for the completed-todo archive."""
+
+    @pytest.mark.asyncio
+    async def test_archiver_moves_old_completed_todos(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """Only completed todos past the age move, in chunks; they stay readable."""
+        open_id = await create_todo(client, "Open")
+        old_ids = [
+            await create_todo(client, f"Done {n}", completed=True) for n in range(3)
+        ]
+        recent_id = await create_todo(client, "Done recently", completed=True)
+        newest_id = await create_todo(client, "Newest")
+        async with db_session.begin():
+            await db_session.execute(
+                update(Todo)
+                .where(Todo.id.in_(old_ids))
+                .values(completed_at=datetime.now(timezone.utc) - timedelta(days=2))
+            )
+
+        moved = await archive(db_engine, db_session, older_than_seconds=24 * 3600)
+
+        live = await client.get("/todos/")
+        everything = await client.get("/todos/?include_archived=true")
+        completed = await client.get("/todos/?completed=true&include_archived=true")
+        hidden = await client.get(f"/todos/{old_ids[0]}")
+        archived = await client.get(f"/todos/{old_ids[0]}?include_archived=true")
+        patched = await client.patch(f"/todos/{old_ids[0]}", json={"title": "New"})
+
+        assert moved == 3
+        assert [t["id"] for t in live.json()["items"]] == [
+            open_id,
+            recent_id,
+            newest_id,
+        ]
+        assert everything.json()["total"] == 6
+        assert [t["id"] for t in everything.json()["items"]] == [
+            open_id,
+            *old_ids,
+            recent_id,
+            newest_id,
+        ]
+        assert [t["id"] for t in completed.json()["items"]] == [*old_ids, recent_id]
+        assert hidden.status_code == 404
+        assert archived.json()["title"] == "Done 0"
+        assert patched.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_archived_todos_sync_as_deleted(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """Delta sync drops archived todos from the client's list."""
+        open_id = await create_todo(client, "Open")
+        done_id = await create_todo(client, "Done", completed=True)
+        cursor = (await client.get("/todos/changes")).json()["cursor"]
+
+        await archive(db_engine, db_session)
+        response = await client.get(f"/todos/changes?since={cursor}")
+
+        assert response.json()["deleted"] == [done_id]
+        assert open_id not in response.json()["changed"]
+
+    @pytest.mark.asyncio
+    async def test_reopening_clears_completion(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """A todo reopened after completion is not archived."""
+        reopened = await create_todo(client, "Reopened", completed=True)
+        completed = await create_todo(client, "Completed later")
+        await create_todo(client, "Newest")
+        await client.patch(f"/todos/{reopened}", json={"completed": False})
+        await client.patch(f"/todos/{completed}", json={"completed": True})
+
+        moved = await archive(db_engine, db_session)
+        listed = await client.get("/todos/?completed=false&include_archived=true")
+
+        assert moved == 1
+        assert (await client.get(f"/todos/{completed}")).status_code == 404
+        assert [t["title"] for t in listed.json()["items"]] == ["Reopened", "Newest"]
+
+    @pytest.mark.asyncio
+    async def test_archived_ids_are_never_reused(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """New todos get ids above every archived one."""
+        archived_ids = [
+            await create_todo(client, f"Done {n}", completed=True) for n in range(2)
+        ]
+
+        moved = await archive(db_engine, db_session)
+        created = await create_todo(client, "Next")
+        listed = await client.get("/todos/?include_archived=true&sort_by=id")
+
+        assert moved == 2
+        assert created > max(archived_ids)
+        assert [t["id"] for t in listed.json()["items"]] == [*archived_ids, created]
+
+    @pytest.mark.asyncio
+    async def test_with_users_spans_archive(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """Sorting, sparse fields and owners work across both tables."""
+        user = await client.post(
+            "/users/",
+            json={
+                "username": "archivist",
+                "email": "archivist@example.com",
+                "full_name": "Archivist",
+                "is_active": True,
+            },
+        )
+        user_id = user.json()["id"]
+        await create_todo(client, "B archived", user_id, completed=True)
+        await create_todo(client, "A archived", user_id, completed=True)
+        await create_todo(client, "C live", user_id, completed=True)
+
+        await archive(db_engine, db_session)
+        response = await client.get(
+            "/todos/with-users",
+            params={
+                "include_archived": "true",
+                "sort_by": "title",
+                "fields": "title,user.username",
+            },
+        )
+
+        assert response.json()["items"] == [
+            {"title": "A archived", "user": {"username": "archivist"}},
+            {"title": "B archived", "user": {"username": "archivist"}},
+            {"title": "C live", "user": {"username": "archivist"}},
+        ]
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from features.auth import bearer
+from features.auth.bearer import TokenVerifier
+from features.auth.jwt import InvalidTokenError, KeySet, encode
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def jwt_verifier(monkeypatch):
+    verifier = TokenVerifier(KeySet({"k1": SECRET}), audience="todo-api")
+    monkeypatch.setattr(bearer, "verifier", verifier)
+    return verifier
+
+
+def make_token(**overrides) -> str:
+    claims = {
+        "sub": "42",
+        "preferred_username": "jwt-user",
+        "aud": "todo-api",
+        "exp": time.time() + 60,
+    }
+    claims.update(overrides)
+    return encode(claims, SECRET, kid="k1")
+
+
+class TestAuthentication:
+    """Test suite for bearer token authentication."""
+
+    @pytest.mark.asyncio
+    async def test_valid_jwt_is_accepted(self, client: AsyncClient, jwt_verifier):
+        """A locally verifiable JWT should authenticate the request."""
+        response = await client.get(
+            "/todos/", headers={"Authorization": f"Bearer {make_token()}"}
+        )
+
+        assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_expired_jwt_is_rejected(self, client: AsyncClient, jwt_verifier):
+        """Expired tokens should surface 401."""
+        token = make_token(exp=time.time() - 3600)
+
+        response = await client.get(
+            "/todos/", headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Invalid or expired token"
+
+    @pytest.mark.asyncio
+    async def test_missing_credentials(self, client: AsyncClient):
+        """Protected routes require an Authorization header."""
+        response = await client.get("/todos/", headers={"Authorization": ""})
+
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_public_path_skips_auth(self, client: AsyncClient):
+        """Allowlisted routes are served without credentials."""
+        response = await client.get("/livez", headers={"Authorization": ""})
+
+        assert response.status_code == 200
+
+
+class TestTokenVerifier:
+    """Test suite for TokenVerifier caching."""
+
+    def test_verified_tokens_are_cached(self, monkeypatch, jwt_verifier):
+        calls = []
+        original = bearer.decode
+
+        def counting_decode(*args, **kwargs):
+            calls.append(args[0])
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(bearer, "decode", counting_decode)
+        token = make_token()
+
+        first = jwt_verifier.verify(token)
+        second = jwt_verifier.verify(token)
+
+        assert first is second
+        assert first["user_id"] == 42
+        assert first["username"] == "jwt-user"
+        assert len(calls) == 1
+
+    def test_rejected_tokens_are_negatively_cached(self, monkeypatch, jwt_verifier):
+        calls = []
+        original = bearer.decode
+
+        def counting_decode(*args, **kwargs):
+            calls.append(args[0])
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(bearer, "decode", counting_decode)
+        token = make_token(aud="someone-else")
+
+        for _ in range(3):
+            with pytest.raises(InvalidTokenError):
+                jwt_verifier.verify(token)
+
+        assert len(calls) == 1
+
+    def test_tampered_signature_is_rejected(self, jwt_verifier):
+        header, payload, _ = make_token().split(".")
+        forged = encode({"sub": "1", "aud": "todo-api"}, "wrong-secret", kid="k1")
+
+        with pytest.raises(InvalidTokenError):
+            jwt_verifier.verify(f"{header}.{payload}.{forged.split('.')[2]}")
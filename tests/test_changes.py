@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from conftest import create_todo
+from features.changes.models import ChangeLogEntry
+from features.changes.services import compact_change_log
+
+
+class TestTodoChanges:
+    """Test suite for GET /todos/changes."""
+
+    @pytest.mark.asyncio
+    async def test_delta_since_cursor(self, client: AsyncClient):
+        """Only ids touched after the cursor are returned, collapsed per id."""
+        kept = await create_todo(client, "Kept")
+        cursor = (await client.get("/todos/changes")).json()["cursor"]
+
+        updated = await create_todo(client, "Updated")
+        removed = await create_todo(client, "Removed")
+        await client.patch(f"/todos/{updated}", json={"completed": True})
+        await client.patch(f"/todos/{kept}", json={"title": "Kept, renamed"})
+        await client.delete(f"/todos/{removed}")
+
+        response = await client.get(f"/todos/changes?since={cursor}")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["changed"] == [updated, kept]
+        assert data["deleted"] == [removed]
+        assert data["has_more"] is False
+
+        follow_up = await client.get(f"/todos/changes?since={data['cursor']}")
+        assert follow_up.json()["changed"] == follow_up.json()["deleted"] == []
+
+    @pytest.mark.asyncio
+    async def test_delta_is_bounded(self, client: AsyncClient):
+        """`limit` caps the entries read; `has_more` asks for another page."""
+        ids = [await create_todo(client, f"Todo {n}") for n in range(3)]
+
+        first = (await client.get("/todos/changes?since=0&limit=2")).json()
+        second = (
+            await client.get(f"/todos/changes?since={first['cursor']}&limit=2")
+        ).json()
+
+        assert first["changed"] == ids[:2]
+        assert first["has_more"] is True
+        assert second["changed"] == ids[2:]
+        assert second["has_more"] is False
+
+    @pytest.mark.asyncio
+    async def test_failed_writes_leave_no_entries(
+        self, client: AsyncClient, db_session
+    ):
+        """Entries share the write's transaction."""
+        response = await client.post(
+            "/todos/", json={"title": "Orphan", "completed": False, "user_id": 999}
+        )
+
+        assert response.status_code == 404
+        count = await db_session.scalar(select(func.count(ChangeLogEntry.id)))
+        assert count == 0
+
+    @pytest.mark.asyncio
+    async def test_user_delete_logs_cascaded_todos(self, client: AsyncClient):
+        """Todos removed by ON DELETE CASCADE still show up as deleted."""
+        user = await client.post(
+            "/users/",
+            json={"username": "owner", "email": "owner@example.com", "is_active": True},
+        )
+        user_id = user.json()["id"]
+        owned = [await create_todo(client, f"Owned {n}", user_id) for n in range(2)]
+        cursor = (await client.get("/todos/changes")).json()["cursor"]
+
+        await client.delete(f"/users/{user_id}")
+        data = (await client.get(f"/todos/changes?since={cursor}")).json()
+
+        assert sorted(data["deleted"]) == owned
+
+    @pytest.mark.asyncio
+    async def test_compaction_expires_old_cursors(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """Compaction prunes old entries and older cursors get 410."""
+        for n in range(3):
+            await create_todo(client, f"Old {n}")
+        recent = await create_todo(client, "Recent")
+        async with db_session.begin():
+            await db_session.execute(
+                update(ChangeLogEntry)
+                .where(ChangeLogEntry.entity_id != recent)
+                .values(changed_at=datetime.now(timezone.utc) - timedelta(days=30))
+            )
+
+        removed = await compact_change_log(
+            retention_seconds=24 * 3600,
+            chunk_size=2,
+            session_factory=async_sessionmaker(db_engine, class_=AsyncSession),
+        )
+        expired = await client.get("/todos/changes?since=0")
+        current = await client.get("/todos/changes?since=3")
+
+        assert removed == 3
+        assert expired.status_code == 410
+        assert current.json()["changed"] == [recent]
+
+    @pytest.mark.asyncio
+    async def test_interrupted_compaction_still_expires_cursors(
+        self, client: AsyncClient, db_engine, db_session
+    ):
+        """Cursors expire before the first delete, not after the last."""
+        for n in range(3):
+            await create_todo(client, f"Old {n}")
+        async with db_session.begin():
+            await db_session.execute(
+                update(ChangeLogEntry).values(
+                    changed_at=datetime.now(timezone.utc) - timedelta(days=30)
+                )
+            )
+        sessions = async_sessionmaker(db_engine, class_=AsyncSession)
+        opened = 0
+
+        def failing_after_watermark():
+            nonlocal opened
+            opened += 1
+            if opened > 2:
+                raise RuntimeError("database went away")
+            return sessions()
+
+        with pytest.raises(RuntimeError):
+            await compact_change_log(
+                retention_seconds=24 * 3600, session_factory=failing_after_watermark
+            )
+        expired = await client.get("/todos/changes?since=0")
+
+        assert expired.status_code == 410
@@ -0,0 +1,272 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from conftest import create_todo
+from features.changes.models import ChangeLogEntry
+from features.todos.coalescing import todo_write_buffer
+from features.todos.events import matches, todo_hub
+from features.todos.models import Todo
+from features.todos.schemas.base import TodoFilterParams
+
+
+@pytest_asyncio.fixture
+async def write_buffer(db_engine, monkeypatch):
+    monkeypatch.setattr(todo_write_buffer, "enabled", True)
+    monkeypatch.setattr(
+        todo_write_buffer,
+        "session_factory",
+        async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    yield todo_write_buffer
+    await todo_write_buffer.flush()
+
+
+async def stored(db_engine, todo_id: int) -> Todo | None:
+    async with async_sessionmaker(db_engine, class_=AsyncSession)() as db:
+        return await db.get(Todo, todo_id)
+
+
+class TestWriteCoalescing:
+    """Test suite for write-behind todo updates."""
+
+    @pytest.mark.asyncio
+    async def test_toggles_are_acknowledged_and_written_once(
+        self, client: AsyncClient, db_engine, write_buffer
+    ):
+        """Updates answer at once, read back, and flush as one write."""
+        todo_id = await create_todo(client, "Toggle me")
+
+        for completed in (True, False, True):
+            patched = await client.patch(
+                f"/todos/{todo_id}", json={"completed": completed}
+            )
+            assert patched.json()["completed"] is completed
+        renamed = await client.patch(f"/todos/{todo_id}", json={"title": "Toggled"})
+        fetched = await client.get(f"/todos/{todo_id}")
+        before = await stored(db_engine, todo_id)
+
+        flushed = await write_buffer.flush()
+        after = await stored(db_engine, todo_id)
+        async with async_sessionmaker(db_engine, class_=AsyncSession)() as db:
+            logged = await db.scalar(
+                select(func.count()).where(ChangeLogEntry.operation == "updated")
+            )
+
+        assert renamed.json()["completed"] is True
+        assert fetched.json()["title"] == "Toggled"
+        assert fetched.json()["completed"] is True
+        assert (before.title, before.completed) == ("Toggle me", False)
+        assert flushed == 1
+        assert (after.title, after.completed) == ("Toggled", True)
+        assert after.completed_at is not None
+        assert logged == 1
+
+    @pytest.mark.asyncio
+    async def test_flushed_events_carry_previous_values(
+        self, client: AsyncClient, write_buffer
+    ):
+        """A reopened todo still reaches `completed=true` stream subscribers."""
+        todo_id = await create_todo(client, "Reopened", completed=True)
+        subscription = todo_hub.subscribe(matches(TodoFilterParams(completed=True)))
+        try:
+            await client.patch(f"/todos/{todo_id}", json={"completed": False})
+            await write_buffer.flush()
+        finally:
+            todo_hub.unsubscribe(subscription)
+
+        message = subscription.queue.get_nowait()
+
+        assert message["todo"]["completed"] is False
+        assert message["previous"] == {"user_id": None, "completed": True}
+
+    @pytest.mark.asyncio
+    async def test_batch_reads_overlay_buffered_values(
+        self, client: AsyncClient, db_session, write_buffer
+    ):
+        """GET /todos/batch agrees with GET /todos/{id} before the flush."""
+        todo_id = await create_todo(client, "Batched")
+
+        await client.patch(f"/todos/{todo_id}", json={"title": "Buffered"})
+        db_session.expunge_all()
+        batched = await client.get(f"/todos/batch?ids={todo_id}")
+
+        assert batched.json()["items"][0]["title"] == "Buffered"
+
+    @pytest.mark.asyncio
+    async def test_direct_writes_take_buffered_values(
+        self, client: AsyncClient, db_engine, write_buffer
+    ):
+        """Other updates carry buffered values; deletes drop them."""
+        user = await client.post(
+            "/users/",
+            json={
+                "username": "owner",
+                "email": "owner@example.com",
+                "full_name": "Owner",
+                "is_active": True,
+            },
+        )
+        moved_id = await create_todo(client, "Moved")
+        deleted_id = await create_todo(client, "Deleted")
+
+        await client.patch(f"/todos/{moved_id}", json={"completed": True})
+        reassigned = await client.patch(
+            f"/todos/{moved_id}", json={"user_id": user.json()["id"]}
+        )
+        await client.patch(f"/todos/{deleted_id}", json={"title": "Gone"})
+        await client.delete(f"/todos/{deleted_id}")
+        moved = await stored(db_engine, moved_id)
+
+        assert reassigned.json()["completed"] is True
+        assert moved.completed is True and moved.completed_at is not None
+        assert await write_buffer.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_rejected_direct_write_keeps_buffered_values(
+        self, client: AsyncClient, db_engine, write_buffer
+    ):
+        """A direct write that fails leaves acknowledged values buffered."""
+        todo_id = await create_todo(client, "Kept")
+
+        toggled = await client.patch(f"/todos/{todo_id}", json={"completed": True})
+        rejected = await client.patch(f"/todos/{todo_id}", json={"user_id": 999})
+        flushed = await write_buffer.flush()
+        response = await client.get(f"/todos/{todo_id}")
+
+        assert toggled.status_code == 200
+        assert rejected.status_code == 404
+        assert flushed == 1
+        assert response.json()["completed"] is True
+        assert (await stored(db_engine, todo_id)).completed is True
+
+    @pytest.mark.asyncio
+    async def test_null_for_required_fields_is_refused(
+        self, client: AsyncClient, write_buffer
+    ):
+        """Explicit nulls never reach the buffer or the table."""
+        todo_id = await create_todo(client, "Required")
+
+        completed = await client.patch(f"/todos/{todo_id}", json={"completed": None})
+        title = await client.patch(f"/todos/{todo_id}", json={"title": None})
+
+        assert completed.status_code == title.status_code == 422
+        assert await write_buffer.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_refused_rows_do_not_hold_back_the_batch(
+        self, client: AsyncClient, db_engine, write_buffer
+    ):
+        """A row the database refuses is dropped; the rest are written."""
+        bad_id = await create_todo(client, "Bad")
+        good_id = await create_todo(client, "Good")
+        write_buffer.put(bad_id, {"completed": None})
+        write_buffer.put(good_id, {"completed": True})
+
+        written = await write_buffer.flush()
+
+        assert written == 1
+        assert (await stored(db_engine, good_id)).completed is True
+        assert (await stored(db_engine, bad_id)).completed is False
+        assert await write_buffer.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_stopping_flushes_pending_writes(
+        self, client: AsyncClient, db_engine, write_buffer, monkeypatch
+    ):
+        """Shutdown writes whatever is still buffered."""
+        todo_id = await create_todo(client, "Before shutdown")
+        monkeypatch.setattr(write_buffer._flusher, "interval", 3600)
+        write_buffer.start()
+
+        await client.patch(f"/todos/{todo_id}", json={"title": "After shutdown"})
+        await write_buffer.stop()
+
+        assert (await stored(db_engine, todo_id)).title == "After shutdown"
+
+    @pytest.mark.asyncio
+    async def test_stopping_lets_a_flush_in_progress_finish(
+        self, client: AsyncClient, db_engine, write_buffer, monkeypatch
+    ):
+        """Stopping mid-flush neither cancels nor loses the batch."""
+        todo_id = await create_todo(client, "Before shutdown")
+        writing = asyncio.Event()
+        write = write_buffer._write
+
+        async def slow_write(batch):
+            writing.set()
+            await asyncio.sleep(0.05)
+            await write(batch)
+
+        monkeypatch.setattr(write_buffer, "_write", slow_write)
+        monkeypatch.setattr(write_buffer._flusher, "interval", 3600)
+        write_buffer.start()
+        await client.patch(f"/todos/{todo_id}", json={"title": "Mid flush"})
+        write_buffer._flusher.wake()
+        await writing.wait()
+        await write_buffer.stop()
+
+        assert (await stored(db_engine, todo_id)).title == "Mid flush"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_flush_keeps_its_batch(
+        self, client: AsyncClient, db_engine, write_buffer, monkeypatch
+    ):
+        """A flush cancelled while writing hands the batch back."""
+        todo_id = await create_todo(client, "Cancelled")
+        write = write_buffer._write
+
+        async def hanging_write(batch):
+            await asyncio.Event().wait()
+
+        await client.patch(f"/todos/{todo_id}", json={"title": "Kept"})
+        monkeypatch.setattr(write_buffer, "_write", hanging_write)
+        flush = asyncio.create_task(write_buffer.flush())
+        await asyncio.sleep(0)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        monkeypatch.setattr(write_buffer, "_write", write)
+
+        assert await write_buffer.flush() == 1
+        assert (await stored(db_engine, todo_id)).title == "Kept"
+
+    @pytest.mark.asyncio
+    async def test_direct_writes_wait_for_a_flush_of_the_same_todo(
+        self, client: AsyncClient, db_engine, write_buffer, monkeypatch
+    ):
+        """A batch written meanwhile cannot overwrite a later direct write."""
+        user = await client.post(
+            "/users/",
+            json={
+                "username": "racer",
+                "email": "racer@example.com",
+                "full_name": "Racer",
+                "is_active": True,
+            },
+        )
+        todo_id = await create_todo(client, "Raced")
+        writing = asyncio.Event()
+        write = write_buffer._write
+
+        async def slow_write(batch):
+            writing.set()
+            await asyncio.sleep(0.05)
+            await write(batch)
+
+        await client.patch(f"/todos/{todo_id}", json={"completed": True})
+        monkeypatch.setattr(write_buffer, "_write", slow_write)
+        flush = asyncio.create_task(write_buffer.flush())
+        await writing.wait()
+        direct = await client.patch(
+            f"/todos/{todo_id}",
+            json={"completed": False, "user_id": user.json()["id"]},
+        )
+        await flush
+
+        assert direct.json()["completed"] is False
+        assert (await stored(db_engine, todo_id)).completed is False
@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from httpx import AsyncClient
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from features.compression.codecs import available_codecs
+from features.compression.middleware import CompressionMiddleware, negotiate
+
+CODECS = available_codecs(gzip_level=6, brotli_quality=4, zstd_level=3)
+GZIP_ONLY = [codec for codec in CODECS if codec.name == "gzip"]
+
+
+def make_middleware(app, **kwargs) -> CompressionMiddleware:
+    kwargs.setdefault("minimum_size", 100)
+    return CompressionMiddleware(app, codecs=GZIP_ONLY, **kwargs)
+
+
+async def call(app, path: str = "/", accept_encoding: bytes = b"gzip"):
+    """Run `app` once and return the raw ASGI messages it sent."""
+    messages = []
+    disconnected = asyncio.Event()
+
+    async def receive():
+        # Streaming responses poll for a disconnect that never comes.
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding)],
+    }
+    await app(scope, receive, send)
+    return messages
+
+
+def headers_of(message) -> dict[bytes, bytes]:
+    return dict(message["headers"])
+
+
+class TestNegotiation:
+    """Test suite for Accept-Encoding negotiation."""
+
+    def test_prefers_highest_quality(self):
+        gzip_codec = GZIP_ONLY[0]
+
+        assert negotiate("gzip", CODECS).name in {"gzip", "br", "zstd"}
+        assert negotiate("br;q=0.5, gzip", GZIP_ONLY) is gzip_codec
+        assert negotiate("*;q=0.1", GZIP_ONLY) is gzip_codec
+        assert negotiate("gzip;q=0", GZIP_ONLY) is None
+        assert negotiate("identity", GZIP_ONLY) is None
+
+
+class TestCompressionMiddleware:
+    """Test suite for the compressing ASGI middleware."""
+
+    @pytest.mark.asyncio
+    async def test_compresses_above_threshold(self):
+        body = {"items": [{"title": f"todo {i}"} for i in range(50)]}
+        app = make_middleware(JSONResponse(body))
+
+        start, message = await call(app)
+        headers = headers_of(start)
+
+        assert headers[b"content-encoding"] == b"gzip"
+        assert headers[b"vary"] == b"Accept-Encoding"
+        assert int(headers[b"content-length"]) == len(message["body"])
+        assert gzip.decompress(message["body"]) == JSONResponse(body).body
+
+    @pytest.mark.asyncio
+    async def test_small_and_unaccepted_bodies_pass_through(self):
+        small = await call(make_middleware(PlainTextResponse("ok")))
+        big = PlainTextResponse("x" * 1000)
+        identity = await call(make_middleware(big), accept_encoding=b"identity")
+
+        assert b"content-encoding" not in headers_of(small[0])
+        assert small[1]["body"] == b"ok"
+        assert b"content-encoding" not in headers_of(identity[0])
+
+    @pytest.mark.asyncio
+    async def test_streaming_chunks_decode_on_arrival(self):
+        chunks = [f'{{"line": {i}}}\n'.encode() * 20 for i in range(3)]
+
+        async def lines():
+            for chunk in chunks:
+                yield chunk
+
+        app = make_middleware(
+            StreamingResponse(lines(), media_type="application/x-ndjson")
+        )
+        start, *bodies = await call(app)
+
+        assert headers_of(start)[b"content-encoding"] == b"gzip"
+        assert b"content-length" not in headers_of(start)
+        decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        decoded = [decoder.decompress(message["body"]) for message in bodies]
+        assert decoded[: len(chunks)] == chunks
+        assert b"".join(decoded) == b"".join(chunks)
+        assert decoder.eof
+        assert bodies[-1]["more_body"] is False
+
+    @pytest.mark.asyncio
+    async def test_path_and_event_stream_opt_out(self):
+        async def endpoint(scope, receive, send):
+            await PlainTextResponse("x" * 1000)(scope, receive, send)
+
+        async def event_stream(scope, receive, send):
+            response = PlainTextResponse("data: x\n\n" * 100)
+            response.headers["content-type"] = "text/event-stream"
+            await response(scope, receive, send)
+
+        exempt = await call(
+            make_middleware(endpoint, exempt_paths=["/exports/*"]), path="/exports/1"
+        )
+        events = await call(make_middleware(event_stream))
+
+        for start, _ in (exempt, events):
+            assert b"content-encoding" not in headers_of(start)
+
+    @pytest.mark.asyncio
+    async def test_api_responses_are_compressed(self, client: AsyncClient):
+        for n in range(20):
+            await client.post(
+                "/todos/",
+                json={
+                    "title": f"Todo {n}",
+                    "description": "x" * 40,
+                    "completed": False,
+                },
+            )
+
+        response = await client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["total"] == 20
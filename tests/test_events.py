@@ -0,0 +1,159 @@
+import pytest
+from httpx import AsyncClient
+from starlette.requests import ClientDisconnect
+
+from features.events.hub import (
+    RESYNC,
+    BroadcastHub,
+    EventStreamResponse,
+    HubFullError,
+    sse_events,
+)
+from features.events.pubsub import LocalPubSub
+from features.todos.events import matches, todo_hub
+from features.todos.schemas.base import TodoFilterParams
+
+
+def make_hub(**kwargs) -> BroadcastHub:
+    kwargs.setdefault("max_subscribers", 10)
+    kwargs.setdefault("buffer_size", 10)
+    return BroadcastHub("test", LocalPubSub(), **kwargs)
+
+
+@pytest.fixture
+def todo_subscription():
+    subscription = todo_hub.subscribe(matches(TodoFilterParams(completed=True)))
+    yield subscription
+    todo_hub.unsubscribe(subscription)
+
+
+def drain(subscription) -> list[dict]:
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(subscription.queue.get_nowait())
+    return messages
+
+
+class TestBroadcastHub:
+    """Test suite for the in-process broadcast hub."""
+
+    def test_fans_out_matching_messages(self):
+        hub = make_hub()
+        everything = hub.subscribe()
+        odd = hub.subscribe(lambda message: message["n"] % 2 == 1)
+
+        for n in range(3):
+            hub.publish({"n": n})
+
+        assert [m["n"] for m in drain(everything)] == [0, 1, 2]
+        assert [m["n"] for m in drain(odd)] == [1]
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        hub = make_hub(buffer_size=2)
+        slow = hub.subscribe()
+
+        for n in range(3):
+            hub.publish({"n": n})
+        hub.publish({"n": 3})
+
+        assert drain(slow) == [RESYNC, {"n": 3}]
+        assert slow.overflows == 1
+
+    def test_subscribers_are_capped(self):
+        hub = make_hub(max_subscribers=1)
+        first = hub.subscribe()
+
+        with pytest.raises(HubFullError):
+            hub.subscribe()
+        hub.unsubscribe(first)
+        hub.subscribe()
+
+    @pytest.mark.asyncio
+    async def test_sse_encoding_and_heartbeat(self):
+        hub = make_hub()
+        subscription = hub.subscribe()
+        events = sse_events(hub, subscription, event="todo", heartbeat=0.01)
+
+        assert (await anext(events)).startswith("retry:")
+        assert await anext(events) == ": keepalive\n\n"
+        hub.publish({"n": 1})
+        assert await anext(events) == 'event: todo\ndata: {"n": 1}\n\n'
+        subscription.offer(RESYNC)
+        assert (await anext(events)).startswith("event: resync")
+
+        await events.aclose()
+        assert not hub.subscriptions
+
+    @pytest.mark.asyncio
+    async def test_response_releases_unstarted_subscription(self):
+        """A client gone before the body streams still frees its slot."""
+        hub = make_hub(max_subscribers=1)
+        response = EventStreamResponse(hub, hub.subscribe(), event="todo", heartbeat=1)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("connection reset")
+
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(ClientDisconnect):
+            await response(scope, receive, send)
+
+        assert not hub.subscriptions
+
+
+class TestTodoStream:
+    """Test suite for todo change events and GET /todos/stream."""
+
+    @pytest.mark.asyncio
+    async def test_committed_changes_are_published(
+        self, client: AsyncClient, todo_subscription
+    ):
+        created = await client.post(
+            "/todos/", json={"title": "Live", "completed": False}
+        )
+        todo_id = created.json()["id"]
+        await client.patch(f"/todos/{todo_id}", json={"completed": True})
+        await client.delete(f"/todos/{todo_id}")
+        await client.post(
+            "/todos/", json={"title": "Orphan", "completed": True, "user_id": 999}
+        )
+
+        messages = drain(todo_subscription)
+
+        assert [m["operation"] for m in messages] == ["updated", "deleted"]
+        assert messages[0]["todo"]["title"] == "Live"
+        assert messages[1]["todo"] == {
+            "id": todo_id,
+            "user_id": None,
+            "completed": True,
+        }
+
+    @pytest.mark.asyncio
+    async def test_todos_leaving_the_filter_are_published(
+        self, client: AsyncClient, todo_subscription
+    ):
+        """Reopening a completed todo reaches `completed=true` subscribers."""
+        created = await client.post(
+            "/todos/", json={"title": "Done", "completed": True}
+        )
+        todo_id = created.json()["id"]
+        await client.patch(f"/todos/{todo_id}", json={"title": "Still done"})
+        await client.patch(f"/todos/{todo_id}", json={"completed": False})
+        await client.patch(f"/todos/{todo_id}", json={"title": "Open"})
+
+        messages = drain(todo_subscription)
+
+        assert [m["operation"] for m in messages] == ["created"] + ["updated"] * 2
+        assert "previous" not in messages[1]
+        assert messages[2]["todo"]["completed"] is False
+        assert messages[2]["previous"] == {"user_id": None, "completed": True}
+
+    @pytest.mark.asyncio
+    async def test_stream_rejects_when_full(self, client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(todo_hub, "max_subscribers", 0)
+
+        response = await client.get("/todos/stream")
+
+        assert response.status_code == 503
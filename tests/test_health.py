@@ -0,0 +1,76 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from features.auth import bearer
+from features.health.checker import health_checker, migration_heads
+
+
+class TestHealthEndpoints:
+    """Test suite for liveness and readiness probes."""
+
+    @pytest.mark.asyncio
+    async def test_livez_needs_no_auth(self, client: AsyncClient):
+        """Liveness is a constant answer without credentials."""
+        response = await client.get("/livez", headers={"Authorization": ""})
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok"}
+
+    @pytest.mark.asyncio
+    async def test_readyz_serves_background_report(
+        self, client: AsyncClient, app_engine
+    ):
+        """Readiness reflects the last refresh and runs no query per probe."""
+        await health_checker.refresh()
+
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(app_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            responses = [await client.get("/readyz") for _ in range(5)]
+        finally:
+            event.remove(app_engine.sync_engine, "before_cursor_execute", record)
+
+        assert statements == []
+        assert all(response.status_code == 200 for response in responses)
+        assert responses[-1].json() == {"ready": True}
+
+    @pytest.mark.asyncio
+    async def test_detailed_report_is_admin_only(
+        self, client: AsyncClient, monkeypatch
+    ):
+        """Errors, revisions and pool statistics stay behind admin auth."""
+        report = await health_checker.refresh()
+
+        anonymous = await client.get("/admin/health", headers={"Authorization": ""})
+        forbidden = await client.get("/admin/health")
+        monkeypatch.setattr(bearer, "ADMIN_USERNAMES", frozenset({"testuser"}))
+        response = await client.get("/admin/health")
+
+        assert anonymous.status_code == 401
+        assert forbidden.status_code == 403
+        body = response.json()
+        assert body["ready"] is True
+        assert body["report"]["database"]["ok"] is True
+        assert body["report"]["database"]["latency_ms"] >= 0
+        assert body["report"]["migrations"]["heads"] == list(migration_heads())
+        assert body["report"]["migrations"]["current"] == report.migrations.current
+        assert "log_queue_depth" in body["report"]
+        assert set(body["report"]["pools"]) >= {"interactive", "bulk"}
+        assert "pool" not in body["report"]
+
+    @pytest.mark.asyncio
+    async def test_readyz_unavailable_before_first_check(
+        self, client: AsyncClient, monkeypatch
+    ):
+        """Without a report the instance must not receive traffic."""
+        monkeypatch.setattr(health_checker, "report", None)
+
+        response = await client.get("/readyz")
+
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
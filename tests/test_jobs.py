@@ -0,0 +1,234 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database import Base
+
+from features.jobs.models import Job
+from features.jobs.queue import JobPriority, JobQueue, QueueFullError
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path):
+    """Sessions on a file database; workers and the test query concurrently."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def make_queue(sessions, **options) -> JobQueue:
+    return JobQueue(
+        **{
+            "workers": 1,
+            "queue_size": 2,
+            "max_attempts": 3,
+            "backoff": 0.01,
+            "max_backoff": 0.05,
+            "poll_interval": 0.01,
+            "lease": 60,
+            "claim_batch_size": 10,
+            "shutdown_timeout": 1,
+            "session_factory": sessions,
+            **options,
+        }
+    )
+
+
+async def eventually(condition, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not await condition():
+            await asyncio.sleep(0.01)
+
+
+class TestJobQueue:
+    """Test suite for the in-process job queue."""
+
+    @pytest.mark.asyncio
+    async def test_priorities_and_bounds(self, sessions):
+        """Higher priorities run first; each priority has its own bound."""
+        queue = make_queue(sessions)
+        ran = []
+
+        @queue.job("record", priority=JobPriority.low)
+        @queue.job("urgent", priority=JobPriority.high)
+        async def record(value: str) -> None:
+            ran.append(value)
+
+        queue.enqueue("record", value="low 0")
+        queue.enqueue("record", value="low 1")
+        with pytest.raises(QueueFullError):
+            queue.enqueue("record", value="low 2")
+        queue.enqueue("urgent", value="high")
+
+        queue.start()
+        await queue.stop()
+
+        assert ran == ["high", "low 0", "low 1"]
+
+    @pytest.mark.asyncio
+    async def test_failed_jobs_are_retried_with_backoff(self, sessions):
+        """A job failing twice succeeds on its third and last attempt."""
+        queue = make_queue(sessions)
+        attempts = []
+
+        @queue.job("flaky")
+        async def flaky() -> None:
+            attempts.append(asyncio.get_running_loop().time())
+            if len(attempts) < 3:
+                raise RuntimeError("not yet")
+
+        queue.start()
+        queue.enqueue("flaky")
+
+        async def retried() -> bool:
+            return len(attempts) == 3
+
+        await eventually(retried)
+        await queue.stop()
+
+        first, second, third = attempts
+        assert second - first >= 0.01
+        assert third - second >= 0.02
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_only_after_commit(self, sessions):
+        """Jobs enqueued in a transaction that rolls back never run."""
+        queue = make_queue(sessions)
+        ran = []
+
+        @queue.job("record")
+        async def record(value: str) -> None:
+            ran.append(value)
+
+        async with sessions() as db:
+            async with db.begin():
+                queue.enqueue_after_commit(db, "record", value="committed")
+            with pytest.raises(RuntimeError):
+                async with db.begin():
+                    queue.enqueue_after_commit(db, "record", value="rolled back")
+                    raise RuntimeError
+
+        queue.start()
+        await queue.stop()
+
+        assert ran == ["committed"]
+
+    @pytest.mark.asyncio
+    async def test_disabled_queue_drops_jobs(self, sessions):
+        """Without workers, in-memory jobs neither pile up nor fill the queue."""
+        queue = make_queue(sessions, enabled=False)
+        ran = []
+
+        @queue.job("record")
+        async def record(value: int) -> None:
+            ran.append(value)
+
+        for value in range(5):
+            queue.enqueue("record", value=value)
+        queue.start()
+        await queue.stop()
+
+        assert ran == []
+        assert queue._backlog == []
+
+    @pytest.mark.asyncio
+    async def test_durable_jobs_survive_a_restart(self, sessions):
+        """Rows outlive the process that queued them; failures are kept."""
+        before_restart = make_queue(sessions)
+        after_restart = make_queue(sessions, max_attempts=2)
+        ran = []
+        for queue in (before_restart, after_restart):
+
+            @queue.job("send", durable=True)
+            async def send(to: str) -> None:
+                if to == "nobody":
+                    raise ValueError("no recipient")
+                ran.append(to)
+
+        async with sessions() as db, db.begin():
+            before_restart.enqueue_after_commit(db, "send", to="someone")
+            before_restart.enqueue_after_commit(db, "send", to="nobody")
+
+        async def settled() -> bool:
+            async with sessions() as db:
+                jobs = list(await db.scalars(select(Job)))
+            return [job.status for job in jobs] == ["failed"]
+
+        after_restart.start()
+        await eventually(settled)
+        await after_restart.stop()
+
+        async with sessions() as db:
+            failed = await db.scalar(select(Job))
+        assert ran == ["someone"]
+        assert failed.payload == {"to": "nobody"}
+        assert failed.attempts == 2
+        assert failed.last_error == "ValueError('no recipient')"
+
+    @pytest.mark.asyncio
+    async def test_lost_runs_count_against_max_attempts(self, sessions):
+        """An expired lease is claimed again only while attempts remain."""
+        queue = make_queue(sessions, max_attempts=2)
+        ran = []
+
+        @queue.job("send", durable=True)
+        async def send(to: str) -> None:
+            ran.append(to)
+
+        async with sessions() as db, db.begin():
+            # Both leases ran out with their workers; one attempt is left.
+            for to, attempts in (("retried", 1), ("exhausted", 2)):
+                db.add(
+                    Job(
+                        name="send",
+                        payload={"to": to},
+                        priority=JobPriority.normal,
+                        status="running",
+                        attempts=attempts,
+                    )
+                )
+
+        async def settled() -> bool:
+            async with sessions() as db:
+                jobs = list(await db.scalars(select(Job)))
+            return [job.status for job in jobs] == ["failed"]
+
+        queue.start()
+        await eventually(settled)
+        await queue.stop()
+
+        async with sessions() as db:
+            failed = await db.scalar(select(Job))
+        assert ran == ["retried"]
+        assert failed.payload == {"to": "exhausted"}
+        assert failed.attempts == 2
+        assert failed.last_error == "Lease expired; its worker was lost"
+
+    @pytest.mark.asyncio
+    async def test_background_user_delete_queues_a_durable_purge(
+        self, client: AsyncClient, db_session
+    ):
+        """The purge is recorded in the same transaction as the deactivation."""
+        user = await client.post(
+            "/users/",
+            json={
+                "username": "leaving",
+                "email": "leaving@example.com",
+                "full_name": "Leaving",
+                "is_active": True,
+            },
+        )
+        user_id = user.json()["id"]
+
+        response = await client.delete(f"/users/{user_id}?background=true")
+        job = await db_session.scalar(select(Job))
+
+        assert response.status_code == 202
+        assert (job.name, job.status) == ("users.purge", "pending")
+        assert job.payload["user_id"] == user_id
@@ -0,0 +1,73 @@
+import pytest
+from httpx import AsyncClient
+
+from features.health.checker import health_checker
+from features.loadshed.shedder import LoadShedder, load_shedder
+
+
+def make_shedder() -> LoadShedder:
+    return LoadShedder(
+        sample_interval=0.5,
+        lag_threshold=0.1,
+        pool_wait_threshold=0.05,
+        pool_utilization_threshold=0.9,
+        recovery_step=0.25,
+        low_priority_paths=["/todos/with-users", "/todos/export*"],
+        deep_offset=1000,
+    )
+
+
+def http_scope(path: str, query: bytes = b"") -> dict:
+    return {"type": "http", "path": path, "query_string": query}
+
+
+class TestLoadShedder:
+    """Test suite for adaptive load shedding decisions."""
+
+    def test_low_priority_classification(self):
+        shedder = make_shedder()
+
+        assert shedder.is_low_priority(http_scope("/todos/with-users"))
+        assert shedder.is_low_priority(http_scope("/todos/export.ndjson"))
+        assert shedder.is_low_priority(http_scope("/todos/", b"page=200&page_size=10"))
+        assert not shedder.is_low_priority(http_scope("/todos/", b"page=2"))
+        assert not shedder.is_low_priority(http_scope("/todos/1"))
+
+    def test_engages_on_threshold_and_recovers_gradually(self):
+        shedder = make_shedder()
+        shedder.observe(lag=0.0, pool_wait=0.0, pool_utilization=0.1)
+        assert not shedder.degraded
+
+        shedder.observe(lag=0.3, pool_wait=0.0, pool_utilization=0.1)
+        assert shedder.shed_fraction == 1.0
+        assert shedder.should_shed(http_scope("/todos/with-users"))
+        assert not shedder.should_shed(http_scope("/todos/1"))
+
+        fractions = []
+        for _ in range(4):
+            shedder.observe(lag=0.0, pool_wait=0.0, pool_utilization=0.1)
+            fractions.append(shedder.shed_fraction)
+
+        assert fractions == [0.75, 0.5, 0.25, 0.0]
+        assert not shedder.degraded
+
+
+class TestLoadSheddingEndpoints:
+    """Test suite for load shedding as seen through the API."""
+
+    @pytest.mark.asyncio
+    async def test_degraded_state_is_reported(self, client: AsyncClient, app_engine):
+        load_shedder.observe(lag=10.0, pool_wait=0.0, pool_utilization=0.0)
+        try:
+            await health_checker.refresh()
+            shed = await client.get("/todos/with-users")
+            health = await client.get("/health")
+            metrics = await client.get("/metrics")
+        finally:
+            load_shedder.shed_fraction = 0.0
+
+        assert shed.status_code == 503
+        assert "retry-after" in shed.headers
+        assert health.json()["status"] == "degraded"
+        assert health_checker.report.load_shedding.degraded
+        assert "app_load_degraded 1.0" in metrics.text
@@ -0,0 +1,185 @@
+import pytest
+import sqlalchemy as sa
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from migrations import helpers
+from migrations.helpers import (
+    backfill,
+    clear_checkpoints,
+    create_index_concurrently,
+    load_checkpoint,
+)
+from migrations.preflight import (
+    TableChange,
+    alembic_config,
+    declared_changes,
+    estimate_change,
+)
+
+
+@pytest.fixture
+def sync_engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.begin() as conn:
+        conn.execute(
+            sa.text(
+                "CREATE TABLE todos "
+                "(id INTEGER PRIMARY KEY, title TEXT, priority INTEGER)"
+            )
+        )
+        conn.execute(
+            sa.text("INSERT INTO todos (title) VALUES (:title)"),
+            [{"title": f"todo {n}"} for n in range(25)],
+        )
+    yield engine
+    engine.dispose()
+
+
+def run_operation(engine, fn):
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        with context.begin_transaction(), Operations.context(context):
+            return fn()
+
+
+class TestBackfill:
+    """Test suite for chunked, resumable backfills."""
+
+    def test_backfill_in_chunks(self, sync_engine, monkeypatch):
+        pauses = []
+        monkeypatch.setattr(helpers.time, "sleep", pauses.append)
+
+        updated = run_operation(
+            sync_engine,
+            lambda: backfill(
+                "todos",
+                {"priority": 0},
+                revision="r1",
+                where=lambda t: t.c.priority.is_(None),
+                chunk_size=10,
+                pause_seconds=0.5,
+            ),
+        )
+
+        assert updated == 25
+        assert pauses == [0.5, 0.5]
+        with sync_engine.connect() as conn:
+            assert (
+                conn.scalar(sa.text("SELECT count(*) FROM todos WHERE priority = 0"))
+                == 25
+            )
+            checkpoint = load_checkpoint(conn, "r1:backfill:todos:priority")
+        assert checkpoint.completed and checkpoint.rows_done == 25
+
+    def test_interrupted_backfill_resumes(self, sync_engine, monkeypatch):
+        def interrupt(seconds):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(helpers.time, "sleep", interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            run_operation(
+                sync_engine,
+                lambda: backfill(
+                    "todos", {"priority": 1}, revision="r1", chunk_size=10
+                ),
+            )
+
+        with sync_engine.connect() as conn:
+            assert load_checkpoint(conn, "r1:backfill:todos:priority").last_key == 10
+
+        monkeypatch.setattr(helpers.time, "sleep", lambda seconds: None)
+        resumed = run_operation(
+            sync_engine,
+            lambda: backfill("todos", {"priority": 1}, revision="r1", chunk_size=10),
+        )
+        again = run_operation(
+            sync_engine,
+            lambda: backfill("todos", {"priority": 1}, revision="r1", chunk_size=10),
+        )
+
+        assert resumed == 15
+        assert again == 0
+
+    def test_downgrade_clears_revision_checkpoints(self, sync_engine, monkeypatch):
+        """Upgrading again after a downgrade reruns the backfill."""
+        monkeypatch.setattr(helpers.time, "sleep", lambda seconds: None)
+
+        def upgrade():
+            return backfill("todos", {"priority": 2}, revision="r1")
+
+        first = run_operation(sync_engine, upgrade)
+        with sync_engine.begin() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                clear_checkpoints("r1")
+        rerun = run_operation(sync_engine, upgrade)
+
+        assert first == rerun == 25
+        with sync_engine.connect() as conn:
+            assert load_checkpoint(conn, "r1:backfill:todos:priority").completed
+
+    def test_create_index(self, sync_engine):
+        run_operation(
+            sync_engine,
+            lambda: create_index_concurrently(
+                "ix_todos_priority", "todos", ["priority"]
+            ),
+        )
+
+        with sync_engine.connect() as conn:
+            indexes = sa.inspect(conn).get_indexes("todos")
+        assert [index["name"] for index in indexes] == ["ix_todos_priority"]
+
+
+class TestRevisions:
+    """Test suite for individual revisions."""
+
+    def test_rebuilding_a_table_keeps_orphaned_rows(self, tmp_path):
+        """Migrations run without the app's foreign key enforcement."""
+        engine = sa.create_engine(f"sqlite:///{tmp_path / 'orphans.db'}")
+        with engine.begin() as conn:
+            conn.execute(sa.text("CREATE TABLE users (id INTEGER PRIMARY KEY)"))
+            conn.execute(
+                sa.text(
+                    "CREATE TABLE todos (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                    "CONSTRAINT fk_todos_user_id FOREIGN KEY(user_id) "
+                    "REFERENCES users (id))"
+                )
+            )
+            # Left behind while SQLite did not enforce the key.
+            conn.execute(sa.text("INSERT INTO todos (user_id) VALUES (42)"))
+        revision = ScriptDirectory.from_config(alembic_config()).get_revision(
+            "3f9a1c2b7d4e"
+        )
+
+        run_operation(engine, revision.module.upgrade)
+
+        with engine.connect() as conn:
+            assert conn.scalar(sa.text("SELECT user_id FROM todos")) == 42
+            [foreign_key] = sa.inspect(conn).get_foreign_keys("todos")
+        engine.dispose()
+        assert foreign_key["options"] == {"ondelete": "CASCADE"}
+
+
+class TestPreflight:
+    """Test suite for the pre-upgrade estimate."""
+
+    def test_batch_alter_revisions_are_detected(self):
+        scripts = ScriptDirectory.from_config(alembic_config())
+
+        changes = declared_changes(scripts.get_revision("e38fa223f58e"))
+
+        assert changes == [TableChange("todos", "rewrite")]
+
+    def test_backfill_locks_less_than_rewrite(self, sync_engine):
+        with sync_engine.connect() as conn:
+            rewrite = estimate_change(conn, "r1", TableChange("todos", "rewrite"))
+            chunked = estimate_change(
+                conn, "r2", TableChange("todos", "backfill", chunk_size=5)
+            )
+            missing = estimate_change(conn, "r3", TableChange("absent", "rewrite"))
+
+        assert rewrite.rows == chunked.rows == 25
+        assert rewrite.lock_seconds > chunked.lock_seconds > 0
+        assert missing.rows == 0 and missing.lock_seconds == 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from features.common.periodic import PeriodicTask
+
+
+class TestPeriodicTask:
+    """Test suite for the shared background loop."""
+
+    @pytest.mark.asyncio
+    async def test_failing_ticks_do_not_end_the_loop(self):
+        """Ticks keep running after one raises; `wake` skips the wait."""
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            ticks += 1
+            raise RuntimeError("boom")
+
+        task = PeriodicTask(tick, interval=3600, name="Test tick", immediate=True)
+        task.start()
+        await asyncio.sleep(0)
+        task.wake()
+        await asyncio.sleep(0.01)
+        await task.stop()
+
+        assert ticks == 2
+
+    @pytest.mark.asyncio
+    async def test_graceful_stop_lets_a_tick_finish(self):
+        """Stopping waits for the tick in progress instead of cancelling it."""
+        started, finished = asyncio.Event(), []
+
+        async def tick():
+            started.set()
+            await asyncio.sleep(0.05)
+            finished.append(True)
+
+        task = PeriodicTask(tick, interval=3600, name="Test tick", graceful=True)
+        task.start()
+        task.wake()
+        await started.wait()
+        await task.stop()
+
+        assert finished == [True]
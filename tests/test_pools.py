@@ -0,0 +1,98 @@
+import pytest
+import pytest_asyncio
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import exc, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import database
+from database import (
+    _create_engine,
+    get_db,
+    pool_checkouts_counter,
+    pool_timeouts_counter,
+    use_pool,
+)
+from metrics import registry
+from settings import PoolSettings
+
+
+@pytest_asyncio.fixture
+async def pools(tmp_path, monkeypatch):
+    """File-database engines for the default pool and a one-slot "bulk" pool."""
+    monkeypatch.setattr(
+        database.settings,
+        "db_pools",
+        {"bulk": PoolSettings(size=1, timeout_seconds=0.05)},
+    )
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pools.db'}"
+    engines = {pool: _create_engine(url, pool) for pool in ("interactive", "bulk")}
+    yield engines
+    for engine in engines.values():
+        await engine.dispose()
+
+
+class TestConnectionPools:
+    """Test suite for named connection pools."""
+
+    @pytest.mark.asyncio
+    async def test_pools_are_sized_and_measured_apart(self, pools):
+        """A full pool times out alone and reports under its own name."""
+        interactive_before = pool_checkouts_counter.value(pool="interactive")
+        timeouts_before = pool_timeouts_counter.value(pool="bulk")
+
+        async with pools["bulk"].connect():
+            with pytest.raises(exc.TimeoutError):
+                async with pools["bulk"].connect():
+                    pass
+            async with pools["interactive"].connect() as conn:
+                await conn.execute(select(1))
+            metrics = registry.render()
+
+        assert pools["bulk"].sync_engine.pool.size() == 1
+        assert pool_timeouts_counter.value(pool="bulk") == timeouts_before + 1
+        assert (
+            pool_checkouts_counter.value(pool="interactive") == interactive_before + 1
+        )
+        assert 'app_db_pool_checkouts_total{pool="bulk"}' in metrics
+
+    @pytest.mark.asyncio
+    async def test_routes_choose_their_pool(self, pools, monkeypatch):
+        """`get_db` sessions come from the pool the route declares."""
+        monkeypatch.setattr(
+            database,
+            "pool_sessions",
+            {
+                pool: async_sessionmaker(engine, class_=AsyncSession)
+                for pool, engine in pools.items()
+            },
+        )
+        app = FastAPI()
+
+        @app.get("/default")
+        async def default(db: AsyncSession = Depends(get_db)):
+            return {"pool": db.bind.sync_engine.pool.pool_name}
+
+        @app.get("/bulk", dependencies=[Depends(use_pool("bulk"))])
+        async def bulk(db: AsyncSession = Depends(get_db)):
+            return {"pool": db.bind.sync_engine.pool.pool_name}
+
+        @app.get("/unknown", dependencies=[Depends(use_pool("reports"))])
+        async def unknown(db: AsyncSession = Depends(get_db)):
+            return {"bound": db.bind is not None}
+
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            chosen = [
+                (await client.get(path)).json()
+                for path in ("/default", "/bulk", "/default")
+            ]
+            unknown_pool = await client.get("/unknown")
+
+        assert chosen == [
+            {"pool": "interactive"},
+            {"pool": "bulk"},
+            {"pool": "interactive"},
+        ]
+        assert unknown_pool.status_code == 200
@@ -0,0 +1,153 @@
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from features.auth import bearer
+from features.profiling import routes
+from features.profiling.middleware import ProfilingMiddleware
+from features.profiling.profiler import SamplingProfiler
+from features.profiling.store import ProfileStore
+from middleware import StructlogRequestMiddleware
+
+
+def spin(seconds: float) -> None:
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def profiled_app(store: ProfileStore, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/busy")
+    async def busy():
+        spin(0.05)
+        return {"ok": True}
+
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=SamplingProfiler(interval=0.001),
+        store=store,
+        **{"sample_rate": 0.0, **options},
+    )
+    app.add_middleware(StructlogRequestMiddleware)
+    return app
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    """The static test token's user ("testuser") is an admin."""
+    monkeypatch.setattr(bearer, "ADMIN_USERNAMES", frozenset({"testuser"}))
+
+
+class TestProfiling:
+    """Test suite for on-demand request profiling."""
+
+    @pytest.mark.asyncio
+    async def test_admin_header_profiles_the_request(self, tmp_path, admin):
+        """The profile id starts with the request id; speedscope is the default."""
+        store = ProfileStore(tmp_path, max_profiles=10)
+        async with AsyncClient(
+            transport=ASGITransport(app=profiled_app(store)), base_url="http://test"
+        ) as client:
+            response = await client.get(
+                "/busy",
+                headers={
+                    "Authorization": "Bearer Nina",
+                    "x-profile": "1",
+                    "x-request-id": "req-42",
+                },
+            )
+
+        info, artifact = store.get(response.headers["x-profile-id"])
+        document = json.loads(artifact.read_text())
+        frames = {frame["name"] for frame in document["shared"]["frames"]}
+
+        assert info.id.startswith("req-42-")
+        assert info.request_id == "req-42"
+        assert (info.trigger, info.status_code, info.path) == ("header", 200, "/busy")
+        assert info.samples > 0
+        assert document["profiles"][0]["type"] == "sampled"
+        assert "spin" in frames
+
+    @pytest.mark.asyncio
+    async def test_only_admins_and_samples_are_profiled(self, tmp_path, admin):
+        """Others' x-profile headers are ignored; sampling needs no header."""
+        unsampled = ProfileStore(tmp_path / "unsampled", max_profiles=10)
+        sampled = ProfileStore(tmp_path / "sampled", max_profiles=10)
+        async with AsyncClient(
+            transport=ASGITransport(app=profiled_app(unsampled)),
+            base_url="http://test",
+        ) as client:
+            ignored = await client.get(
+                "/busy", headers={"Authorization": "Bearer nobody", "x-profile": "1"}
+            )
+        async with AsyncClient(
+            transport=ASGITransport(
+                app=profiled_app(sampled, sample_rate=1.0, format="collapsed")
+            ),
+            base_url="http://test",
+        ) as client:
+            chosen = await client.get("/busy", headers={"x-request-id": "r/../1"})
+
+        info, artifact = sampled.get(chosen.headers["x-profile-id"])
+
+        assert "x-profile-id" not in ignored.headers
+        assert unsampled.list() == []
+        assert info.id.startswith("r____1-")
+        assert (info.request_id, info.trigger) == ("r/../1", "sampled")
+        assert sampled.get("../" + info.id) is None
+        assert artifact.parent == tmp_path / "sampled"
+        assert "spin (" in artifact.read_text()
+
+    @pytest.mark.asyncio
+    async def test_admins_list_and_download_recent_profiles(
+        self, client: AsyncClient, tmp_path, monkeypatch
+    ):
+        """Only the newest profiles are kept, and only admins may read them."""
+        store = ProfileStore(tmp_path, max_profiles=2)
+        monkeypatch.setattr(routes, "profile_store", store)
+        async with AsyncClient(
+            transport=ASGITransport(app=profiled_app(store, sample_rate=1.0)),
+            base_url="http://test",
+        ) as profiled:
+            ids = []
+            for request_id in ("first", "second", "third"):
+                response = await profiled.get(
+                    "/busy", headers={"x-request-id": request_id}
+                )
+                ids.append(response.headers["x-profile-id"])
+
+        forbidden = await client.get("/admin/profiles/")
+        monkeypatch.setattr(bearer, "ADMIN_USERNAMES", frozenset({"testuser"}))
+        listed = await client.get("/admin/profiles/")
+        downloaded = await client.get(f"/admin/profiles/{ids[2]}")
+        pruned = await client.get(f"/admin/profiles/{ids[0]}")
+
+        assert forbidden.status_code == 403
+        assert [info["id"] for info in listed.json()] == [ids[2], ids[1]]
+        assert downloaded.status_code == 200
+        assert downloaded.json()["profiles"][0]["name"].startswith("GET /busy")
+        assert pruned.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_reused_request_ids_keep_every_profile(self, tmp_path):
+        """Clients choose request ids; a repeated one overwrites nothing."""
+        store = ProfileStore(tmp_path, max_profiles=10)
+        async with AsyncClient(
+            transport=ASGITransport(app=profiled_app(store, sample_rate=1.0)),
+            base_url="http://test",
+        ) as client:
+            responses = [
+                await client.get("/busy", headers={"x-request-id": "same"})
+                for _ in range(2)
+            ]
+
+        ids = {response.headers["x-profile-id"] for response in responses}
+
+        assert len(ids) == 2
+        assert {info.id for info in store.list()} == ids
+        assert {info.request_id for info in store.list()} == {"same"}
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from pydantic import ValidationError
+from starlette.responses import PlainTextResponse
+
+from features.ratelimit.backends import InMemoryRateLimitStore
+from features.ratelimit.middleware import (
+    ConcurrencyLimitMiddleware,
+    RateLimitMiddleware,
+)
+from settings import Settings
+
+
+async def ok_app(scope, receive, send):
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def make_client(app) -> AsyncClient:
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+class TestRateLimitMiddleware:
+    """Test suite for token-bucket rate limiting."""
+
+    @pytest.mark.asyncio
+    async def test_rejects_after_burst(self):
+        app = RateLimitMiddleware(
+            ok_app, store=InMemoryRateLimitStore(), rate=0.5, burst=2
+        )
+        async with make_client(app) as client:
+            statuses = [(await client.get("/todos/")).status_code for _ in range(3)]
+            rejected = await client.get("/todos/")
+
+        assert statuses == [200, 200, 429]
+        assert int(rejected.headers["retry-after"]) >= 1
+
+    @pytest.mark.asyncio
+    async def test_buckets_are_keyed_per_user(self):
+        app = RateLimitMiddleware(
+            ok_app, store=InMemoryRateLimitStore(), rate=0.1, burst=1
+        )
+        async with make_client(app) as client:
+            authed = await client.get(
+                "/todos/", headers={"Authorization": "Bearer Nina"}
+            )
+            anonymous = await client.get("/todos/")
+            authed_again = await client.get(
+                "/todos/", headers={"Authorization": "Bearer Nina"}
+            )
+
+        assert authed.status_code == 200
+        assert anonymous.status_code == 200
+        assert authed_again.status_code == 429
+
+    @pytest.mark.asyncio
+    async def test_route_weights(self):
+        app = RateLimitMiddleware(
+            ok_app,
+            store=InMemoryRateLimitStore(),
+            rate=0.1,
+            burst=5,
+            route_weights={"GET /todos/with-users": 5},
+            exempt_paths=["/health"],
+        )
+        async with make_client(app) as client:
+            expensive = await client.get("/todos/with-users")
+            cheap = await client.get("/todos/1")
+            exempt = await client.get("/health")
+
+        assert expensive.status_code == 200
+        assert cheap.status_code == 429
+        assert exempt.status_code == 200
+
+    def test_weights_above_burst_are_rejected(self):
+        """A request heavier than the burst could never be admitted."""
+        with pytest.raises(ValueError):
+            RateLimitMiddleware(
+                ok_app,
+                store=InMemoryRateLimitStore(),
+                rate=1,
+                burst=4,
+                route_weights={"GET /todos/with-users": 5},
+            )
+        with pytest.raises(ValidationError):
+            Settings(rate_limit_burst=4, rate_limit_route_weights={"/todos/": 5})
+
+
+class TestConcurrencyLimitMiddleware:
+    """Test suite for in-flight request shedding."""
+
+    @pytest.mark.asyncio
+    async def test_sheds_when_saturated(self):
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await ok_app(scope, receive, send)
+
+        app = ConcurrencyLimitMiddleware(slow_app, limit=1, retry_after=2)
+        async with make_client(app) as client:
+            first = asyncio.create_task(client.get("/todos/with-users"))
+            await asyncio.sleep(0.01)
+            shed = await client.get("/todos/with-users")
+            release.set()
+            completed = await first
+
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "2"
+        assert completed.status_code == 200
+        assert app.in_flight == 0
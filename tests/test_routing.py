@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+import fastapi.routing
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from structlog.testing import capture_logs
+
+from database import get_db, track_session
+from features.common.loader import BatchLoader
+from features.common.routing import SessionReleaseRoute
+from settings import settings
+
+# Counts for far longer than any test may take unless interrupted.
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+    "SELECT count(*) FROM (SELECT x FROM n LIMIT 1000000000)"
+)
+
+
+def slow_app(db_session, monkeypatch, budget: float) -> FastAPI:
+    monkeypatch.setattr(settings, "request_route_timeouts", {"GET /slow": budget})
+    router = APIRouter(route_class=SessionReleaseRoute)
+
+    @router.get("/slow")
+    async def slow(db: AsyncSession = Depends(get_db)):
+        return {"count": await db.scalar(SLOW_QUERY)}
+
+    async def override_get_db():
+        track_session(db_session)
+        yield db_session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+class TestSessionRelease:
+    """Test suite for early release of request sessions."""
+
+    @pytest.mark.asyncio
+    async def test_read_then_write_on_shared_session(
+        self, client: AsyncClient, db_session
+    ):
+        """A read must not leave its transaction (and connection) open."""
+        listing = await client.get("/todos/")
+        created = await client.post(
+            "/todos/", json={"title": "After read", "completed": False}
+        )
+
+        assert listing.status_code == 200
+        assert created.status_code == 201
+        assert not db_session.in_transaction()
+
+    @pytest.mark.asyncio
+    async def test_released_before_serialization(
+        self, client: AsyncClient, db_session, monkeypatch
+    ):
+        """The connection is back in the pool before the response is built."""
+        await client.post("/todos/", json={"title": "Early", "completed": False})
+
+        observed = []
+        original = fastapi.routing.serialize_response
+
+        async def spy(*args, **kwargs):
+            observed.append(db_session.in_transaction())
+            return await original(*args, **kwargs)
+
+        monkeypatch.setattr(fastapi.routing, "serialize_response", spy)
+        response = await client.get("/todos/1")
+
+        assert response.status_code == 200
+        assert response.json()["title"] == "Early"
+        assert observed == [False]
+
+    @pytest.mark.asyncio
+    async def test_batch_loads_end_before_their_session_closes(
+        self, db_session, monkeypatch
+    ):
+        """A load the endpoint left running never queries a closed session."""
+        events = []
+        started = asyncio.Event()
+
+        async def load_slowly(keys: list[int]) -> dict[int, int]:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            finally:
+                events.append("batch ended")
+            return {}
+
+        router = APIRouter(route_class=SessionReleaseRoute)
+
+        @router.get("/abandoned")
+        async def abandoned(db: AsyncSession = Depends(get_db)):
+            loader = BatchLoader(load_slowly, session=db)
+            asyncio.ensure_future(loader.load(1))
+            await started.wait()
+            return {}
+
+        async def override_get_db():
+            track_session(db_session)
+            yield db_session
+
+        original_close = db_session.close
+
+        async def close():
+            events.append("closed")
+            await original_close()
+
+        monkeypatch.setattr(db_session, "close", close)
+        app = FastAPI()
+        app.include_router(router)
+        app.dependency_overrides[get_db] = override_get_db
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            response = await client.get("/abandoned")
+
+        assert response.status_code == 200
+        assert events == ["batch ended", "closed"]
+
+
+class TestRequestDeadlines:
+    """Test suite for request deadlines and cancellation."""
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_interrupts_the_query(self, db_session, monkeypatch):
+        """The statement is aborted, logged, and the client gets a 504."""
+        app = slow_app(db_session, monkeypatch, budget=0.2)
+
+        started = time.perf_counter()
+        with capture_logs() as logs:
+            async with AsyncClient(
+                transport=ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                response = await client.get("/slow")
+        elapsed = time.perf_counter() - started
+
+        assert response.status_code == 504
+        assert elapsed < 2
+        [warning] = [log for log in logs if log["log_level"] == "warning"]
+        assert warning["statements"][0].startswith("WITH RECURSIVE")
+        assert await db_session.scalar(select(1)) == 1
+
+    @pytest.mark.asyncio
+    async def test_client_disconnect_cancels_the_query(self, db_session, monkeypatch):
+        """An abandoned request stops holding its connection."""
+        app = slow_app(db_session, monkeypatch, budget=0)
+        requested = False
+        sent = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.sleep(0.2)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/slow",
+            "raw_path": b"/slow",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [],
+            "client": ("test", 1),
+            "server": ("test", 80),
+        }
+        async with asyncio.timeout(5):
+            await app(scope, receive, send)
+
+        assert sent[0]["status"] == 499
+        assert await db_session.scalar(select(1)) == 1
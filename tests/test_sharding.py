@@ -0,0 +1,365 @@
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from conftest import create_todo
+import features.changes.services
+import features.todos.archive
+import features.todos.services
+import features.users.services
+from database import (
+    Base,
+    _create_shard_engine,
+    get_db,
+    id_allocations,
+    shard_map,
+    track_session,
+)
+from features.todos.archive import archive_completed_todos
+from features.todos.coalescing import todo_write_buffer
+from features.todos.models import ArchivedTodo, Todo
+from features.users.models import User
+from main import app
+from sharding.rebalance import adopt_existing, move_user, plan
+from sharding.ring import HashRing
+from sharding.router import PRIMARY_SHARD, ShardRouter
+
+
+@pytest_asyncio.fixture
+async def router(tmp_path, monkeypatch):
+    """A primary plus one shard, each in its own SQLite file."""
+    engines = {
+        PRIMARY_SHARD: create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+        ),
+        "east": _create_shard_engine(f"sqlite+aiosqlite:///{tmp_path / 'east.db'}"),
+    }
+    for engine in engines.values():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    router = ShardRouter(
+        engines,
+        shard_map=shard_map,
+        id_allocations=id_allocations,
+        sharded_tables=["todos", "todos_archive"],
+    )
+    for module in (
+        features.changes.services,
+        features.todos.archive,
+        features.todos.coalescing,
+        features.todos.services,
+        features.users.services,
+    ):
+        monkeypatch.setattr(module, "shard_router", router)
+
+    yield router
+
+    for engine in engines.values():
+        await engine.dispose()
+
+
+@pytest.fixture
+def sessions(router):
+    return async_sessionmaker(
+        class_=AsyncSession, expire_on_commit=False, **router.session_options()
+    )
+
+
+@pytest_asyncio.fixture
+async def sharded_client(sessions):
+    async def override_get_db():
+        async with sessions() as session:
+            track_session(session)
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test",
+        headers={"Authorization": "Bearer Nina"},
+    ) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def create_owners(client: AsyncClient, router: ShardRouter) -> dict[str, int]:
+    """Create users until one is placed on each shard; returns shard -> id."""
+    owners: dict[str, int] = {}
+    n = 0
+    while len(owners) < len(router.shard_ids):
+        n += 1
+        response = await client.post(
+            "/users/",
+            json={
+                "username": f"owner{n}",
+                "email": f"owner{n}@example.com",
+                "full_name": f"Owner {n}",
+                "is_active": True,
+            },
+        )
+        user_id = response.json()["id"]
+        owners.setdefault(router.ring.shard_for(user_id), user_id)
+    return owners
+
+
+async def stored_titles(router: ShardRouter, shard: str) -> list[str]:
+    async with router.engines[shard].connect() as conn:
+        return list(await conn.scalars(select(Todo.title).order_by(Todo.title)))
+
+
+class TestHashRing:
+    """Test suite for consistent hashing."""
+
+    def test_adding_a_shard_moves_only_its_share(self):
+        """Keys only move to the new shard, roughly a third of them."""
+        before = HashRing(["primary", "east"])
+        after = HashRing(["primary", "east", "west"])
+
+        moved = [k for k in range(3000) if before.shard_for(k) != after.shard_for(k)]
+
+        assert {after.shard_for(k) for k in moved} == {"west"}
+        assert 600 < len(moved) < 1400
+
+
+class TestSharding:
+    """Test suite for user-keyed sharding of todos."""
+
+    @pytest.mark.asyncio
+    async def test_todos_live_on_their_owners_shard(
+        self, sharded_client: AsyncClient, router: ShardRouter
+    ):
+        """Writes follow the owner; scoped lists hit one shard, others merge."""
+        owners = await create_owners(sharded_client, router)
+        for n in range(3):
+            await create_todo(sharded_client, f"primary {n}", owners[PRIMARY_SHARD])
+            await create_todo(sharded_client, f"east {n}", owners["east"])
+        await create_todo(sharded_client, "unowned", None)
+
+        scoped = await sharded_client.get(f"/todos/?user_id={owners['east']}")
+        merged = await sharded_client.get(
+            "/todos/",
+            params={
+                "sort_by": "title",
+                "sort_order": "desc",
+                "page": 2,
+                "page_size": 3,
+            },
+        )
+        with_users = await sharded_client.get("/todos/with-users?page_size=100")
+
+        assert await stored_titles(router, "east") == ["east 0", "east 1", "east 2"]
+        assert await stored_titles(router, PRIMARY_SHARD) == [
+            "primary 0",
+            "primary 1",
+            "primary 2",
+            "unowned",
+        ]
+        assert [t["title"] for t in scoped.json()["items"]] == [
+            "east 0",
+            "east 1",
+            "east 2",
+        ]
+        assert merged.json()["total"] == 7
+        assert [t["title"] for t in merged.json()["items"]] == [
+            "primary 0",
+            "east 2",
+            "east 1",
+        ]
+        ids = [t["id"] for t in with_users.json()["items"]]
+        assert ids == sorted(ids) and len(set(ids)) == 7
+        assert {t["user"]["id"] for t in with_users.json()["items"] if t["user"]} == {
+            owners[PRIMARY_SHARD],
+            owners["east"],
+        }
+
+    @pytest.mark.asyncio
+    async def test_merged_sparse_lists_sort_by_unselected_fields(
+        self, sharded_client: AsyncClient, router: ShardRouter
+    ):
+        """The sort key is loaded for merging; equal keys page by id."""
+        owners = await create_owners(sharded_client, router)
+        ids = [
+            await create_todo(sharded_client, "same", owners[shard])
+            for shard in (PRIMARY_SHARD, "east", "east", PRIMARY_SHARD)
+        ]
+
+        pages = [
+            await sharded_client.get(
+                "/todos/",
+                params={
+                    "sort_by": "title",
+                    "fields": "id",
+                    "page": page,
+                    "page_size": 2,
+                },
+            )
+            for page in (1, 2)
+        ]
+
+        assert [page.status_code for page in pages] == [200, 200]
+        assert [t for page in pages for t in page.json()["items"]] == [
+            {"id": todo_id} for todo_id in sorted(ids)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_reads_and_writes_by_id_reach_every_shard(
+        self, sharded_client: AsyncClient, router: ShardRouter
+    ):
+        """Get, update, delete and bulk actions find todos on any shard."""
+        owners = await create_owners(sharded_client, router)
+        todo_id = await create_todo(sharded_client, "east", owners["east"])
+        await create_todo(sharded_client, "primary", owners[PRIMARY_SHARD])
+
+        fetched = await sharded_client.get(f"/todos/{todo_id}")
+        patched = await sharded_client.patch(
+            f"/todos/{todo_id}", json={"completed": True}
+        )
+        completed = await sharded_client.post(
+            "/todos/actions/complete", json={"dry_run": True}
+        )
+        deleted = await sharded_client.delete(f"/todos/{todo_id}")
+
+        assert fetched.json()["title"] == "east"
+        assert patched.json()["completed"] is True
+        assert completed.json() == {
+            "matched": 2,
+            "affected": 1,
+            "dry_run": True,
+            "ids": None,
+        }
+        assert deleted.status_code == 204
+        assert await stored_titles(router, "east") == []
+
+    @pytest.mark.asyncio
+    async def test_reassigning_moves_the_todo(
+        self, sharded_client: AsyncClient, router: ShardRouter
+    ):
+        """A todo follows its new owner to their shard."""
+        owners = await create_owners(sharded_client, router)
+        todo_id = await create_todo(sharded_client, "moving", owners[PRIMARY_SHARD])
+
+        await sharded_client.patch(
+            f"/todos/{todo_id}", json={"user_id": owners["east"]}
+        )
+        listed = await sharded_client.get(f"/todos/?user_id={owners['east']}")
+
+        assert await stored_titles(router, "east") == ["moving"]
+        assert await stored_titles(router, PRIMARY_SHARD) == []
+        assert [t["id"] for t in listed.json()["items"]] == [todo_id]
+
+    @pytest.mark.asyncio
+    async def test_deleting_a_user_clears_their_shard(
+        self, sharded_client: AsyncClient, router: ShardRouter
+    ):
+        """Shards have no cascade; the service deletes the rows itself."""
+        owners = await create_owners(sharded_client, router)
+        await create_todo(sharded_client, "east", owners["east"])
+
+        response = await sharded_client.delete(f"/users/{owners['east']}")
+
+        assert response.status_code == 204
+        assert await stored_titles(router, "east") == []
+
+    @pytest.mark.asyncio
+    async def test_archiving_runs_on_every_shard(
+        self, sharded_client: AsyncClient, router: ShardRouter, sessions
+    ):
+        """Each shard archives its own todos; the archive is listed merged."""
+        owners = await create_owners(sharded_client, router)
+        for shard, user_id in owners.items():
+            for n in range(2):
+                response = await sharded_client.post(
+                    "/todos/",
+                    json={
+                        "title": f"{shard} {n}",
+                        "completed": True,
+                        "user_id": user_id,
+                    },
+                )
+                assert response.status_code == 201
+
+        moved = await archive_completed_todos(
+            older_than_seconds=0, session_factory=sessions
+        )
+        listed = await sharded_client.get("/todos/?include_archived=true")
+
+        assert moved == 4
+        async with router.engines["east"].connect() as conn:
+            assert list(await conn.scalars(select(ArchivedTodo.title))) == [
+                "east 0",
+                "east 1",
+            ]
+        assert listed.json()["total"] == 4
+
+    @pytest.mark.asyncio
+    async def test_buffered_writes_reach_every_shard(
+        self, sharded_client: AsyncClient, router: ShardRouter, sessions, monkeypatch
+    ):
+        """Write-behind flushes update todos wherever they live."""
+        monkeypatch.setattr(todo_write_buffer, "enabled", True)
+        monkeypatch.setattr(todo_write_buffer, "session_factory", sessions)
+        owners = await create_owners(sharded_client, router)
+        for shard, user_id in owners.items():
+            todo_id = await create_todo(sharded_client, shard, user_id)
+            await sharded_client.patch(
+                f"/todos/{todo_id}", json={"title": f"{shard} renamed"}
+            )
+
+        assert await todo_write_buffer.flush() == 2
+        assert await stored_titles(router, "east") == ["east renamed"]
+        assert await stored_titles(router, PRIMARY_SHARD) == ["primary renamed"]
+
+    @pytest.mark.asyncio
+    async def test_rebalance_moves_an_owner(
+        self, sharded_client: AsyncClient, router: ShardRouter, sessions
+    ):
+        """Rows move, the map follows and later writes land on the new shard."""
+        owners = await create_owners(sharded_client, router)
+        user_id = owners["east"]
+        for n in range(5):
+            await create_todo(sharded_client, f"todo {n}", user_id)
+
+        moved = await move_user(
+            user_id,
+            PRIMARY_SHARD,
+            chunk_size=2,
+            settle_seconds=0,
+            router=router,
+            session_factory=sessions,
+        )
+        await create_todo(sharded_client, "after", user_id)
+        listed = await sharded_client.get(f"/todos/?user_id={user_id}")
+
+        assert moved == 5
+        assert await stored_titles(router, "east") == []
+        assert listed.json()["total"] == 6
+        assert await plan(router, sessions) == [(user_id, PRIMARY_SHARD, "east")]
+
+    @pytest.mark.asyncio
+    async def test_adopt_pins_existing_owners_to_the_primary(
+        self, router: ShardRouter, sessions
+    ):
+        """Owners of rows from before sharding keep reading from the primary."""
+        async with router.engines[PRIMARY_SHARD].begin() as conn:
+            await conn.execute(
+                User.__table__.insert().values(id=7, username="old", email="o@x.io")
+            )
+            await conn.execute(
+                Todo.__table__.insert().values(title="legacy", user_id=7)
+            )
+
+        adopted = await adopt_existing(sessions)
+
+        async with sessions() as db:
+            assert await router.locate(db, 7) == PRIMARY_SHARD
+            assert (
+                await db.scalar(
+                    select(func.count()).select_from(shard_map),
+                    bind_arguments=router.bind(PRIMARY_SHARD),
+                )
+                == 1
+            )
+        assert adopted == 1
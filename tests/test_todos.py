@@ -1,7 +1,9 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 
 from features.common.pagination import DEFAULT_PAGE_SIZE
+from settings import settings
 
 
 class TestTodoEndpoints:
@@ -281,3 +283,244 @@ class TestTodoEndpoints:
         # Verify the todo is deleted by trying to get it
         get_response = await client.get(f"/todos/{todo_id}")
         assert get_response.status_code == 404  # Should not be found
+
+    @pytest.mark.asyncio
+    async def test_update_missing_todo(self, client: AsyncClient):
+        """Updating a nonexistent todo should surface 404."""
+        response = await client.patch("/todos/9999", json={"completed": True})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Todo not found"
+
+    @pytest.mark.asyncio
+    async def test_update_todo_with_missing_user(self, client: AsyncClient):
+        """Reassigning a todo to a nonexistent user should surface 404."""
+        create_response = await client.post(
+            "/todos/", json={"title": "Owned", "completed": False}
+        )
+        todo_id = create_response.json()["id"]
+
+        response = await client.patch(f"/todos/{todo_id}", json={"user_id": 9999})
+
+        assert response.status_code == 404
+        assert response.json()["detail"] == "User not found"
+
+    @pytest.mark.asyncio
+    async def test_delete_missing_todo(self, client: AsyncClient):
+        """Deleting a nonexistent todo should surface 404."""
+        response = await client.delete("/todos/9999")
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_bulk_complete(self, client: AsyncClient):
+        """POST /todos/actions/complete - Complete all matching todos at once."""
+        user_response = await client.post(
+            "/users/",
+            json={"username": "bulk", "email": "bulk@example.com", "is_active": True},
+        )
+        user_id = user_response.json()["id"]
+        for index, completed in enumerate((False, False, True)):
+            await client.post(
+                "/todos/",
+                json={
+                    "title": f"Bulk {index}",
+                    "completed": completed,
+                    "user_id": user_id,
+                },
+            )
+        await client.post("/todos/", json={"title": "Other", "completed": False})
+
+        dry_run = await client.post(
+            "/todos/actions/complete", json={"user_id": user_id, "dry_run": True}
+        )
+        response = await client.post(
+            "/todos/actions/complete", json={"user_id": user_id, "return_ids": True}
+        )
+
+        assert dry_run.status_code == 200
+        assert dry_run.json() == {
+            "matched": 3,
+            "affected": 2,
+            "dry_run": True,
+            "ids": None,
+        }
+        assert response.status_code == 200
+        assert response.json()["affected"] == 2
+        assert sorted(response.json()["ids"]) == [1, 2]
+
+        listing = await client.get("/todos/?completed=false")
+        assert [todo["title"] for todo in listing.json()["items"]] == ["Other"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_reassign(self, client: AsyncClient):
+        """POST /todos/actions/reassign - Move matching todos to a new owner."""
+        user_response = await client.post(
+            "/users/",
+            json={"username": "heir", "email": "heir@example.com", "is_active": True},
+        )
+        user_id = user_response.json()["id"]
+        for index in range(2):
+            await client.post(
+                "/todos/", json={"title": f"Orphan {index}", "completed": False}
+            )
+
+        response = await client.post(
+            "/todos/actions/reassign", json={"to_user_id": user_id}
+        )
+        missing_user = await client.post(
+            "/todos/actions/reassign", json={"to_user_id": 9999}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["matched"] == 2
+        assert response.json()["affected"] == 2
+        assert missing_user.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_bulk_action_safety_cap(self, client: AsyncClient, monkeypatch):
+        """Bulk actions matching more rows than the cap are refused."""
+        monkeypatch.setattr(settings, "todo_bulk_max_rows", 1)
+        for index in range(2):
+            await client.post(
+                "/todos/", json={"title": f"Capped {index}", "completed": False}
+            )
+
+        response = await client.post("/todos/actions/complete", json={})
+
+        assert response.status_code == 400
+        assert "limited to 1" in response.json()["detail"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_action_cap_holds_for_rows_added_after_the_count(
+        self, client: AsyncClient, db_engine, monkeypatch
+    ):
+        """The UPDATE itself enforces the cap, and the write rolls back."""
+        monkeypatch.setattr(settings, "todo_bulk_max_rows", 1)
+        created = await client.post(
+            "/todos/", json={"title": "Counted", "completed": False}
+        )
+
+        def insert_after_count(conn, cursor, statement, *args):
+            if statement.lstrip().startswith("SELECT count"):
+                conn.exec_driver_sql(
+                    "INSERT INTO todos (title, completed) VALUES ('Late', 0)"
+                )
+
+        event.listen(db_engine.sync_engine, "after_cursor_execute", insert_after_count)
+        try:
+            response = await client.post("/todos/actions/complete", json={})
+        finally:
+            event.remove(
+                db_engine.sync_engine, "after_cursor_execute", insert_after_count
+            )
+        counted = await client.get(f"/todos/{created.json()['id']}")
+
+        assert response.status_code == 400
+        assert "more than 1" in response.json()["detail"]
+        assert counted.json()["completed"] is False
+
+    @pytest.mark.asyncio
+    async def test_sparse_fieldsets(self, client: AsyncClient, db_engine):
+        """`fields=` narrows both the payload and the selected columns."""
+        user = await client.post(
+            "/users/",
+            json={
+                "username": "sparse",
+                "email": "sparse@example.com",
+                "full_name": "Sparse User",
+                "is_active": True,
+            },
+        )
+        created = await client.post(
+            "/todos/",
+            json={
+                "title": "Sparse",
+                "description": "Not wanted",
+                "completed": False,
+                "user_id": user.json()["id"],
+            },
+        )
+        todo_id = created.json()["id"]
+
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            listed = await client.get("/todos/?fields=id,title,completed")
+            nested = await client.get("/todos/with-users?fields=title,user.username")
+            detail = await client.get(f"/todos/{todo_id}?fields=title")
+        finally:
+            event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+        assert listed.status_code == 200
+        assert listed.json()["items"] == [
+            {"id": todo_id, "title": "Sparse", "completed": False}
+        ]
+        assert listed.json()["total"] == 1
+        assert nested.json()["items"] == [
+            {"title": "Sparse", "user": {"username": "sparse"}}
+        ]
+        assert detail.json() == {"title": "Sparse"}
+        selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+        assert not any("description" in s or "email" in s for s in selects)
+
+    @pytest.mark.asyncio
+    async def test_sparse_fieldsets_are_validated(self, client: AsyncClient):
+        """Unknown or misplaced field names are rejected with 422."""
+        unknown = await client.get("/todos/?fields=id,secret")
+        nested = await client.get("/todos/?fields=user.username")
+
+        assert unknown.status_code == 422
+        assert unknown.json()["detail"][0]["loc"] == ["query", "fields"]
+        assert "secret" in unknown.json()["detail"][0]["msg"]
+        assert nested.status_code == 422
+
+        schema = (await client.get("/openapi.json")).json()
+        parameters = schema["paths"]["/todos/with-users"]["get"]["parameters"]
+        fields = next(p for p in parameters if p["name"] == "fields")
+        assert "user.username" in fields["description"]
+
+    @pytest.mark.asyncio
+    async def test_batch_get(self, client: AsyncClient, db_engine):
+        """GET /todos/batch keeps the requested order and reports missing ids."""
+        ids = []
+        for n in range(3):
+            response = await client.post(
+                "/todos/", json={"title": f"Batch {n}", "completed": False}
+            )
+            ids.append(response.json()["id"])
+
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = await client.get(
+                f"/todos/batch?ids={ids[2]},999,{ids[0]},{ids[2]}"
+            )
+        finally:
+            event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [ids[2], ids[0]]
+        assert data["missing"] == [999]
+        assert len(statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_get_validation(self, client: AsyncClient, monkeypatch):
+        """Malformed or oversized id lists are rejected with 422."""
+        monkeypatch.setattr(settings, "batch_max_ids", 2)
+
+        malformed = await client.get("/todos/batch?ids=1,abc")
+        oversized = await client.get("/todos/batch?ids=1,2,3")
+
+        assert malformed.status_code == 422
+        assert oversized.status_code == 422
+        assert oversized.json()["detail"][0]["loc"] == ["query", "ids"]
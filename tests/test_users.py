@@ -1,7 +1,17 @@
+import asyncio
+
 import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from features.common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from features.common.query import StatementCache
+from features.users.models import User
+from features.users.schemas.base import UserListParams
+from features.todos.models import Todo
+from features.users.services import UserService, purge_user
 
 
 class TestUserEndpoints:
@@ -207,3 +217,186 @@ class TestUserEndpoints:
         # Verify the user is deleted by trying to get it
         get_response = await client.get(f"/users/{user_id}")
         assert get_response.status_code == 404  # Should not be found
+
+    @pytest.mark.asyncio
+    async def test_update_user_conflict(self, client: AsyncClient):
+        """Updating a user onto an existing username should fail with 400."""
+        for username in ("taken", "renamer"):
+            await client.post(
+                "/users/",
+                json={
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "is_active": True,
+                },
+            )
+
+        response = await client.patch("/users/2", json={"username": "taken"})
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Username or email already exists"
+
+    @pytest.mark.asyncio
+    async def test_update_missing_user(self, client: AsyncClient):
+        """Updating a nonexistent user should surface 404."""
+        response = await client.patch("/users/9999", json={"full_name": "Nobody"})
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_delete_user_removes_todos(self, client: AsyncClient):
+        """Deleting a user should delete the todos they own."""
+        create_response = await client.post(
+            "/users/",
+            json={"username": "owner", "email": "owner@example.com", "is_active": True},
+        )
+        user_id = create_response.json()["id"]
+        todo_response = await client.post(
+            "/todos/", json={"title": "Owned", "completed": False, "user_id": user_id}
+        )
+        todo_id = todo_response.json()["id"]
+
+        response = await client.delete(f"/users/{user_id}")
+
+        assert response.status_code == 204
+        assert (await client.delete(f"/users/{user_id}")).status_code == 404
+        assert (await client.get(f"/todos/{todo_id}")).status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_batch_get_users(self, client: AsyncClient):
+        """GET /users/batch returns users in order and lists missing ids."""
+        ids = []
+        for name in ("batch-a", "batch-b"):
+            response = await client.post(
+                "/users/",
+                json={
+                    "username": name,
+                    "email": f"{name}@example.com",
+                    "is_active": True,
+                },
+            )
+            ids.append(response.json()["id"])
+
+        response = await client.get(f"/users/batch?ids={ids[1]},404,{ids[0]}")
+
+        assert response.status_code == 200
+        assert [user["username"] for user in response.json()["items"]] == [
+            "batch-b",
+            "batch-a",
+        ]
+        assert response.json()["missing"] == [404]
+
+
+class TestUserService:
+    """Test suite for service-level behaviour of UserService."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_gets_are_batched(self, db_engine, db_session):
+        """Lookups issued in the same tick should share one IN query."""
+        async with db_session.begin():
+            db_session.add_all(
+                User(username=f"batch{i}", email=f"batch{i}@example.com")
+                for i in range(3)
+            )
+        db_session.expunge_all()
+
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            user_service = UserService(db_session)
+            users = await asyncio.gather(*(user_service.get(i) for i in (1, 2, 3, 2)))
+            with pytest.raises(HTTPException) as exc_info:
+                await user_service.get(9999)
+        finally:
+            event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+
+        assert [user.id for user in users] == [1, 2, 3, 2]
+        assert exc_info.value.status_code == 404
+        assert len([s for s in statements if s.lstrip().startswith("SELECT")]) == 2
+
+    @pytest.mark.asyncio
+    async def test_delete_runs_constant_statements(self, db_engine, db_session):
+        """User deletion cost must not grow with the number of owned todos."""
+        async with db_session.begin():
+            for index, todo_count in enumerate((1, 50)):
+                user = User(username=f"owner{index}", email=f"owner{index}@example.com")
+                user.todos = [
+                    Todo(title=f"todo {n}", completed=False) for n in range(todo_count)
+                ]
+                db_session.add(user)
+        db_session.expunge_all()
+
+        statement_counts = []
+        for user_id in (1, 2):
+            statements: list[str] = []
+
+            def record(
+                conn,
+                cursor,
+                statement,
+                parameters,
+                context,
+                executemany,
+                statements=statements,
+            ):
+                statements.append(statement)
+
+            event.listen(db_engine.sync_engine, "before_cursor_execute", record)
+            try:
+                async with db_session.begin():
+                    await UserService(db_session).delete(user_id)
+            finally:
+                event.remove(db_engine.sync_engine, "before_cursor_execute", record)
+            statement_counts.append(len(statements))
+
+        # Log the cascaded todos, delete the user, log the user.
+        assert statement_counts[0] == statement_counts[1] == 3
+        remaining = await db_session.scalar(select(func.count()).select_from(Todo))
+        assert remaining == 0
+
+    @pytest.mark.asyncio
+    async def test_purge_user_in_chunks(self, db_engine, db_session):
+        """Background purge removes todos chunk by chunk, then the user."""
+        async with db_session.begin():
+            user = User(username="heavy", email="heavy@example.com")
+            user.todos = [Todo(title=f"todo {n}", completed=False) for n in range(25)]
+            db_session.add(user)
+
+        removed = await purge_user(
+            user.id,
+            chunk_size=10,
+            session_factory=async_sessionmaker(db_engine, class_=AsyncSession),
+        )
+
+        assert removed == 25
+        db_session.expunge_all()
+        assert await db_session.get(User, user.id) is None
+
+    @pytest.mark.asyncio
+    async def test_list_reuses_statement_shapes(self, db_session, monkeypatch):
+        """Lists differing only in filter values share cached statements."""
+        async with db_session.begin():
+            db_session.add_all(
+                [
+                    User(username="shape-a", email="a@example.com"),
+                    User(username="shape-b", email="b@example.com", is_active=False),
+                ]
+            )
+
+        user_service = UserService(db_session)
+        monkeypatch.setattr(UserService, "list_statements", StatementCache())
+        active, active_total = await user_service.list(
+            UserListParams(username="SHAPE", is_active=True)
+        )
+        inactive, inactive_total = await user_service.list(
+            UserListParams(username="shape", is_active=False, page=1)
+        )
+
+        assert [user.username for user in active] == ["shape-a"]
+        assert [user.username for user in inactive] == ["shape-b"]
+        assert active_total == inactive_total == 1
+        assert len(UserService.list_statements) == 2